@@ -1,165 +1,339 @@
-def generate_cas_module(no_bits_in_column_address=2, no_of_bits_in_bit_address_in_word=2,
-                        v_read=0.9, v_write=1.8):
-    from itertools import product
-
-    num_words = 2 ** no_bits_in_column_address
-    num_bits_per_word = 2 ** no_of_bits_in_bit_address_in_word
-
-    inputs = ["wr", "bit_or_word", "maj", "majp", "majn", "idle"]
-    ca_ports = [f"ca{i}" for i in range(no_bits_in_column_address)]
-    ba_ports = [f"ba{i}" for i in range(no_of_bits_in_bit_address_in_word)]
-    wb_ports = [f"wb{i}" for i in range(num_bits_per_word)]
-
-    inputs += ca_ports + ba_ports + wb_ports
-
-    inouts = []
-    for word, bit in product(range(num_words), range(num_bits_per_word)):
-        inouts.append(f"vc{word}b{bit}p")
-        inouts.append(f"vc{word}b{bit}n")
-    
-    outputs = [f"outb{i}" for i in range(num_bits_per_word)]
-
-    ports = inputs + inouts + outputs
-
-    header = f"""// Auto-generated Verilog-A CAS module with decoding logic
-
-`include "constants.vams"
-`include "disciplines.vams"
-
-module CAS({', '.join(ports)});
-\tparameter integer no_bits_in_column_address = {no_bits_in_column_address};
-\tparameter integer no_of_bits_in_bit_address_in_word = {no_of_bits_in_bit_address_in_word};
-\tparameter real v_read = {v_read};
-\tparameter real v_write = {v_write};
-"""
-
-    io_decls = ""
-    io_decls += "\n".join(f"\tinput {port};" for port in inputs) + "\n"
-    io_decls += "\tinout " + ", ".join(inouts) + ";\n"
-    io_decls += "\toutput " + ", ".join(outputs) + ";\n"
-    io_decls += "\telectrical " + ", ".join(ports) + ";\n"
-
-    logic = "\n\tinteger ca_decoded;\n"
-    logic += "\tinteger ba_decoded;\n"
-    for i in inouts:
-        logic += f"\treal v_{i};\n"
-    for i in outputs:
-        logic += f"\treal v_{i};\n"
-    logic += "\n\tanalog begin\n"
-
-    # Decoding logic
-    logic += "\t\tca_decoded = 0;\n"
-    for i, ca in enumerate(ca_ports):
-        logic += f"\t\tca_decoded = ca_decoded + (V({ca}) > 0.5 ? (1 << {i}) : 0);\n"
-    logic += "\t\tba_decoded = 0;\n"
-    for i, ba in enumerate(ba_ports):
-        logic += f"\t\tba_decoded = ba_decoded + (V({ba}) > 0.5 ? (1 << {i}) : 0);\n"
-
-
-    # Idle state
-    logic += "\n\t\tif (V(idle) > 0.5) begin\n"
-    for word in range(num_words):
-        for bit in range(num_bits_per_word):
-            logic += f"\t\t\tv_vc{word}b{bit}p = v_read;\n"
-            logic += f"\t\t\tv_vc{word}b{bit}n = 0.0;\n"
-    logic += "\t\tend\n"
-
-    # Majority Logic
-    logic += "\t\telse if (V(maj) > 0.5) begin\n"
-    logic += f"\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin\n"
-    logic += f"\t\t\t\tcase (ca_decoded)\n"
-    for word in range(num_words):
-        logic += f"\t\t\t\t\t{word}: begin\n"
-        logic += f"\t\t\t\t\t\tcase (ba_decoded)\n"
-        for bit in range(num_bits_per_word):
-            logic += f"\t\t\t\t\t\t\t{bit}: begin\n"
-            logic += f"\t\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(majp) > 0.5 ? v_write : 0.0);\n"
-            logic += f"\t\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(majn) > 0.5 ? v_write : 0.0);\n"
-            logic += f"\t\t\t\t\t\t\tend\n"
-        logic += f"\t\t\t\t\t\tendcase\n"
-        logic += f"\t\t\t\t\tend\n"
-    logic += f"\t\t\t\tendcase\n"
-    logic += "\t\t\tend\n"
-    logic += "\t\tend\n"
-
-    # Write Logic
-    logic += "\t\telse if (V(wr) > 0.5) begin\n"
-    logic += f"\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin\n"
-    logic += f"\t\t\t\tif(V(bit_or_word)>0.5) begin\n"
-    logic += f"\t\t\t\t\tcase (ca_decoded)\n"
-    for word in range(num_words):
-        logic += f"\t\t\t\t\t\t{word}: begin\n"
-        logic += f"\t\t\t\t\t\t\tcase (ba_decoded)\n"
-        for bit in range(num_bits_per_word):
-            logic += f"\t\t\t\t\t\t\t\t{bit}: begin\n"
-            logic += f"\t\t\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(wb0) > 0.5 ? v_write : 0.0);\n"
-            logic += f"\t\t\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(wb0) > 0.5 ? 0.0 : v_write);\n"
-            logic += f"\t\t\t\t\t\t\t\tend\n"
-        logic += f"\t\t\t\t\t\t\tendcase\n"
-        logic += f"\t\t\t\t\t\tend\n"
-    logic += f"\t\t\t\t\tendcase\n"
-    logic += "\t\t\t\tend\n"
-    logic += "\t\t\t\telse begin\n"
-    logic += "\t\t\t\t\tcase (ca_decoded)\n"
-    for word in range(num_words):
-        logic += f"\t\t\t\t\t\t{word}: begin\n"
-        for bit in range(num_bits_per_word):
-            logic += f"\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(wb{bit}) > 0.5 ? v_write : 0.0);\n"
-            logic += f"\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(wb{bit}) > 0.5 ? 0.0 : v_write);\n"
-        logic += f"\t\t\t\t\t\tend\n"
-    logic += "\t\t\t\tendcase\n"
-    logic += "\t\t\t\tend\n"
-    logic += "\t\t\tend\n"
-    logic += "\t\tend\n"
-
-    # Read logic
-    logic += "\t\telse begin"
-    logic += f"\n\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin"
-    logic += f"\n\t\t\t\tif (V(bit_or_word)>0.5) begin"
-    logic += "\n\t\t\t\t\tcase (ca_decoded)"
-    for word in range(num_words):
-        logic += f"\n\t\t\t\t\t\t{word}: begin\n\t\t\t\t\t\t\tcase (ba_decoded)"
-        for bit in range(num_bits_per_word):
-            logic += f"\n\t\t\t\t\t\t\t\t{bit}: begin"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\tif(I(vc{word}b{bit}n)>650u && I(vc{word}b{bit}n)<800u) begin"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\t\tv_outb0 = v_write;"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\tend"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\telse begin"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\t\tv_outb0 = 0.0;"
-            logic += f"\n\t\t\t\t\t\t\t\t\t\tend"
-            logic += f"\n\t\t\t\t\t\t\t\tend"
-        logic += "\n\t\t\t\t\t\t\tendcase\n\t\t\t\t\t\tend"
-    logic += "\n\t\t\t\t\tendcase"
-    logic += f"\n\t\t\t\tend"
-    logic += "\n\t\t\t\telse begin"
-    logic += "\n\t\t\t\t\tcase (ca_decoded)"
-    for word in range(num_words):
-        logic += f"\n\t\t\t\t\t\t{word}: begin\n\t\t\t\t\t\t\t"
-        for bit in range(num_bits_per_word):
-            logic += f"\n\t\t\t\t\t\t\tif(I(vc{word}b{bit}n)>650u && I(vc{word}b{bit}n)<800u)"
-            logic += f"\n\t\t\t\t\t\t\t\tv_outb{bit} = v_write;"
-            logic += f"\n\t\t\t\t\t\t\telse"
-            logic += f"\n\t\t\t\t\t\t\t\tv_outb{bit} = 0.0;"
-        logic += "\n\t\t\t\t\t\tend"
-    logic += "\n\t\t\t\tendcase\n\t\t\tend\n\t\tend\n"
-    logic += "\t\tend\n"
-
-    # Continuos assignment for inouts
-    for i in inouts:
-        logic += f"\t\tV({i}) <+ v_{i};\n"
-    logic += "\t\tV(outb0) <+ v_outb0;\n"
-    for i in outputs[1:]:
-        logic += f"\t\tV({i}) <+ v_{i};\n"
-    logic += "\tend\n"
-
-    footer = "endmodule\n"
-
-    return header + io_decls + logic + footer
-
-# Generate a 2x2-bit CAS block
-veriloga_code = generate_cas_module(4, 1)
-
-with open("CAS_full.va", "w") as f:
-    f.write(veriloga_code)
-
-print("CAS with decoding + logic saved to CAS_full.va")
\ No newline at end of file
+from itertools import product
+
+
+def iter_cas_module(no_bits_in_column_address=2, no_of_bits_in_bit_address_in_word=2,
+                    v_read=0.9, v_write=1.8, bus=False, event_driven=False, word_maj=False):
+    """
+    Yields the CAS module chunk by chunk. With bus set the cells, addresses
+    and data are electrical buses and the branches are loops, see
+    iter_bus_cas_module. With event_driven set every output goes through
+    transition(). With word_maj set a majority with bit_or_word low applies
+    to every cell of the word, with majp taken from wb and majn from the
+    extra wbn inputs bit by bit.
+    """
+    if bus:
+        yield from iter_bus_cas_module(no_bits_in_column_address, no_of_bits_in_bit_address_in_word, v_read, v_write,
+                                       event_driven, word_maj)
+        return
+
+    num_words = 2 ** no_bits_in_column_address
+    num_bits_per_word = 2 ** no_of_bits_in_bit_address_in_word
+
+    inputs = ["wr", "bit_or_word", "maj", "majp", "majn", "idle"]
+    ca_ports = [f"ca{i}" for i in range(no_bits_in_column_address)]
+    ba_ports = [f"ba{i}" for i in range(no_of_bits_in_bit_address_in_word)]
+    wb_ports = [f"wb{i}" for i in range(num_bits_per_word)]
+    wbn_ports = [f"wbn{i}" for i in range(num_bits_per_word)] if word_maj else []
+
+    inputs += ca_ports + ba_ports + wb_ports + wbn_ports
+
+    inouts = []
+    for word, bit in product(range(num_words), range(num_bits_per_word)):
+        inouts.append(f"vc{word}b{bit}p")
+        inouts.append(f"vc{word}b{bit}n")
+
+    outputs = [f"outb{i}" for i in range(num_bits_per_word)]
+
+    ports = inputs + inouts + outputs
+
+    yield f"""// Auto-generated Verilog-A CAS module with decoding logic
+
+`include "constants.vams"
+`include "disciplines.vams"
+
+module CAS({', '.join(ports)});
+\tparameter integer no_bits_in_column_address = {no_bits_in_column_address};
+\tparameter integer no_of_bits_in_bit_address_in_word = {no_of_bits_in_bit_address_in_word};
+\tparameter real v_read = {v_read};
+\tparameter real v_write = {v_write};
+"""
+    if event_driven:
+        yield "\tparameter real t_tr = 10n;\n"
+
+    yield "\n".join(f"\tinput {port};" for port in inputs) + "\n"
+    yield "\tinout " + ", ".join(inouts) + ";\n"
+    yield "\toutput " + ", ".join(outputs) + ";\n"
+    yield "\telectrical " + ", ".join(ports) + ";\n"
+
+    yield "\n\tinteger ca_decoded;\n"
+    yield "\tinteger ba_decoded;\n"
+    for i in inouts:
+        yield f"\treal v_{i};\n"
+    for i in outputs:
+        yield f"\treal v_{i};\n"
+    yield "\n\tanalog begin\n"
+
+    # Decoding logic
+    yield "\t\tca_decoded = 0;\n"
+    for i, ca in enumerate(ca_ports):
+        yield f"\t\tca_decoded = ca_decoded + (V({ca}) > 0.5 ? (1 << {i}) : 0);\n"
+    yield "\t\tba_decoded = 0;\n"
+    for i, ba in enumerate(ba_ports):
+        yield f"\t\tba_decoded = ba_decoded + (V({ba}) > 0.5 ? (1 << {i}) : 0);\n"
+
+
+    # Idle state
+    yield "\n\t\tif (V(idle) > 0.5) begin\n"
+    for word in range(num_words):
+        for bit in range(num_bits_per_word):
+            yield f"\t\t\tv_vc{word}b{bit}p = v_read;\n"
+            yield f"\t\t\tv_vc{word}b{bit}n = 0.0;\n"
+    yield "\t\tend\n"
+
+    # Majority Logic
+    if word_maj:
+        yield "\t\telse if (V(maj) > 0.5 && V(bit_or_word) < 0.5) begin\n"
+        yield f"\t\t\tif (ca_decoded < {num_words}) begin\n"
+        yield f"\t\t\t\tcase (ca_decoded)\n"
+        for word in range(num_words):
+            yield f"\t\t\t\t\t{word}: begin\n"
+            for bit in range(num_bits_per_word):
+                yield f"\t\t\t\t\t\tv_vc{word}b{bit}p = (V(wb{bit}) > 0.5 ? v_write : 0.0);\n"
+                yield f"\t\t\t\t\t\tv_vc{word}b{bit}n = (V(wbn{bit}) > 0.5 ? v_write : 0.0);\n"
+            yield f"\t\t\t\t\tend\n"
+        yield f"\t\t\t\tendcase\n"
+        yield "\t\t\tend\n"
+        yield "\t\tend\n"
+    yield "\t\telse if (V(maj) > 0.5) begin\n"
+    yield f"\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin\n"
+    yield f"\t\t\t\tcase (ca_decoded)\n"
+    for word in range(num_words):
+        yield f"\t\t\t\t\t{word}: begin\n"
+        yield f"\t\t\t\t\t\tcase (ba_decoded)\n"
+        for bit in range(num_bits_per_word):
+            yield f"\t\t\t\t\t\t\t{bit}: begin\n"
+            yield f"\t\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(majp) > 0.5 ? v_write : 0.0);\n"
+            yield f"\t\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(majn) > 0.5 ? v_write : 0.0);\n"
+            yield f"\t\t\t\t\t\t\tend\n"
+        yield f"\t\t\t\t\t\tendcase\n"
+        yield f"\t\t\t\t\tend\n"
+    yield f"\t\t\t\tendcase\n"
+    yield "\t\t\tend\n"
+    yield "\t\tend\n"
+
+    # Write Logic
+    yield "\t\telse if (V(wr) > 0.5) begin\n"
+    yield f"\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin\n"
+    yield f"\t\t\t\tif(V(bit_or_word)>0.5) begin\n"
+    yield f"\t\t\t\t\tcase (ca_decoded)\n"
+    for word in range(num_words):
+        yield f"\t\t\t\t\t\t{word}: begin\n"
+        yield f"\t\t\t\t\t\t\tcase (ba_decoded)\n"
+        for bit in range(num_bits_per_word):
+            yield f"\t\t\t\t\t\t\t\t{bit}: begin\n"
+            yield f"\t\t\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(wb0) > 0.5 ? v_write : 0.0);\n"
+            yield f"\t\t\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(wb0) > 0.5 ? 0.0 : v_write);\n"
+            yield f"\t\t\t\t\t\t\t\tend\n"
+        yield f"\t\t\t\t\t\t\tendcase\n"
+        yield f"\t\t\t\t\t\tend\n"
+    yield f"\t\t\t\t\tendcase\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\t\telse begin\n"
+    yield "\t\t\t\t\tcase (ca_decoded)\n"
+    for word in range(num_words):
+        yield f"\t\t\t\t\t\t{word}: begin\n"
+        for bit in range(num_bits_per_word):
+            yield f"\t\t\t\t\t\t\tv_vc{word}b{bit}p = (V(wb{bit}) > 0.5 ? v_write : 0.0);\n"
+            yield f"\t\t\t\t\t\t\tv_vc{word}b{bit}n = (V(wb{bit}) > 0.5 ? 0.0 : v_write);\n"
+        yield f"\t\t\t\t\t\tend\n"
+    yield "\t\t\t\tendcase\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\tend\n"
+    yield "\t\tend\n"
+
+    # Read logic
+    yield "\t\telse begin"
+    yield f"\n\t\t\tif (ca_decoded < {num_words} && ba_decoded < {num_bits_per_word}) begin"
+    yield f"\n\t\t\t\tif (V(bit_or_word)>0.5) begin"
+    yield "\n\t\t\t\t\tcase (ca_decoded)"
+    for word in range(num_words):
+        yield f"\n\t\t\t\t\t\t{word}: begin\n\t\t\t\t\t\t\tcase (ba_decoded)"
+        for bit in range(num_bits_per_word):
+            yield f"\n\t\t\t\t\t\t\t\t{bit}: begin"
+            yield f"\n\t\t\t\t\t\t\t\t\t\tif(I(vc{word}b{bit}n)>650u && I(vc{word}b{bit}n)<800u) begin"
+            yield f"\n\t\t\t\t\t\t\t\t\t\t\tv_outb0 = v_write;"
+            yield f"\n\t\t\t\t\t\t\t\t\t\tend"
+            yield f"\n\t\t\t\t\t\t\t\t\t\telse begin"
+            yield f"\n\t\t\t\t\t\t\t\t\t\t\tv_outb0 = 0.0;"
+            yield f"\n\t\t\t\t\t\t\t\t\t\tend"
+            yield f"\n\t\t\t\t\t\t\t\tend"
+        yield "\n\t\t\t\t\t\t\tendcase\n\t\t\t\t\t\tend"
+    yield "\n\t\t\t\t\tendcase"
+    yield f"\n\t\t\t\tend"
+    yield "\n\t\t\t\telse begin"
+    yield "\n\t\t\t\t\tcase (ca_decoded)"
+    for word in range(num_words):
+        yield f"\n\t\t\t\t\t\t{word}: begin\n\t\t\t\t\t\t\t"
+        for bit in range(num_bits_per_word):
+            yield f"\n\t\t\t\t\t\t\tif(I(vc{word}b{bit}n)>650u && I(vc{word}b{bit}n)<800u)"
+            yield f"\n\t\t\t\t\t\t\t\tv_outb{bit} = v_write;"
+            yield f"\n\t\t\t\t\t\t\telse"
+            yield f"\n\t\t\t\t\t\t\t\tv_outb{bit} = 0.0;"
+        yield "\n\t\t\t\t\t\tend"
+    yield "\n\t\t\t\tendcase\n\t\t\tend\n\t\tend\n"
+    yield "\t\tend\n"
+
+    # Continuos assignment for inouts
+    for i in inouts + outputs:
+        if event_driven:
+            yield f"\t\tV({i}) <+ transition(v_{i}, 0, t_tr);\n"
+        else:
+            yield f"\t\tV({i}) <+ v_{i};\n"
+    yield "\tend\n"
+
+    yield "endmodule\n"
+
+
+def iter_bus_cas_module(no_bits_in_column_address=2, no_of_bits_in_bit_address_in_word=2,
+                        v_read=0.9, v_write=1.8, event_driven=False, word_maj=False):
+    """
+    Yields a CAS module with the same behaviour as iter_cas_module, but with
+    ports ca, ba, wb, vcp, vcn and outb as buses. Cell word*num_bits_per_word
+    + bit is vcp[...]/vcn[...]. Only the addressed cell (or word) is updated
+    and probed; the source size does not depend on the array size.
+    """
+    num_words = 2 ** no_bits_in_column_address
+    num_bits_per_word = 2 ** no_of_bits_in_bit_address_in_word
+    num_cells = num_words * num_bits_per_word
+    if event_driven:
+        drive_p, drive_n, drive_out = "transition(v_p[i], 0, t_tr)", "transition(v_n[i], 0, t_tr)", "transition(v_out[i], 0, t_tr)"
+    else:
+        drive_p, drive_n, drive_out = "v_p[i]", "v_n[i]", "v_out[i]"
+    if word_maj:
+        wbn_port = ", wbn"
+        wbn_input = f"\tinput [0:{num_bits_per_word - 1}] wbn;\n"
+        wbn_electrical = f"\telectrical [0:{num_bits_per_word - 1}] wbn;\n"
+        word_maj_branch = """\t\telse if (V(maj) > 0.5 && V(bit_or_word) < 0.5) begin
+\t\t\tif (ca_decoded < num_words) begin
+\t\t\t\tfor (j = 0; j < num_bits_per_word; j = j + 1) begin
+\t\t\t\t\tv_p[ca_decoded * num_bits_per_word + j] = (V(wb[j]) > 0.5 ? v_write : 0.0);
+\t\t\t\t\tv_n[ca_decoded * num_bits_per_word + j] = (V(wbn[j]) > 0.5 ? v_write : 0.0);
+\t\t\t\tend
+\t\t\tend
+\t\tend
+"""
+    else:
+        wbn_port = wbn_input = wbn_electrical = word_maj_branch = ""
+
+    yield f"""// Auto-generated Verilog-A CAS module with decoding logic, bus ports
+
+`include "constants.vams"
+`include "disciplines.vams"
+
+module CAS(wr, bit_or_word, maj, majp, majn, idle, ca, ba, wb{wbn_port}, vcp, vcn, outb);
+\tparameter integer no_bits_in_column_address = {no_bits_in_column_address};
+\tparameter integer no_of_bits_in_bit_address_in_word = {no_of_bits_in_bit_address_in_word};
+\tparameter integer num_words = {num_words};
+\tparameter integer num_bits_per_word = {num_bits_per_word};
+\tparameter real v_read = {v_read};
+\tparameter real v_write = {v_write};
+\tparameter real t_tr = 10n;
+\tinput wr, bit_or_word, maj, majp, majn, idle;
+\tinput [0:{no_bits_in_column_address - 1}] ca;
+\tinput [0:{no_of_bits_in_bit_address_in_word - 1}] ba;
+\tinput [0:{num_bits_per_word - 1}] wb;
+{wbn_input}\tinout [0:{num_cells - 1}] vcp, vcn;
+\toutput [0:{num_bits_per_word - 1}] outb;
+\telectrical wr, bit_or_word, maj, majp, majn, idle;
+\telectrical [0:{no_bits_in_column_address - 1}] ca;
+\telectrical [0:{no_of_bits_in_bit_address_in_word - 1}] ba;
+\telectrical [0:{num_bits_per_word - 1}] wb;
+{wbn_electrical}\telectrical [0:{num_cells - 1}] vcp, vcn;
+\telectrical [0:{num_bits_per_word - 1}] outb;
+
+\tgenvar i, j;
+\tinteger ca_decoded;
+\tinteger ba_decoded;
+\tinteger sel;
+\tinteger k;
+\treal v_p[0:{num_cells - 1}];
+\treal v_n[0:{num_cells - 1}];
+\treal v_out[0:{num_bits_per_word - 1}];
+\treal i_n[0:{num_bits_per_word - 1}];
+
+\tanalog begin
+\t\tca_decoded = 0;
+\t\tfor (i = 0; i < no_bits_in_column_address; i = i + 1)
+\t\t\tca_decoded = ca_decoded + (V(ca[i]) > 0.5 ? (1 << i) : 0);
+\t\tba_decoded = 0;
+\t\tfor (i = 0; i < no_of_bits_in_bit_address_in_word; i = i + 1)
+\t\t\tba_decoded = ba_decoded + (V(ba[i]) > 0.5 ? (1 << i) : 0);
+\t\tsel = ca_decoded * num_bits_per_word + ba_decoded;
+
+\t\tif (V(idle) > 0.5) begin
+\t\t\tfor (k = 0; k < num_words * num_bits_per_word; k = k + 1) begin
+\t\t\t\tv_p[k] = v_read;
+\t\t\t\tv_n[k] = 0.0;
+\t\t\tend
+\t\tend
+{word_maj_branch}\t\telse if (V(maj) > 0.5) begin
+\t\t\tif (ca_decoded < num_words && ba_decoded < num_bits_per_word) begin
+\t\t\t\tv_p[sel] = (V(majp) > 0.5 ? v_write : 0.0);
+\t\t\t\tv_n[sel] = (V(majn) > 0.5 ? v_write : 0.0);
+\t\t\tend
+\t\tend
+\t\telse if (V(wr) > 0.5) begin
+\t\t\tif (ca_decoded < num_words && ba_decoded < num_bits_per_word) begin
+\t\t\t\tif (V(bit_or_word) > 0.5) begin
+\t\t\t\t\tv_p[sel] = (V(wb[0]) > 0.5 ? v_write : 0.0);
+\t\t\t\t\tv_n[sel] = (V(wb[0]) > 0.5 ? 0.0 : v_write);
+\t\t\t\tend
+\t\t\t\telse begin
+\t\t\t\t\tfor (j = 0; j < num_bits_per_word; j = j + 1) begin
+\t\t\t\t\t\tv_p[ca_decoded * num_bits_per_word + j] = (V(wb[j]) > 0.5 ? v_write : 0.0);
+\t\t\t\t\t\tv_n[ca_decoded * num_bits_per_word + j] = (V(wb[j]) > 0.5 ? 0.0 : v_write);
+\t\t\t\t\tend
+\t\t\t\tend
+\t\t\tend
+\t\tend
+\t\telse begin
+\t\t\tif (ca_decoded < num_words && ba_decoded < num_bits_per_word) begin
+\t\t\t\t// Probe only the addressed word
+\t\t\t\tfor (i = 0; i < num_words; i = i + 1) begin
+\t\t\t\t\tif (i == ca_decoded) begin
+\t\t\t\t\t\tfor (j = 0; j < num_bits_per_word; j = j + 1)
+\t\t\t\t\t\t\ti_n[j] = I(vcn[i * num_bits_per_word + j]);
+\t\t\t\t\tend
+\t\t\t\tend
+\t\t\t\tif (V(bit_or_word) > 0.5) begin
+\t\t\t\t\tv_out[0] = ((i_n[ba_decoded] > 650u && i_n[ba_decoded] < 800u) ? v_write : 0.0);
+\t\t\t\tend
+\t\t\t\telse begin
+\t\t\t\t\tfor (k = 0; k < num_bits_per_word; k = k + 1)
+\t\t\t\t\t\tv_out[k] = ((i_n[k] > 650u && i_n[k] < 800u) ? v_write : 0.0);
+\t\t\t\tend
+\t\t\tend
+\t\tend
+
+\t\t// Continuos assignment for inouts
+\t\tfor (i = 0; i < num_words * num_bits_per_word; i = i + 1) begin
+\t\t\tV(vcp[i]) <+ {drive_p};
+\t\t\tV(vcn[i]) <+ {drive_n};
+\t\tend
+\t\tfor (i = 0; i < num_bits_per_word; i = i + 1)
+\t\t\tV(outb[i]) <+ {drive_out};
+\tend
+endmodule
+"""
+
+
+def generate_cas_module(no_bits_in_column_address=2, no_of_bits_in_bit_address_in_word=2,
+                        v_read=0.9, v_write=1.8, out=None, bus=False, event_driven=False, word_maj=False):
+    """
+    Generates the CAS module. When out (a file-like sink) is given the module
+    is streamed into it, otherwise it is returned as a string.
+    """
+    chunks = iter_cas_module(no_bits_in_column_address, no_of_bits_in_bit_address_in_word, v_read, v_write, bus, event_driven,
+                             word_maj)
+    if out is None:
+        return "".join(chunks)
+    for chunk in chunks:
+        out.write(chunk)
+
+
+if __name__ == "__main__":
+    # Generate a 2x2-bit CAS block
+    with open("CAS_full.va", "w") as f:
+        generate_cas_module(4, 1, out=f)
+
+    print("CAS with decoding + logic saved to CAS_full.va")
@@ -1,65 +1,135 @@
-def generate_ras_veriloga(
-    filename="RAS_generated.va",
+def iter_ras_veriloga(
     v_on=1.2,
     num_addr_bits=2,
     input_prefix="in",
     output_prefix="out",
-    idle_signal="idle"
+    idle_signal="idle",
+    compact=False,
+    event_driven=False,
+    multi_row=False,
+    mask_prefix="mask"
 ):
+    """
+    Yields the RAS module chunk by chunk.
+
+    With compact set the address is decoded once into an integer and every
+    output compares against it, so the module grows as O(2^n) instead of
+    O(4^n) with the same ports and behaviour. event_driven implies compact
+    and drives the outputs through transition().
+
+    multi_row adds one mask input per address bit. A high mask bit makes
+    that address bit a don't care, so every row matching the others turns
+    on and one write reaches all of them. All mask bits low is the one-hot
+    select. multi_row implies compact.
+    """
     num_outputs = 2 ** num_addr_bits
     inputs = [f"{input_prefix}{i}" for i in range(num_addr_bits)]
     outputs = [f"{output_prefix}{i}" for i in range(num_outputs)]
+    masks = [f"{mask_prefix}{i}" for i in range(num_addr_bits)] if multi_row else []
 
-    port_list = ", ".join(inputs + outputs + [idle_signal])
-    electricals = ", ".join(inputs + outputs + [idle_signal])
+    port_list = ", ".join(inputs + masks + outputs + [idle_signal])
+    electricals = ", ".join(inputs + masks + outputs + [idle_signal])
 
-    header = f"""`include "disciplines.vams"
+    yield f"""`include "disciplines.vams"
 `include "constants.vams"
 
 module RAS({port_list});
   parameter real v_on = {v_on};
   parameter integer no_of_bits_in_row_address = {num_addr_bits};
-  input {", ".join(inputs)};
+  input {", ".join(inputs + masks)};
   input {idle_signal};
   output {", ".join(outputs)};
 
   electrical {electricals};
+"""
+
+    if compact or event_driven or multi_row:
+        yield from _iter_compact_decode(inputs, outputs, idle_signal, event_driven, masks)
+        return
 
+    yield f"""
   analog begin
     if (V({idle_signal}) < 0.5) begin
 """
 
-    logic = ""
     for idx in range(num_outputs):
         conditions = " && ".join(
             f"(V({inputs[bit]}) {'< 0.5' if (idx >> bit) & 1 == 0 else '>= 0.5'})"
             for bit in range(num_addr_bits)
         )
-        logic += f"      if ({conditions}) begin\n"
+        yield f"      if ({conditions}) begin\n"
         for i, out in enumerate(outputs):
             voltage = "v_on" if i == idx else "0.0"
-            logic += f"        V({out}) <+ {voltage};\n"
-        logic += "      end\n"
+            yield f"        V({out}) <+ {voltage};\n"
+        yield "      end\n"
 
-    reset = "\n".join([f"      V({out}) <+ 0.0;" for out in outputs])
-
-    footer = f"""    end else begin
-{reset}
-    end
+    yield "    end else begin\n"
+    for out in outputs:
+        yield f"      V({out}) <+ 0.0;\n"
+    yield """    end
   end
 endmodule
 """
 
-    with open(filename, "w") as f:
-        f.write(header + logic + footer)
 
-    print(f"RAS module generated and saved as: {filename}")
+def _iter_compact_decode(inputs, outputs, idle_signal, event_driven=False, masks=()):
+    if event_driven:
+        yield "  parameter real t_tr = 10n;\n"
+    yield "  integer row_decoded;\n"
+    if masks:
+        yield "  integer row_mask;\n"
+    yield "\n  analog begin\n"
+    yield f"    if (V({idle_signal}) < 0.5) begin\n"
+    yield "      row_decoded = 0;\n"
+    for bit, inp in enumerate(inputs):
+        yield f"      row_decoded = row_decoded + (V({inp}) >= 0.5 ? {1 << bit} : 0);\n"
+    yield "    end else begin\n"
+    yield "      row_decoded = -1;\n"
+    yield "    end\n"
+    if masks:
+        yield "    row_mask = 0;\n"
+        for bit, mask in enumerate(masks):
+            yield f"    row_mask = row_mask + (V({mask}) >= 0.5 ? {1 << bit} : 0);\n"
+    for idx, out in enumerate(outputs):
+        if masks:
+            selected = f"row_decoded >= 0 && (row_decoded & ~row_mask) == ({idx} & ~row_mask)"
+        else:
+            selected = f"row_decoded == {idx}"
+        if event_driven:
+            yield f"    V({out}) <+ transition({selected} ? v_on : 0.0, 0, t_tr);\n"
+        else:
+            yield f"    V({out}) <+ ({selected} ? v_on : 0.0);\n"
+    yield """  end
+endmodule
+"""
 
-generate_ras_veriloga(
-    filename="RAS_full.va",
+
+def generate_ras_veriloga(
+    filename="RAS_generated.va",
     v_on=1.2,
-    num_addr_bits=2, 
+    num_addr_bits=2,
     input_prefix="in",
     output_prefix="out",
-    idle_signal="idle"
-)
+    idle_signal="idle",
+    compact=False,
+    event_driven=False,
+    multi_row=False,
+    mask_prefix="mask"
+):
+    with open(filename, "w") as f:
+        for chunk in iter_ras_veriloga(v_on, num_addr_bits, input_prefix, output_prefix, idle_signal, compact, event_driven,
+                                       multi_row, mask_prefix):
+            f.write(chunk)
+
+    print(f"RAS module generated and saved as: {filename}")
+
+
+if __name__ == "__main__":
+    generate_ras_veriloga(
+        filename="RAS_full.va",
+        v_on=1.2,
+        num_addr_bits=2,
+        input_prefix="in",
+        output_prefix="out",
+        idle_signal="idle"
+    )
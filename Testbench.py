@@ -1,440 +1,1156 @@
-import math
-def generate_testbench(row_bits,col_bits, no_of_data_bits):
-    """
-    Generates a Verilog-A testbench for the RAS module.
-
-    Args:
-        no_of_address_bits (int): Number of address bits.
-        no_of_data_bits (int): Number of data bits.
-    """
-
-    no_of_address_bits = row_bits + col_bits
-    instruction_length = 3*(1+no_of_address_bits+no_of_data_bits)
-    max_possible = 2**(col_bits+no_of_data_bits)
-    final_result = ""
-    if instruction_length > max_possible:
-        print("Instruction length exceeds maximum possible value.")
-        return
-    if no_of_address_bits < 1 or no_of_data_bits < 1:
-        print("Number of address bits and data bits must be at least 1.")
-        return
-    # Find the best possible value of instruction length
-    instruction_words = math.ceil(instruction_length / (2**(no_of_data_bits)))
-    # Define the parameters
-    num_addr_bits = no_of_address_bits
-    num_data_bits = no_of_data_bits
-    num_data_outputs = 2 ** num_data_bits
-
-    inputs = ["clk"]
-    data_outputs = [f"data{i}" for i in range(num_data_outputs)]
-    address_outputs = [f"addr{i}" for i in range(num_addr_bits)]
-    plim = "plim"
-    wr = "wr"
-
-    # Create the Verilog-A testbench code
-    tb_code = f"""`include "disciplines.vams"
-`include "constants.vams"
-
-module testbench(
-\tinput electrical clk,
-\toutput electrical idle,
-"""
-    tb_code += f"\toutput electrical {plim},\n"
-    tb_code += f"\toutput electrical {wr},\n"
-    for i in range(num_data_outputs):
-        tb_code += f"\toutput electrical data{i},\n"
-    for i in range(num_addr_bits):
-        tb_code += f"\toutput electrical addr{i},\n"
-    for i in range(num_data_outputs):
-        tb_code += f"\tinput electrical cross_data{i},\n"
-    tb_code += f"\tinput electrical instr_exec\n"
-    tb_code += ");\n\n"
-    tb_code += "\tinteger state = 0;\n"
-    tb_code += "\treal v_idle = 1.0;\n"
-    tb_code += "\treal v_plim = 0.0;\n"
-    tb_code += "\treal v_wr = 0.0;\n"
-    for i in range(num_data_outputs):
-        tb_code += f"\treal v_data{i};\n"
-    for i in range(num_addr_bits):
-        tb_code += f"\treal v_addr{i};\n"
-    tb_code += "\treal prev_clk;\n"
-
-    tb_code += "\tanalog begin\n"
-    tb_code += "\t\t@(initial_step) begin\n"
-    tb_code += "\t\t\tprev_clk = V(clk);\n"
-    tb_code += "\t\tend\n\n"
-
-    tb_code += "\t\tif(V(clk) > 0.5 && prev_clk <= 0.5) begin\n"
-    state = 0
-    tb_code += "\t\t\tcase (state)\n"
-    while(1):
-        print("Do you want to perform any action?(y/n)")
-        action = input()
-        if action == 'n' or action == 'N':
-            break
-        elif action == 'y' or action == 'Y':
-            print("Enter the action you want to perform ('w' for write, 'r' for read, 'i' for writing an instruction into crossbar, e for executing instruction):")
-            action = input()
-            if action == 'w':
-                print(f"Enter teh address to write to (in binary {num_addr_bits} bits):")
-                addr = input()
-                # Perform check for address length and binary format
-                if len(addr) != num_addr_bits or not all(bit in '01' for bit in addr):
-                    print("Invalid address format. Please enter a binary number of the correct length.")
-                    continue
-                print(f"Enter the data to write (in binary {2**num_data_bits} bits):")
-                data = input()
-                # Perform check for data length and binary format
-                if len(data) != num_data_outputs or not all(bit in '01' for bit in data):
-                    print("Invalid data format. Please enter a binary number of the correct length.")
-                    continue
-                final_result += f"Writing data {data} to address {addr}\n"
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tv_plim = 0.0;\n"
-                tb_code += f"\t\t\t\t\tv_wr = 1.0;\n"
-                tb_code += "\t\t\t\t\tv_idle = 0.0;\n"
-                for i, b in enumerate(reversed(data_outputs)):
-                    tb_code += f"\t\t\t\t\tv_{b} = {data[i]};\n"
-                for i, b in enumerate(reversed(address_outputs)):
-                    tb_code += f"\t\t\t\t\tv_{b} = {addr[i]};\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\t\tv_idle = 1.0;\n"
-                tb_code += "\t\t\t\t\t$display(\"Data written successfully\");\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-            elif action == 'r':
-                print(f"Enter teh address to read from (in binary {num_addr_bits}):")
-                addr = input()
-                # Perform check for address length and binary format
-                if len(addr) != num_addr_bits or not all(bit in '01' for bit in addr):
-                    print("Invalid address format. Please enter a binary number of the correct length.")
-                    continue
-                final_result += f"Reading data from address {addr}\n"
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tv_plim = 0.0;\n"
-                tb_code += f"\t\t\t\t\tv_wr = 0.0;\n"
-                tb_code += "\t\t\t\t\tv_idle = 0.0;\n"
-                for i, b in enumerate(reversed(address_outputs)):
-                    tb_code += f"\t\t\t\t\tv_{b} = {addr[i]};\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tv_idle = 1.0;\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\t\tv_idle = 1.0;\n"
-                tb_code += "\t\t\t\t\t$display(\"Data read successfully\");\n"
-                tb_code += "\t\t\t\t\t$display("
-                for i in reversed(range(num_data_outputs)):
-                    tb_code += f"V(cross_data{i})"
-                    if i != 0:
-                        tb_code += ", "
-                tb_code += ");\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-            elif action == 'i':
-                print(f"Enter the starting address of the instruction to be stored (in binary {num_addr_bits}):")
-                addr = input()
-                # Perform check for address length and binary format
-                if len(addr) != num_addr_bits or not all(bit in '01' for bit in addr):
-                    print("Invalid address format. Please enter a binary number of the correct length.")
-                    continue
-                const_addr = int(addr,2)
-                # check if the instructions fit in same row starting from the address
-                check = const_addr + instruction_words - 1
-                check = format(check, f'0{num_addr_bits}b')
-                if check[:row_bits] != addr[:row_bits]:
-                    print("The instructions do not fit in the same row. Please enter a valid address.")
-                    continue
-                print("Enter the type of instruction (0 MAJ, 1 AND, 2 OR, 3 NOT):")
-                instr = input()
-                # Perform check for instruction format
-                if instr not in ['0', '1', '2', '3']:
-                    print("Invalid instruction format. Please enter a valid instruction type.")
-                    continue
-                if(instr == '0'):
-                    instr = "000"
-                    print(f"Enter the word address of opearand a (in binary {num_addr_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_addr_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the bit address of operand a (in binary {num_data_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_data_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the word address of opearand b (in binary {num_addr_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_addr_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the bit address of operand b (in binary {num_data_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_data_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the word address of opearand c (in binary {num_addr_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_addr_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    print(f"Enter the bit address of operand c (in binary {num_data_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_data_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    final_result += f"Writing instruction at address {addr} to perform MAJ of the bits at address {instr[3:3+(row_bits + col_bits)] + ' ' + instr[3+(row_bits + col_bits):3+(row_bits+col_bits+num_data_bits)]},{instr[3:3+2*(row_bits + col_bits)] + ' ' + instr[3+2*(row_bits + col_bits):3+2*(row_bits+col_bits+num_data_bits)]},{instr[3:3+3*(row_bits + col_bits)] + ' ' + instr[3+3*(row_bits + col_bits):3+3*(row_bits+col_bits+num_data_bits)]} and store at {instr[3:3+3*(row_bits + col_bits)] + ' ' + instr[3+3*(row_bits + col_bits):3+3*(row_bits+col_bits+num_data_bits)]}\n"
-                elif(instr == '1'):
-                    instr = "001"
-                    print(f"Enter the word address of opearand a (in binary {num_addr_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_addr_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the bit address of operand a (in binary {num_data_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_data_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the word address of opearand b (in binary {num_addr_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_addr_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the bit address of operand b (in binary {num_data_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_data_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the word address of opearand c (in binary {num_addr_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_addr_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    print(f"Enter the bit address of operand c (in binary {num_data_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_data_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    final_result += f"Writing instruction at address {addr} to perform AND of the bits at address {instr[3:3+(row_bits + col_bits)] + ' ' + instr[3+(row_bits + col_bits):3+(row_bits+col_bits+num_data_bits)]},{instr[3:3+2*(row_bits + col_bits)] + ' ' + instr[3+2*(row_bits + col_bits):3+2*(row_bits+col_bits+num_data_bits)]} and store at {instr[3:3+3*(row_bits + col_bits)] + ' ' + instr[3+3*(row_bits + col_bits):3+3*(row_bits+col_bits+num_data_bits)]}\n"
-                elif(instr == '2'):
-                    instr = "010"
-                    print(f"Enter the word address of opearand a (in binary {num_addr_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_addr_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the bit address of operand a (in binary {num_data_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_data_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the word address of opearand b (in binary {num_addr_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_addr_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the bit address of operand b (in binary {num_data_bits}):")
-                    addr_b = input()
-                    # Perform check for address length and binary format
-                    if len(addr_b) != num_data_bits or not all(bit in '01' for bit in addr_b):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_b
-                    print(f"Enter the word address of opearand c (in binary {num_addr_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_addr_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    print(f"Enter the bit address of operand c (in binary {num_data_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_data_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    final_result += f"Writing instruction at address {addr} to perform OR of the bits at address {instr[3:3+(row_bits + col_bits)] + ' ' + instr[3+(row_bits + col_bits):3+(row_bits+col_bits+num_data_bits)]},{instr[3:3+2*(row_bits + col_bits)] + ' ' + instr[3+2*(row_bits + col_bits):3+2*(row_bits+col_bits+num_data_bits)]} and store at {instr[3:3+3*(row_bits + col_bits)] + ' ' + instr[3+3*(row_bits + col_bits):3+3*(row_bits+col_bits+num_data_bits)]}\n"
-                elif(instr == '3'):
-                    instr = "011"
-                    print(f"Enter the word address of opearand a (in binary {num_addr_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_addr_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    print(f"Enter the bit address of operand a (in binary {num_data_bits}):")
-                    addr_a = input()
-                    # Perform check for address length and binary format
-                    if len(addr_a) != num_data_bits or not all(bit in '01' for bit in addr_a):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_a
-                    instr += format(0, f'0{num_addr_bits}b')
-                    instr += format(0, f'0{num_data_bits}b')
-                    print(f"Enter the word address of opearand c (in binary {num_addr_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_addr_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    print(f"Enter the bit address of operand c (in binary {num_data_bits}):")
-                    addr_c = input()
-                    # Perform check for address length and binary format
-                    if len(addr_c) != num_data_bits or not all(bit in '01' for bit in addr_c):
-                        print("Invalid address format. Please enter a binary number of the correct length.")
-                        continue
-                    instr += addr_c
-                    final_result += f"Writing instruction at address {addr} to perform NOT of the bits at address {instr[3:3+(row_bits + col_bits)] + ' ' + instr[3+(row_bits + col_bits):3+(row_bits+col_bits+num_data_bits)]} and store at {instr[3:3+3*(row_bits + col_bits)] + ' ' + instr[3+3*(row_bits + col_bits):3+3*(row_bits+col_bits+num_data_bits)]}\n"
-                if len(instr) != instruction_words*2**(num_data_bits):
-                    instr += format(0, f'0{instruction_words*2**(num_data_bits)-len(instr)}b')
-                for j in range(instruction_words):
-                    data = instr[j*2**(num_data_bits):(j+1)*2**(num_data_bits)]
-                    addr = format(const_addr+j, f'0{num_addr_bits}b')
-                    tb_code += f"\t\t\t\t{state}: begin\n"
-                    tb_code += f"\t\t\t\t\tv_plim = 0.0;\n"
-                    tb_code += f"\t\t\t\t\tv_wr = 1.0;\n"
-                    tb_code += "\t\t\t\t\tv_idle = 0.0;\n"
-                    for i, b in enumerate(data_outputs):
-                        tb_code += f"\t\t\t\t\tv_{b} = {data[i]};\n"
-                    for i, b in enumerate(reversed(address_outputs)):
-                        tb_code += f"\t\t\t\t\tv_{b} = {addr[i]};\n"
-                    tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                    tb_code += "\t\t\t\tend\n"
-                    state += 1
-                    tb_code += f"\t\t\t\t{state}: begin\n"
-                    tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                    tb_code += "\t\t\t\tend\n"
-                    state += 1
-                    tb_code += f"\t\t\t\t{state}: begin\n"
-                    tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                    tb_code += "\t\t\t\tend\n"
-                    state += 1
-                    tb_code += f"\t\t\t\t{state}: begin\n"
-                    tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                    tb_code += "\t\t\t\t\tv_idle = 1.0;\n"
-                    if(j == instruction_words - 1): tb_code += "\t\t\t\t\t$display(\"Instruction written successfully\");\n"
-                    tb_code += "\t\t\t\tend\n"
-                    state += 1
-            elif action == 'e':
-                print(f"Enter the address of the instruction to be executed (in binary {num_addr_bits}):")
-                addr = input()
-                # Perform check for address length and binary format
-                if len(addr) != num_addr_bits or not all(bit in '01' for bit in addr):
-                    print("Invalid address format. Please enter a binary number of the correct length.")
-                    continue
-                const_addr = int(addr,2)
-                # check if the instructions fit in same row starting from the address
-                check = const_addr + instruction_words - 1
-                check = format(check, f'0{num_addr_bits}b')
-                if check[:row_bits] != addr[:row_bits]:
-                    print("The instructions do not fit in the same row. Please enter a valid address.")
-                    continue
-                final_result += f"Executing instruction at address {addr}\n"
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += f"\t\t\t\t\tv_plim = 1.0;\n"
-                tb_code += f"\t\t\t\t\tv_wr = 0.0;\n"
-                tb_code += "\t\t\t\t\tv_idle = 0.0;\n"
-                for i, b in enumerate(reversed(address_outputs)):
-                    tb_code += f"\t\t\t\t\tv_{b} = {addr[i]};\n"
-                tb_code += f"\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-                tb_code += f"\t\t\t\t{state}: begin\n"
-                tb_code += "\t\t\t\t\tif(V(instr_exec) > 0.5) begin\n"
-                tb_code += "\t\t\t\t\t\tv_idle = 1.0;\n"
-                tb_code += "\t\t\t\t\t\tv_plim = 0.0;\n"
-                tb_code += "\t\t\t\t\t\tv_wr = 0.0;\n"
-                tb_code += "\t\t\t\t\t$display(\"Instruction executed successfully\");\n"
-                tb_code += f"\t\t\t\t\t\tstate = {state + 1};\n"
-                tb_code += "\t\t\t\t\tend\n"
-                tb_code += "\t\t\t\tend\n"
-                state += 1
-
-                
-
-
-    tb_code += "\t\t\tendcase\n"
-    tb_code += "\t\tend\n\n"
-
-    # Continuous assignment for inputs
-    for i in range(num_data_outputs):
-        tb_code += f"\t\tV(data{i}) <+ v_data{i};\n"
-    for i in range(num_addr_bits):
-        tb_code += f"\t\tV(addr{i}) <+ v_addr{i};\n"
-    tb_code += f"\t\tV({plim}) <+ transition(v_plim,0,10n);\n"
-    tb_code += f"\t\tV({wr}) <+ transition(v_wr,0,10n);\n"
-    tb_code += "\t\tV(idle) <+ transition(v_idle,0,10n);\n"
-    tb_code += "\t\tprev_clk = V(clk);\n\n"
-    tb_code += "\tend\n\n"
-
-
-    tb_code += "endmodule\n\n"
-    # Write this to file
-    with open("testbench.va", "w") as f:
-        f.write(tb_code)
-    
-    print(final_result)
-
-
-if __name__ == "__main__":
-    generate_testbench(2, 4, 1)
-    print("Testbench generated and saved as: testbench.va")
+import math
+
+from contoller import COMPACT_OPERANDS, compact_lengths, trace_level_value
+
+# Opcode field and operands of each instruction, see contoller.MICROCODE,
+# contoller.CONTROL_OPCODES (program counter only),
+# contoller.WORD_MICROCODE (word_ops only) and contoller.FUSED_MICROCODE
+# (fused_ops only)
+OPCODES = {"MAJ": "000", "AND": "001", "OR": "010", "NOT": "011",
+           "HALT": "100", "JMP": "101", "JT": "110", "JF": "111",
+           "VMAJ": "100", "VAND": "101", "VOR": "110", "VNOT": "111",
+           "FA": "100", "XOR": "101", "COPY": "110"}
+OPERANDS = {"MAJ": "abc", "AND": "abc", "OR": "abc", "NOT": "ac",
+            "HALT": "", "JMP": "c", "JT": "ac", "JF": "ac",
+            "VMAJ": "abc", "VAND": "abc", "VOR": "abc", "VNOT": "ac",
+            "FA": "abc", "XOR": "abc", "COPY": "ac"}
+WORD_OPERATIONS = ("VMAJ", "VAND", "VOR", "VNOT")
+# First field of each stimulus record, see stimulus_records
+STIMULUS_KINDS = {"w": 0, "r": 1, "e": 2, "d": 3}
+DUMP_FILE = "crossbar_dump.hex"
+
+
+def _is_binary(value, length):
+    return len(value) == length and all(bit in '01' for bit in value)
+
+
+def _describe_instruction(name, addr, instr, row_bits, col_bits, num_data_bits):
+    # operand fields a, b and c as word and bit address
+    field = row_bits + col_bits + num_data_bits
+    words = [instr[3+k*field:3+k*field+row_bits+col_bits] for k in range(3)]
+    a, b, c = [words[k] + ' ' + instr[3+k*field+row_bits+col_bits:3+(k+1)*field] for k in range(3)]
+    if name is None:
+        return f"Writing instruction at address {addr}\n"
+    if name == "HALT":
+        return f"Writing instruction at address {addr} to halt\n"
+    if name in ("JMP", "JT", "JF"):
+        condition = {"JMP": "", "JT": f" if the bit at {a} is 1", "JF": f" if the bit at {a} is 0"}[name]
+        return f"Writing instruction at address {addr} to jump to {words[2]}{condition}\n"
+    if name in WORD_OPERATIONS:
+        shown = ",".join(words[:2] if name in ("VAND", "VOR") else words[:1] if name == "VNOT" else words)
+        return f"Writing instruction at address {addr} to perform {name[1:]} of the words at address {shown} and store at {words[2]}\n"
+    if name == "FA":
+        return f"Writing instruction at address {addr} to add the bits at address {a},{b} with carry {c}, store the sum at {b} and the carry at {c}\n"
+    if name == "COPY":
+        return f"Writing instruction at address {addr} to copy the bit at address {a} to {c}\n"
+    if name == "MAJ":
+        return f"Writing instruction at address {addr} to perform MAJ of the bits at address {a},{b},{c} and store at {c}\n"
+    if name == "NOT":
+        return f"Writing instruction at address {addr} to perform NOT of the bits at address {a} and store at {c}\n"
+    return f"Writing instruction at address {addr} to perform {name} of the bits at address {a},{b} and store at {c}\n"
+
+
+def assemble(name, operands, num_addr_bits, num_data_bits):
+    """
+    Encodes one instruction as the bit string stored from the instruction
+    address onwards (before padding to whole words).
+
+    Args:
+        name (str): MAJ, AND, OR, NOT, HALT, JMP, JT, JF, VMAJ, VAND, VOR,
+            VNOT, FA, XOR or COPY.
+        operands (list): "word:bit" binary addresses, a, b and c (a and c for
+            NOT and COPY). The result is stored at c; FA stores the sum of
+            a, b and carry c at b and the carry at c. Jumps take the target
+            word as c, which may omit the bit, and JT/JF test a. The word
+            operations take words, the bits may be omitted.
+    """
+    name = name.upper()
+    if name not in OPCODES:
+        raise ValueError(f"Unknown instruction {name!r}, expected one of {list(OPCODES)}")
+    if len(operands) != len(OPERANDS[name]):
+        raise ValueError(f"{name} takes {len(OPERANDS[name])} operands, got {len(operands)}")
+    fields = dict(zip(OPERANDS[name], operands))
+    instr = OPCODES[name]
+    for x in "abc":
+        if x not in fields:
+            instr += format(0, f'0{num_addr_bits}b') + format(0, f'0{num_data_bits}b')
+            continue
+        word, _, bit = fields[x].partition(':')
+        if not bit and ((x == 'c' and name in ("JMP", "JT", "JF")) or name in WORD_OPERATIONS):
+            bit = format(0, f'0{num_data_bits}b')
+        if not _is_binary(word, num_addr_bits) or not _is_binary(bit, num_data_bits):
+            raise ValueError(f"Invalid operand {fields[x]!r}, expected {num_addr_bits} binary digits, ':' and {num_data_bits} binary digits")
+        instr += word + bit
+    return instr
+
+
+def assemble_compact(name, operands, addr, row_bits, col_bits, num_data_bits):
+    """
+    Encodes one instruction in the compact encoding of a controller
+    generated with compact=True, see contoller.compact_lengths: the opcode,
+    the row of the operands relative to the row of addr, then operands a,
+    c and b as column and bit address. Instructions without operand b are
+    encoded without it.
+
+    Args:
+        addr (str): Binary word address the instruction is stored at.
+        operands (list): As for assemble, all in one row.
+    """
+    full = assemble(name, operands, row_bits + col_bits, num_data_bits)
+    name = name.upper()
+    field = row_bits + col_bits + num_data_bits
+    fields = {x: full[3 + k*field:3 + (k+1)*field] for k, x in enumerate("abc")}
+    rows = {fields[x][:row_bits] for x in OPERANDS[name]}
+    if len(rows) > 1:
+        raise ValueError(f"The operands of {name} are in rows {sorted(rows)}, the compact encoding needs one row")
+    offset = (int(rows.pop() if rows else addr[:row_bits], 2) - int(addr[:row_bits], 2)) % 2 ** row_bits
+    instr = OPCODES[name] + format(offset, f'0{row_bits}b')
+    for x in COMPACT_OPERANDS:
+        if x != 'b' or 'b' in OPERANDS[name]:
+            instr += fields[x][row_bits:]
+    return instr
+
+
+def expand_compact(instr, addr, row_bits, col_bits, num_data_bits):
+    """
+    Inverse of assemble_compact: the instruction stored at addr in the
+    layout assemble encodes, with operand b zero when it is left out.
+    """
+    operand = col_bits + num_data_bits
+    instr = instr.ljust(compact_lengths(row_bits, col_bits, num_data_bits)[0], '0')
+    row = (int(addr[:row_bits], 2) + int(instr[3:3 + row_bits], 2)) % 2 ** row_bits
+    fields = {}
+    for k, x in enumerate(COMPACT_OPERANDS):
+        start = 3 + row_bits + k*operand
+        fields[x] = format(row, f'0{row_bits}b') + instr[start:start + operand]
+    return instr[:3] + fields['a'] + fields['b'] + fields['c']
+
+
+def group_bursts(operations, row_bits, col_bits, no_of_data_bits, compact=False):
+    """
+    Groups the RAM accesses of a validated program into the bursts of a
+    controller generated with burst=True. Unmasked writes, the words of
+    instructions included, that follow each other at consecutive addresses
+    of one row become one ('W', addr, words, parts) action, with every word
+    MSB first as in 'w'. Reads become ('R', addr, count, parts) likewise.
+    parts are the grouped actions; a write or read with nothing to join is
+    passed on unchanged, as are the other actions.
+
+    Args:
+        operations (list): Actions checked by validate_program.
+        compact (bool): The instructions are in the compact encoding.
+    """
+    num_data_outputs = 2 ** no_of_data_bits
+    row_words = 2 ** col_bits
+    instruction_words = math.ceil(3*(1+row_bits+col_bits+no_of_data_bits) / num_data_outputs)
+    grouped = []
+    # [kind, first address, words, parts] of the burst being built
+    run = None
+
+    def flush():
+        kind, address, words, parts = run
+        if len(words) == 1 and len(parts) == 1 and parts[0][0] in ('w', 'r'):
+            grouped.append(parts[0])
+        else:
+            addr = format(address, f'0{row_bits + col_bits}b')
+            grouped.append((kind, addr, words if kind == 'W' else len(words), parts))
+
+    for op in operations:
+        if op[0] == 'w' and len(op) == 3:
+            kind, accesses = 'W', [(int(op[1], 2), op[2])]
+        elif op[0] == 'i':
+            words = math.ceil(len(op[3]) / num_data_outputs) if compact else instruction_words
+            instr = op[3].ljust(words * num_data_outputs, '0')
+            # data{i} gets instruction bit i of the word
+            kind, accesses = 'W', [(int(op[1], 2) + j, instr[j*num_data_outputs:(j+1)*num_data_outputs][::-1])
+                                   for j in range(words)]
+        elif op[0] == 'r':
+            kind, accesses = 'R', [(int(op[1], 2), None)]
+        else:
+            if run:
+                flush()
+                run = None
+            grouped.append(op)
+            continue
+        for j, (address, data) in enumerate(accesses):
+            if run and run[0] == kind and address == run[1] + len(run[2]) and address // row_words == run[1] // row_words:
+                run[2].append(data)
+            else:
+                if run:
+                    flush()
+                run = [kind, address, [data], []]
+            if j == 0:
+                run[3].append(op)
+    if run:
+        flush()
+    return grouped
+
+
+def _describe_burst(op, row_bits, col_bits, num_data_bits, compact=False):
+    # Summary of a grouped burst and of the actions it is made of
+    kind, addr, words, parts = op
+    count = len(words) if kind == 'W' else words
+    lines = [f"{'Writing' if kind == 'W' else 'Reading'} {count} words from address {addr} in one burst\n"]
+    for part in parts:
+        if part[0] == 'w':
+            lines.append(f"Writing data {part[2]} to address {part[1]}\n")
+        elif part[0] == 'r':
+            lines.append(f"Reading data from address {part[1]}\n")
+        else:
+            shown = expand_compact(part[3], part[1], row_bits, col_bits, num_data_bits) if compact else part[3]
+            lines.append(_describe_instruction(part[2], part[1], shown, row_bits, col_bits, num_data_bits))
+    return lines
+
+
+def parse_program(source):
+    """
+    Reads a testbench program. Each line is one action, '#' starts a comment:
+
+        w <address> <data> [row mask]
+        r <address>
+        i <address> <MAJ|AND|OR|NOT|HALT|JMP|JT|JF|VMAJ|VAND|VOR|VNOT|FA|XOR|COPY> <word:bit> ...
+        i <address> <instruction bits>
+        e <address>
+        d [file]
+
+    Args:
+        source (str or file-like): Path of the program file or an open file.
+
+    Returns:
+        list: Operation tuples for generate_testbench.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            return parse_program(f)
+    program = []
+    for line in source:
+        tokens = line.split('#', 1)[0].split()
+        if tokens:
+            program.append(tuple(tokens))
+    return program
+
+
+def validate_program(program, row_bits, col_bits, no_of_data_bits, compact=False):
+    """
+    Checks a whole program against the prompts' rules before anything is
+    generated and assembles the instructions.
+
+    Args:
+        program (list): ('w', addr, data), ('r', addr), ('e', addr) and
+            ('i', addr, instruction) tuples, where instruction is the encoded
+            bit string, an assembler line such as "MAJ 000101:0 000110:1
+            001001:0", or the mnemonic and operands as separate items.
+            Addresses and data are binary strings, MSB first. ('d',) or
+            ('d', file) dumps the whole crossbar, see _iter_dump. A write
+            may add a row mask of row_bits binary digits, ('w', addr, data,
+            mask): the row address bits under its ones are don't cares, so
+            the word is written in every matching row.
+        compact (bool): Assemble the instructions with assemble_compact for
+            a controller generated with compact=True. Each instruction is
+            stored in the words its own bits take up, and an execute only
+            needs room for the short form in its row.
+
+    Returns:
+        list: The same actions with every instruction as ('i', addr, name,
+        bits) and every dump as ('d', file).
+    """
+    num_addr_bits = row_bits + col_bits
+    num_data_outputs = 2 ** no_of_data_bits
+    instruction_words = math.ceil(3*(1+num_addr_bits+no_of_data_bits) / num_data_outputs)
+    if compact:
+        full_bits, short_bits = compact_lengths(row_bits, col_bits, no_of_data_bits)
+        instruction_words = math.ceil(full_bits / num_data_outputs)
+    checked = []
+    for n, op in enumerate(program):
+        if not op or op[0] not in ('w', 'r', 'i', 'e', 'd'):
+            raise ValueError(f"Operation {n}: unknown action in {op!r}")
+        action = op[0]
+        if action == 'd':
+            if len(op) > 2 or (len(op) == 2 and (not op[1] or '"' in op[1])):
+                raise ValueError(f"Operation {n}: expected 'd' and an optional file name")
+            checked.append(('d', op[1] if len(op) == 2 else DUMP_FILE))
+            continue
+        if len(op) < 2 or not _is_binary(op[1], num_addr_bits):
+            raise ValueError(f"Operation {n}: invalid address, expected {num_addr_bits} binary digits")
+        addr = op[1]
+        if action == 'e' or (action == 'i' and not compact):
+            # check if the instructions fit in same row starting from the address
+            words = math.ceil(short_bits / num_data_outputs) if compact else instruction_words
+            check = format(int(addr, 2) + words - 1, f'0{num_addr_bits}b')
+            if check[:row_bits] != addr[:row_bits]:
+                raise ValueError(f"Operation {n}: the instructions at {addr} do not fit in the same row")
+        if action == 'w':
+            if len(op) not in (3, 4) or not _is_binary(op[2], num_data_outputs):
+                raise ValueError(f"Operation {n}: invalid data, expected {num_data_outputs} binary digits")
+            if len(op) == 4 and not _is_binary(op[3], row_bits):
+                raise ValueError(f"Operation {n}: invalid row mask, expected {row_bits} binary digits")
+            checked.append(tuple(op[:4]))
+        elif action == 'i':
+            parts = [t for item in op[2:] for t in item.split()]
+            if not parts:
+                raise ValueError(f"Operation {n}: missing instruction")
+            try:
+                if parts[0].isalpha() and compact:
+                    name = parts[0].upper()
+                    instr = assemble_compact(name, parts[1:], addr, row_bits, col_bits, no_of_data_bits)
+                elif parts[0].isalpha():
+                    name = parts[0].upper()
+                    instr = assemble(name, parts[1:], num_addr_bits, no_of_data_bits)
+                else:
+                    instr = "".join(parts)
+                    if not _is_binary(instr, len(instr)) or len(instr) > instruction_words * num_data_outputs:
+                        raise ValueError(f"instruction must be at most {instruction_words * num_data_outputs} binary digits")
+                    name = next((k for k, v in OPCODES.items() if instr.startswith(v)), None)
+            except ValueError as e:
+                raise ValueError(f"Operation {n}: {e}") from None
+            if compact:
+                check = format(int(addr, 2) + math.ceil(len(instr) / num_data_outputs) - 1, f'0{num_addr_bits}b')
+                if check[:row_bits] != addr[:row_bits]:
+                    raise ValueError(f"Operation {n}: the instructions at {addr} do not fit in the same row")
+            checked.append(('i', addr, name, instr))
+        elif len(op) != 2:
+            raise ValueError(f"Operation {n}: unexpected operands in {op!r}")
+        else:
+            checked.append((action, addr))
+    return checked
+
+
+def _iter_write(state, data_outputs, data, address_outputs, addr, message, mask_outputs=(), mask=""):
+    # data[i] drives data_outputs[i], addr and mask are MSB first
+    yield f"\t\t\t\t{state}: begin\n"
+    yield f"\t\t\t\t\tv_plim = 0.0;\n"
+    yield f"\t\t\t\t\tv_wr = 1.0;\n"
+    yield "\t\t\t\t\tv_idle = 0.0;\n"
+    for i, b in enumerate(data_outputs):
+        yield f"\t\t\t\t\tv_{b} = {data[i]};\n"
+    for i, b in enumerate(reversed(address_outputs)):
+        yield f"\t\t\t\t\tv_{b} = {addr[i]};\n"
+    for i, b in enumerate(reversed(mask_outputs)):
+        yield f"\t\t\t\t\tv_{b} = {mask[i]};\n"
+    yield f"\t\t\t\t\tstate = {state + 1};\n"
+    yield "\t\t\t\tend\n"
+    state += 1
+    yield f"\t\t\t\t{state}: begin\n"
+    yield f"\t\t\t\t\tstate = {state + 1};\n"
+    yield "\t\t\t\tend\n"
+    state += 1
+    yield f"\t\t\t\t{state}: begin\n"
+    yield f"\t\t\t\t\tstate = {state + 1};\n"
+    yield "\t\t\t\tend\n"
+    state += 1
+    yield f"\t\t\t\t{state}: begin\n"
+    yield f"\t\t\t\t\tstate = {state + 1};\n"
+    yield "\t\t\t\t\tv_idle = 1.0;\n"
+    if message:
+        yield f"\t\t\t\t\tif (trace_level >= 2) $display(\"{message}\");\n"
+    yield "\t\t\t\tend\n"
+    state += 1
+    return state
+
+
+def _iter_dump(indent, num_data_outputs, num_addr_bits, finish):
+    """
+    Yields one clock edge of a crossbar dump. Address 0 is driven on the
+    edge before the first call, which also opens dump_fd and clears
+    dump_step. Idle stays low, so the controller runs its three state RAM
+    read back to back: address k is driven on step 3k and its word reaches
+    cross_data on step 3k + 4, where it is written to dump_fd as one hex
+    line (bit i of the value is data{i}, as in crossbar.write_image).
+    """
+    t = "\t" * indent
+    num_words = 2 ** num_addr_bits
+    if num_data_outputs > 31:
+        raise ValueError("Dumped words must fit in a Verilog-A integer")
+    yield f"{t}dump_step = dump_step + 1;\n"
+    yield f"{t}if (dump_step % 3 == 0) begin\n"
+    yield f"{t}\tif (dump_step / 3 < {num_words}) begin\n"
+    for i in range(num_addr_bits):
+        yield f"{t}\t\tv_addr{i} = ((dump_step / 3) >> {i}) & 1;\n"
+    yield f"{t}\tend else begin\n"
+    # stop before the controller starts another read
+    yield f"{t}\t\tv_idle = 1.0;\n"
+    yield f"{t}\tend\n"
+    yield f"{t}end else if (dump_step % 3 == 1 && dump_step > 3) begin\n"
+    yield f"{t}\tdump_value = 0;\n"
+    for i in range(num_data_outputs):
+        yield f"{t}\tif (V(cross_data{i}) > 0.5) dump_value = dump_value + {1 << i};\n"
+    yield f"{t}\t$fwrite(dump_fd, \"%h\\n\", dump_value);\n"
+    yield f"{t}\tif (dump_step == {3 * num_words + 1}) begin\n"
+    yield f"{t}\t\t$fclose(dump_fd);\n"
+    yield f"{t}\t\tif (trace_level >= 1) $display(\"Crossbar dumped\");\n"
+    yield f"{t}\t\t{finish}\n"
+    yield f"{t}\tend\n"
+    yield f"{t}end\n"
+
+
+def _iter_operation(state, op, data_outputs, address_outputs, instruction_words, final_result, row_bits,
+                    mask_outputs=(), compact=False):
+    """
+    Yields the case arms for one validated action and returns the next
+    free state. Every write drives mask_outputs, low unless the action
+    has a row mask. With compact an instruction is stored in the words its
+    bits take up, see assemble_compact.
+    """
+    action, addr = op[0], op[1]
+    num_addr_bits = len(address_outputs)
+    num_data_outputs = len(data_outputs)
+    no_mask = "0" * len(mask_outputs)
+    if action == 'w':
+        data = op[2]
+        mask = op[3] if len(op) > 3 else no_mask
+        shown = f" with row mask {mask}" if "1" in mask else ""
+        final_result.append(f"Writing data {data} to address {addr}{shown}\n")
+        state = yield from _iter_write(state, list(reversed(data_outputs)), data, address_outputs, addr,
+                                       "Data written successfully", mask_outputs, mask)
+    elif action == 'r':
+        final_result.append(f"Reading data from address {addr}\n")
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tv_plim = 0.0;\n"
+        yield f"\t\t\t\t\tv_wr = 0.0;\n"
+        yield "\t\t\t\t\tv_idle = 0.0;\n"
+        for i, b in enumerate(reversed(address_outputs)):
+            yield f"\t\t\t\t\tv_{b} = {addr[i]};\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tv_idle = 1.0;\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\t\tv_idle = 1.0;\n"
+        yield "\t\t\t\t\tif (trace_level >= 1) $display(\"Data read successfully\");\n"
+        yield "\t\t\t\t\tif (trace_level >= 1) $display("
+        for i in reversed(range(num_data_outputs)):
+            yield f"V(cross_data{i})"
+            if i != 0:
+                yield ", "
+        yield ");\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+    elif action == 'i':
+        instr = op[3]
+        num_data_bits = num_data_outputs.bit_length() - 1
+        shown = expand_compact(instr, addr, row_bits, num_addr_bits - row_bits, num_data_bits) if compact else instr
+        final_result.append(_describe_instruction(op[2], addr, shown, row_bits, num_addr_bits - row_bits, num_data_bits))
+        if compact:
+            instruction_words = math.ceil(len(instr) / num_data_outputs)
+        const_addr = int(addr, 2)
+        if len(instr) != instruction_words*num_data_outputs:
+            instr += format(0, f'0{instruction_words*num_data_outputs-len(instr)}b')
+        for j in range(instruction_words):
+            data = instr[j*num_data_outputs:(j+1)*num_data_outputs]
+            word_addr = format(const_addr+j, f'0{num_addr_bits}b')
+            message = "Instruction written successfully" if j == instruction_words - 1 else None
+            state = yield from _iter_write(state, data_outputs, data, address_outputs, word_addr, message,
+                                           mask_outputs, no_mask)
+    elif action == 'd':
+        final_result.append(f"Dumping the crossbar to {op[1]}\n")
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tdump_fd = $fopen(\"{op[1]}\", \"w\");\n"
+        yield "\t\t\t\t\tdump_step = 0;\n"
+        yield f"\t\t\t\t\tv_plim = 0.0;\n"
+        yield f"\t\t\t\t\tv_wr = 0.0;\n"
+        yield "\t\t\t\t\tv_idle = 0.0;\n"
+        for b in address_outputs:
+            yield f"\t\t\t\t\tv_{b} = 0;\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield from _iter_dump(5, num_data_outputs, num_addr_bits, f"state = {state + 1};")
+        yield "\t\t\t\tend\n"
+        state += 1
+    elif action == 'e':
+        final_result.append(f"Executing instruction at address {addr}\n")
+        yield f"\t\t\t\t{state}: begin\n"
+        yield f"\t\t\t\t\tv_plim = 1.0;\n"
+        yield f"\t\t\t\t\tv_wr = 0.0;\n"
+        yield "\t\t\t\t\tv_idle = 0.0;\n"
+        for i, b in enumerate(reversed(address_outputs)):
+            yield f"\t\t\t\t\tv_{b} = {addr[i]};\n"
+        yield f"\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+        yield f"\t\t\t\t{state}: begin\n"
+        yield "\t\t\t\t\tif(V(instr_exec) > 0.5) begin\n"
+        yield "\t\t\t\t\t\tv_idle = 1.0;\n"
+        yield "\t\t\t\t\t\tv_plim = 0.0;\n"
+        yield "\t\t\t\t\t\tv_wr = 0.0;\n"
+        yield "\t\t\t\t\tif (trace_level >= 2) $display(\"Instruction executed successfully\");\n"
+        yield f"\t\t\t\t\t\tstate = {state + 1};\n"
+        yield "\t\t\t\t\tend\n"
+        yield "\t\t\t\tend\n"
+        state += 1
+    return state
+
+
+def _iter_gated_state(state, pending, body):
+    """
+    Yields a case arm that runs body once the release condition of the
+    previous action holds, see _iter_handshake_operation.
+    """
+    yield f"\t\t\t\t{state}: begin\n"
+    indent = "\t\t\t\t\t"
+    if pending:
+        condition, release = pending
+        yield f"{indent}if ({condition}) begin\n"
+        indent += "\t"
+        for line in release:
+            yield f"{indent}{line}\n"
+    for line in body:
+        yield f"{indent}{line}\n"
+    yield f"{indent}state = {state + 1};\n"
+    if pending:
+        yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\tend\n"
+    return state + 1
+
+
+def _iter_handshake_operation(state, pending, op, data_outputs, address_outputs, instruction_words, final_result,
+                              row_bits, mask_outputs=(), compact=False):
+    """
+    Yields the case arms for one validated action when the controller
+    reports ram_ready and ram_done. An action is driven as soon as the
+    previous one releases the bus: a write once its request is latched
+    (ram_ready), a read once its data is out (ram_done). Writes stay on the
+    bus with idle low, so back to back writes take the three edges of the
+    controller's RAM cycle.
+
+    Returns:
+        tuple: The next free state and the (condition, lines) release of
+        this action, or None when it ends on its own.
+    """
+    action, addr = op[0], op[1]
+    num_data_outputs = len(data_outputs)
+    drive = [f"v_{b} = {addr[i]};" for i, b in enumerate(reversed(address_outputs))] if action != 'd' else []
+    no_mask = "0" * len(mask_outputs)
+    if action == 'w':
+        data = op[2]
+        mask = op[3] if len(op) > 3 else no_mask
+        shown = f" with row mask {mask}" if "1" in mask else ""
+        final_result.append(f"Writing data {data} to address {addr}{shown}\n")
+        body = ["v_plim = 0.0;", "v_wr = 1.0;", "v_idle = 0.0;"]
+        body += [f"v_{b} = {data[i]};" for i, b in enumerate(reversed(data_outputs))]
+        body += [f"v_{b} = {mask[i]};" for i, b in enumerate(reversed(mask_outputs))]
+        state = yield from _iter_gated_state(state, pending, body + drive)
+        pending = ("V(ram_ready) > 0.5", ["if (trace_level >= 2) $display(\"Data written successfully\");"])
+    elif action == 'i':
+        instr = op[3]
+        num_data_bits = num_data_outputs.bit_length() - 1
+        col_bits = len(address_outputs) - row_bits
+        shown = expand_compact(instr, addr, row_bits, col_bits, num_data_bits) if compact else instr
+        final_result.append(_describe_instruction(op[2], addr, shown, row_bits, col_bits, num_data_bits))
+        if compact:
+            instruction_words = math.ceil(len(instr) / num_data_outputs)
+        instr = instr.ljust(instruction_words*num_data_outputs, '0')
+        for j in range(instruction_words):
+            data = instr[j*num_data_outputs:(j+1)*num_data_outputs]
+            word_addr = format(int(addr, 2)+j, f'0{len(address_outputs)}b')
+            body = ["v_plim = 0.0;", "v_wr = 1.0;", "v_idle = 0.0;"]
+            body += [f"v_{b} = {data[i]};" for i, b in enumerate(data_outputs)]
+            body += [f"v_{b} = {word_addr[i]};" for i, b in enumerate(reversed(address_outputs))]
+            body += [f"v_{b} = {no_mask[i]};" for i, b in enumerate(reversed(mask_outputs))]
+            state = yield from _iter_gated_state(state, pending, body)
+            message = "if (trace_level >= 2) $display(\"Instruction written successfully\");"
+            pending = ("V(ram_ready) > 0.5", [message] if j == instruction_words - 1 else [])
+    elif action == 'r':
+        final_result.append(f"Reading data from address {addr}\n")
+        state = yield from _iter_gated_state(state, pending, ["v_plim = 0.0;", "v_wr = 0.0;", "v_idle = 0.0;"] + drive)
+        # idle before the controller starts another cycle on the same request
+        state = yield from _iter_gated_state(state, ("V(ram_ready) > 0.5", []), ["v_idle = 1.0;"])
+        shown = ", ".join(f"V(cross_data{i})" for i in reversed(range(num_data_outputs)))
+        pending = ("V(ram_done) > 0.5", ["if (trace_level >= 1) $display(\"Data read successfully\");",
+                                         f"if (trace_level >= 1) $display({shown});"])
+    elif action == 'e':
+        final_result.append(f"Executing instruction at address {addr}\n")
+        state = yield from _iter_gated_state(state, pending, ["v_plim = 1.0;", "v_wr = 0.0;", "v_idle = 0.0;"] + drive)
+        state = yield from _iter_gated_state(state, ("V(instr_exec) > 0.5", []), [
+            "v_idle = 1.0;", "v_plim = 0.0;", "v_wr = 0.0;",
+            "if (trace_level >= 2) $display(\"Instruction executed successfully\");"])
+        pending = None
+    elif action == 'd':
+        final_result.append(f"Dumping the crossbar to {op[1]}\n")
+        body = [f"dump_fd = $fopen(\"{op[1]}\", \"w\");", "dump_step = 0;", "v_plim = 0.0;", "v_wr = 0.0;",
+                "v_idle = 0.0;"] + [f"v_{b} = 0;" for b in address_outputs]
+        state = yield from _iter_gated_state(state, pending, body)
+        yield f"\t\t\t\t{state}: begin\n"
+        yield from _iter_dump(5, num_data_outputs, len(address_outputs), f"state = {state + 1};")
+        yield "\t\t\t\tend\n"
+        state += 1
+        pending = None
+    return state, pending
+
+
+def _iter_burst(state, pending, op, data_outputs, address_outputs, final_result, row_bits, mask_outputs=(),
+                count_outputs=(), compact=False, handshake=False):
+    """
+    Yields the case arms for one grouped burst, see group_bursts. The first
+    arm drives the address and the word count, gated on pending with
+    handshake; the controller latches the count on the next edge and then
+    takes one word per edge, so the rest of the burst runs on fixed edges
+    in either mode. A write burst releases the bus like a write.
+
+    Returns:
+        tuple: The next free state and the release of this action, or None.
+    """
+    kind, addr, words = op[0], op[1], op[2]
+    num_data_bits = len(data_outputs).bit_length() - 1
+    final_result.extend(_describe_burst(op, row_bits, len(address_outputs) - row_bits, num_data_bits, compact))
+    count = len(words) - 1 if kind == 'W' else words - 1
+    count_bits = format(count, f'0{len(count_outputs)}b')
+    first = ["v_plim = 0.0;", f"v_wr = {1.0 if kind == 'W' else 0.0};", "v_idle = 0.0;"]
+    first += [f"v_{b} = {addr[i]};" for i, b in enumerate(reversed(address_outputs))]
+    first += [f"v_{b} = {count_bits[i]};" for i, b in enumerate(reversed(count_outputs))]
+    # the count is latched on the next edge, back to single words after it
+    bodies = [[f"v_{b} = 0;" for b in count_outputs]]
+    if kind == 'W':
+        first += [f"v_{b} = {words[0][i]};" for i, b in enumerate(reversed(data_outputs))]
+        first += [f"v_{b} = 0;" for b in mask_outputs]
+        for word in words[1:]:
+            bodies.append([f"v_{b} = {word[i]};" for i, b in enumerate(reversed(data_outputs))])
+        message = "if (trace_level >= 2) $display(\"Burst written successfully\");"
+        release = ("V(ram_ready) > 0.5", [message])
+        if not handshake:
+            # idle once the row is closed, two edges after the last word
+            bodies += [[], ["v_idle = 1.0;", message]]
+    else:
+        # word k is on cross_data four edges after the request, plus k;
+        # idle once the last one is read, as for a single read
+        bodies += [[] for _ in range(words + 2)]
+        shown = ", ".join(f"V(cross_data{i})" for i in reversed(range(len(data_outputs))))
+        for k, body in enumerate(bodies):
+            if k > words:
+                body.append("v_idle = 1.0;")
+            if k >= 3:
+                body += ["if (trace_level >= 1) $display(\"Data read successfully\");",
+                         f"if (trace_level >= 1) $display({shown});"]
+        release = None
+    state = yield from _iter_gated_state(state, pending if handshake else None, first)
+    for body in bodies:
+        state = yield from _iter_gated_state(state, None, body)
+    return state, release
+
+
+def _prompt_operations(row_bits, col_bits, num_data_bits, instruction_words, compact=False):
+    """
+    Asks for actions until the user answers 'n', yielding each valid one.
+    With compact the instructions are encoded with assemble_compact.
+    """
+    num_addr_bits = row_bits + col_bits
+    num_data_outputs = 2 ** num_data_bits
+    while(1):
+        print("Do you want to perform any action?(y/n)")
+        action = input()
+        if action == 'n' or action == 'N':
+            break
+        elif action == 'y' or action == 'Y':
+            print("Enter the action you want to perform ('w' for write, 'r' for read, 'i' for writing an instruction into crossbar, e for executing instruction, d for dumping the crossbar):")
+            action = input()
+            if action == 'w':
+                print(f"Enter teh address to write to (in binary {num_addr_bits} bits):")
+                addr = input()
+                # Perform check for address length and binary format
+                if not _is_binary(addr, num_addr_bits):
+                    print("Invalid address format. Please enter a binary number of the correct length.")
+                    continue
+                print(f"Enter the data to write (in binary {2**num_data_bits} bits):")
+                data = input()
+                # Perform check for data length and binary format
+                if not _is_binary(data, num_data_outputs):
+                    print("Invalid data format. Please enter a binary number of the correct length.")
+                    continue
+                yield ('w', addr, data)
+            elif action == 'r':
+                print(f"Enter teh address to read from (in binary {num_addr_bits}):")
+                addr = input()
+                # Perform check for address length and binary format
+                if not _is_binary(addr, num_addr_bits):
+                    print("Invalid address format. Please enter a binary number of the correct length.")
+                    continue
+                yield ('r', addr)
+            elif action == 'd':
+                yield ('d', DUMP_FILE)
+            elif action in ('i', 'e'):
+                if action == 'i':
+                    print(f"Enter the starting address of the instruction to be stored (in binary {num_addr_bits}):")
+                else:
+                    print(f"Enter the address of the instruction to be executed (in binary {num_addr_bits}):")
+                addr = input()
+                # Perform check for address length and binary format
+                if not _is_binary(addr, num_addr_bits):
+                    print("Invalid address format. Please enter a binary number of the correct length.")
+                    continue
+                const_addr = int(addr,2)
+                # check if the instructions fit in same row starting from the address
+                check = const_addr + instruction_words - 1
+                check = format(check, f'0{num_addr_bits}b')
+                if check[:row_bits] != addr[:row_bits]:
+                    print("The instructions do not fit in the same row. Please enter a valid address.")
+                    continue
+                if action == 'e':
+                    yield ('e', addr)
+                    continue
+                print("Enter the type of instruction (0 MAJ, 1 AND, 2 OR, 3 NOT):")
+                instr = input()
+                # Perform check for instruction format
+                if instr not in ['0', '1', '2', '3']:
+                    print("Invalid instruction format. Please enter a valid instruction type.")
+                    continue
+                name = list(OPCODES)[int(instr)]
+                operands = []
+                for x in OPERANDS[name]:
+                    print(f"Enter the word address of opearand {x} (in binary {num_addr_bits}):")
+                    word = input()
+                    # Perform check for address length and binary format
+                    if not _is_binary(word, num_addr_bits):
+                        break
+                    print(f"Enter the bit address of operand {x} (in binary {num_data_bits}):")
+                    bit = input()
+                    # Perform check for address length and binary format
+                    if not _is_binary(bit, num_data_bits):
+                        break
+                    operands.append(f"{word}:{bit}")
+                if len(operands) != len(OPERANDS[name]):
+                    print("Invalid address format. Please enter a binary number of the correct length.")
+                    continue
+                if compact:
+                    try:
+                        yield ('i', addr, name, assemble_compact(name, operands, addr, row_bits, col_bits, num_data_bits))
+                    except ValueError as e:
+                        print(f"{e}. Please enter operands in one row.")
+                    continue
+                yield ('i', addr, name, assemble(name, operands, num_addr_bits, num_data_bits))
+
+
+def _iter_header(num_data_outputs, num_addr_bits, trace_level, handshake=False, num_mask_bits=0, num_count_bits=0):
+    yield f"""`include "disciplines.vams"
+`include "constants.vams"
+
+module testbench(
+\tinput electrical clk,
+\toutput electrical idle,
+"""
+    yield "\toutput electrical plim,\n"
+    yield "\toutput electrical wr,\n"
+    for i in range(num_data_outputs):
+        yield f"\toutput electrical data{i},\n"
+    for i in range(num_addr_bits):
+        yield f"\toutput electrical addr{i},\n"
+    for i in range(num_mask_bits):
+        yield f"\toutput electrical mask{i},\n"
+    for i in range(num_count_bits):
+        yield f"\toutput electrical count{i},\n"
+    for i in range(num_data_outputs):
+        yield f"\tinput electrical cross_data{i},\n"
+    if handshake:
+        yield "\tinput electrical ram_ready,\n"
+        yield "\tinput electrical ram_done,\n"
+    yield f"\tinput electrical instr_exec\n"
+    yield ");\n\n"
+    yield f"\tparameter integer trace_level = {trace_level_value(trace_level)};\n"
+
+
+def _iter_registers(num_data_outputs, num_addr_bits, num_mask_bits=0, num_count_bits=0):
+    yield "\treal v_idle = 1.0;\n"
+    yield "\treal v_plim = 0.0;\n"
+    yield "\treal v_wr = 0.0;\n"
+    for i in range(num_data_outputs):
+        yield f"\treal v_data{i};\n"
+    for i in range(num_addr_bits):
+        yield f"\treal v_addr{i};\n"
+    for i in range(num_mask_bits):
+        yield f"\treal v_mask{i} = 0.0;\n"
+    for i in range(num_count_bits):
+        yield f"\treal v_count{i} = 0.0;\n"
+
+
+def _iter_outputs(num_data_outputs, num_addr_bits, event_driven, num_mask_bits=0, num_count_bits=0):
+    # Continuous assignment for inputs
+    for i in range(num_data_outputs):
+        if event_driven:
+            yield f"\t\tV(data{i}) <+ transition(v_data{i},0,10n);\n"
+        else:
+            yield f"\t\tV(data{i}) <+ v_data{i};\n"
+    for i in range(num_addr_bits):
+        if event_driven:
+            yield f"\t\tV(addr{i}) <+ transition(v_addr{i},0,10n);\n"
+        else:
+            yield f"\t\tV(addr{i}) <+ v_addr{i};\n"
+    for i in range(num_mask_bits):
+        if event_driven:
+            yield f"\t\tV(mask{i}) <+ transition(v_mask{i},0,10n);\n"
+        else:
+            yield f"\t\tV(mask{i}) <+ v_mask{i};\n"
+    for i in range(num_count_bits):
+        if event_driven:
+            yield f"\t\tV(count{i}) <+ transition(v_count{i},0,10n);\n"
+        else:
+            yield f"\t\tV(count{i}) <+ v_count{i};\n"
+    yield "\t\tV(plim) <+ transition(v_plim,0,10n);\n"
+    yield "\t\tV(wr) <+ transition(v_wr,0,10n);\n"
+    yield "\t\tV(idle) <+ transition(v_idle,0,10n);\n"
+    if not event_driven:
+        yield "\t\tprev_clk = V(clk);\n\n"
+    yield "\tend\n\n"
+
+
+    yield "endmodule\n\n"
+
+
+def iter_testbench(row_bits,col_bits, no_of_data_bits, final_result, event_driven=False, trace_level="cycle",
+                   program=None, handshake=False, multi_row=False, compact=False, burst=False):
+    """
+    Yields a Verilog-A testbench for the RAS module chunk by chunk. Without a
+    program it prompts for the actions as it goes.
+
+    Args:
+        no_of_address_bits (int): Number of address bits.
+        no_of_data_bits (int): Number of data bits.
+        final_result (list): Collects the summary of every action.
+        event_driven (bool): Step on @(cross(...)) of clk instead of polling
+            it, and drive data and addresses through transition().
+        trace_level (str or int): Default of the trace_level parameter, see
+            contoller.TRACE_LEVELS.
+        program (list, str or file-like): Actions to generate without
+            prompting, see validate_program. A path or open file is read
+            with parse_program. The whole program is checked before anything
+            is yielded.
+        handshake (bool): Take the controller's ram_ready and ram_done
+            (contoller.generate_veriloga(handshake=True)) and move on as
+            soon as they allow instead of after fixed wait states.
+        multi_row (bool): Add the mask outputs for the controller's mask
+            inputs (contoller.generate_veriloga(multi_row=True)) and drive
+            them with the row masks of the writes.
+        compact (bool): Store the instructions in the compact encoding of
+            contoller.generate_veriloga(compact=True), see assemble_compact.
+        burst (bool): Add the count outputs for the controller's count
+            inputs (contoller.generate_veriloga(burst=True)) and send the
+            writes and reads that group_bursts joins as one burst each.
+    """
+
+    no_of_address_bits = row_bits + col_bits
+    instruction_length = 3*(1+no_of_address_bits+no_of_data_bits)
+    if compact:
+        instruction_length = compact_lengths(row_bits, col_bits, no_of_data_bits)[0]
+    max_possible = 2**(col_bits+no_of_data_bits)
+    if instruction_length > max_possible:
+        print("Instruction length exceeds maximum possible value.")
+        return
+    if no_of_address_bits < 1 or no_of_data_bits < 1:
+        print("Number of address bits and data bits must be at least 1.")
+        return
+    # Find the best possible value of instruction length
+    instruction_words = math.ceil(instruction_length / (2**(no_of_data_bits)))
+    # Define the parameters
+    num_addr_bits = no_of_address_bits
+    num_data_bits = no_of_data_bits
+    num_data_outputs = 2 ** num_data_bits
+
+    if program is not None:
+        if not isinstance(program, (list, tuple)):
+            program = parse_program(program)
+        operations = validate_program(program, row_bits, col_bits, no_of_data_bits, compact)
+        if not multi_row:
+            for n, op in enumerate(operations):
+                if op[0] == 'w' and len(op) > 3:
+                    raise ValueError(f"Operation {n}: row masks need multi_row")
+    else:
+        operations = _prompt_operations(row_bits, col_bits, num_data_bits, instruction_words, compact)
+    if burst:
+        operations = group_bursts(operations, row_bits, col_bits, no_of_data_bits, compact)
+
+    data_outputs = [f"data{i}" for i in range(num_data_outputs)]
+    address_outputs = [f"addr{i}" for i in range(num_addr_bits)]
+    mask_outputs = [f"mask{i}" for i in range(row_bits)] if multi_row else []
+    count_outputs = [f"count{i}" for i in range(col_bits)] if burst else []
+
+    # Create the Verilog-A testbench code
+    yield from _iter_header(num_data_outputs, num_addr_bits, trace_level, handshake, len(mask_outputs),
+                            len(count_outputs))
+    yield "\tinteger state = 0;\n"
+    yield "\tinteger dump_fd, dump_step, dump_value;\n"
+    yield from _iter_registers(num_data_outputs, num_addr_bits, len(mask_outputs), len(count_outputs))
+    if event_driven:
+        yield "\tanalog begin\n"
+        yield "\t\t@(cross(V(clk) - 0.5, +1)) begin\n"
+    else:
+        yield "\treal prev_clk;\n"
+
+        yield "\tanalog begin\n"
+        yield "\t\t@(initial_step) begin\n"
+        yield "\t\t\tprev_clk = V(clk);\n"
+        yield "\t\tend\n\n"
+
+        yield "\t\tif(V(clk) > 0.5 && prev_clk <= 0.5) begin\n"
+    state = 0
+    pending = None
+    yield "\t\t\tcase (state)\n"
+    for op in operations:
+        if op[0] in ('W', 'R'):
+            state, release = yield from _iter_burst(state, pending, op, data_outputs, address_outputs, final_result,
+                                                    row_bits, mask_outputs, count_outputs, compact, handshake)
+            if handshake:
+                pending = release
+        elif handshake:
+            state, pending = yield from _iter_handshake_operation(state, pending, op, data_outputs, address_outputs,
+                                                                  instruction_words, final_result, row_bits,
+                                                                  mask_outputs, compact)
+        else:
+            state = yield from _iter_operation(state, op, data_outputs, address_outputs, instruction_words,
+                                               final_result, row_bits, mask_outputs, compact)
+    if pending:
+        state = yield from _iter_gated_state(state, pending, ["v_idle = 1.0;"])
+
+    yield "\t\t\tendcase\n"
+    yield "\t\tend\n\n"
+
+    yield from _iter_outputs(num_data_outputs, num_addr_bits, event_driven, len(mask_outputs), len(count_outputs))
+
+
+def generate_testbench(row_bits,col_bits, no_of_data_bits, out=None, event_driven=False, trace_level="cycle",
+                       program=None, handshake=False, multi_row=False, compact=False, burst=False):
+    """
+    Generates a Verilog-A testbench and streams it into out, or into
+    testbench.va when no file-like sink is given. With a program (list of
+    actions, program file path or open file) nothing is prompted for; see
+    parse_program and validate_program. With handshake set it pairs with a
+    controller generated with handshake=True, with multi_row set with one
+    generated with multi_row=True, with compact set with one generated
+    with compact=True and with burst set with one generated with
+    burst=True, see iter_testbench.
+    """
+    final_result = []
+    chunks = iter_testbench(row_bits, col_bits, no_of_data_bits, final_result, event_driven, trace_level, program,
+                            handshake, multi_row, compact, burst)
+    first = next(chunks, None)
+    if first is None:
+        return
+    if out is None:
+        with open("testbench.va", "w") as f:
+            f.write(first)
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        out.write(first)
+        for chunk in chunks:
+            out.write(chunk)
+
+    print("".join(final_result))
+
+
+def stimulus_records(program, row_bits, col_bits, no_of_data_bits, final_result=None, compact=False):
+    """
+    Encodes a program as the bus transactions the stimulus testbench reads,
+    one (kind, address, data, message) record per write, read, execute or
+    dump. Instructions become one write per word, dumps go to the file set
+    by the testbench's dump parameter. Address and data are integers
+    whose bit i drives addr{i} and data{i}; message is 1 after a data write,
+    2 after the last word of an instruction and 0 otherwise.
+
+    Args:
+        program (list, str or file-like): Actions, see validate_program. A
+            path or open file is read with parse_program.
+        final_result (list): Collects the summary of every action.
+        compact (bool): Encode the instructions with assemble_compact.
+    """
+    if not isinstance(program, (list, tuple)):
+        program = parse_program(program)
+    num_addr_bits = row_bits + col_bits
+    num_data_outputs = 2 ** no_of_data_bits
+    instruction_words = math.ceil(3*(1+num_addr_bits+no_of_data_bits) / num_data_outputs)
+    if final_result is None:
+        final_result = []
+    records = []
+    for op in validate_program(program, row_bits, col_bits, no_of_data_bits, compact):
+        action, addr = op[0], op[1]
+        if action == 'w':
+            if len(op) > 3:
+                raise ValueError("Stimulus records have no row mask, use generate_testbench(multi_row=True)")
+            final_result.append(f"Writing data {op[2]} to address {addr}\n")
+            # data is MSB first, data{i} gets data[-1-i]
+            records.append((STIMULUS_KINDS['w'], int(addr, 2), int(op[2], 2), 1))
+        elif action == 'i':
+            shown = expand_compact(op[3], addr, row_bits, col_bits, no_of_data_bits) if compact else op[3]
+            final_result.append(_describe_instruction(op[2], addr, shown, row_bits, col_bits, no_of_data_bits))
+            if compact:
+                instruction_words = math.ceil(len(op[3]) / num_data_outputs)
+            instr = op[3].ljust(instruction_words*num_data_outputs, '0')
+            for j in range(instruction_words):
+                # data{i} gets instruction bit i of the word
+                word = instr[j*num_data_outputs:(j+1)*num_data_outputs]
+                message = 2 if j == instruction_words - 1 else 0
+                records.append((STIMULUS_KINDS['w'], int(addr, 2) + j, int(word[::-1], 2), message))
+        elif action == 'r':
+            final_result.append(f"Reading data from address {addr}\n")
+            records.append((STIMULUS_KINDS['r'], int(addr, 2), 0, 0))
+        elif action == 'd':
+            final_result.append("Dumping the crossbar\n")
+            records.append((STIMULUS_KINDS['d'], 0, 0, 0))
+        else:
+            final_result.append(f"Executing instruction at address {addr}\n")
+            records.append((STIMULUS_KINDS['e'], int(addr, 2), 0, 0))
+    return records
+
+
+def write_stimulus(program, row_bits, col_bits, no_of_data_bits, out=None, compact=False):
+    """
+    Writes the stimulus file for the testbench from
+    generate_stimulus_testbench, one record of four decimal integers per
+    line, into out or stimulus.txt. With compact the instructions are
+    encoded for a controller generated with compact=True.
+    """
+    final_result = []
+    records = stimulus_records(program, row_bits, col_bits, no_of_data_bits, final_result, compact)
+    lines = "".join(f"{kind} {addr} {data} {message}\n" for kind, addr, data, message in records)
+    if out is None:
+        with open("stimulus.txt", "w") as f:
+            f.write(lines)
+    else:
+        out.write(lines)
+    print("".join(final_result))
+
+
+def iter_stimulus_testbench(row_bits, col_bits, no_of_data_bits, event_driven=False, trace_level="cycle",
+                            stimulus="stimulus.txt", dump=DUMP_FILE, compact=False):
+    """
+    Yields a testbench with the same ports and bus timing as iter_testbench
+    that reads its actions from a stimulus file (see write_stimulus) with
+    $fscanf while the simulation runs. Its size only depends on the address
+    and data widths, so one compiled module runs any program.
+
+    Args:
+        event_driven (bool): Step on @(cross(...)) of clk instead of polling
+            it, and drive data and addresses through transition().
+        trace_level (str or int): Default of the trace_level parameter, see
+            contoller.TRACE_LEVELS.
+        stimulus (str): Default of the stimulus file parameter.
+        dump (str): Default of the file dumps are written to.
+        compact (bool): Size check for instructions in the compact
+            encoding, as written by write_stimulus(compact=True).
+    """
+    num_addr_bits = row_bits + col_bits
+    num_data_outputs = 2 ** no_of_data_bits
+    instruction_length = 3*(1+num_addr_bits+no_of_data_bits)
+    if compact:
+        instruction_length = compact_lengths(row_bits, col_bits, no_of_data_bits)[0]
+    if instruction_length > 2**(col_bits+no_of_data_bits):
+        print("Instruction length exceeds maximum possible value.")
+        return
+    if num_addr_bits < 1 or no_of_data_bits < 1:
+        print("Number of address bits and data bits must be at least 1.")
+        return
+    if num_addr_bits > 31 or num_data_outputs > 31:
+        print("Address and data words must fit in a Verilog-A integer.")
+        return
+
+    yield from _iter_header(num_data_outputs, num_addr_bits, trace_level)
+    yield f"\tparameter string stimulus = \"{stimulus}\";\n"
+    yield f"\tparameter string dump = \"{dump}\";\n"
+    yield "\tinteger fd;\n"
+    yield "\tinteger kind, address, data, message;\n"
+    yield "\tinteger dump_fd, dump_step, dump_value;\n"
+    yield "\tinteger step = 0;\n"
+    yield from _iter_registers(num_data_outputs, num_addr_bits)
+    if not event_driven:
+        yield "\treal prev_clk;\n"
+    yield "\tanalog begin\n"
+    yield "\t\t@(initial_step) begin\n"
+    yield "\t\t\tfd = $fopen(stimulus, \"r\");\n"
+    yield "\t\t\tif (fd == 0) $display(\"Cannot open stimulus file %s\", stimulus);\n"
+    if not event_driven:
+        yield "\t\t\tprev_clk = V(clk);\n"
+    yield "\t\tend\n"
+    yield "\t\t@(final_step) begin\n"
+    yield "\t\t\tif (fd != 0) $fclose(fd);\n"
+    yield "\t\tend\n\n"
+    if event_driven:
+        yield "\t\t@(cross(V(clk) - 0.5, +1)) begin\n"
+    else:
+        yield "\t\tif(V(clk) > 0.5 && prev_clk <= 0.5) begin\n"
+    # step 0 starts the next record, then the same cycles as iter_testbench:
+    # writes release idle on step 3, reads on step 3 and report on step 4,
+    # executes wait for instr_exec on step 1
+    yield "\t\t\tif (step == 0) begin\n"
+    yield "\t\t\t\tif (fd != 0 && $fscanf(fd, \"%d %d %d %d\", kind, address, data, message) == 4) begin\n"
+    yield f"\t\t\t\t\tv_plim = (kind == {STIMULUS_KINDS['e']}) ? 1.0 : 0.0;\n"
+    yield f"\t\t\t\t\tv_wr = (kind == {STIMULUS_KINDS['w']}) ? 1.0 : 0.0;\n"
+    yield "\t\t\t\t\tv_idle = 0.0;\n"
+    yield f"\t\t\t\t\tif (kind == {STIMULUS_KINDS['w']}) begin\n"
+    for i in range(num_data_outputs):
+        yield f"\t\t\t\t\t\tv_data{i} = (data >> {i}) & 1;\n"
+    yield "\t\t\t\t\tend\n"
+    for i in range(num_addr_bits):
+        yield f"\t\t\t\t\tv_addr{i} = (address >> {i}) & 1;\n"
+    yield f"\t\t\t\t\tif (kind == {STIMULUS_KINDS['d']}) begin\n"
+    yield "\t\t\t\t\t\tdump_fd = $fopen(dump, \"w\");\n"
+    yield "\t\t\t\t\t\tdump_step = 0;\n"
+    yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\t\tstep = 1;\n"
+    yield "\t\t\t\tend\n"
+    yield f"\t\t\tend else if (kind == {STIMULUS_KINDS['d']}) begin\n"
+    yield from _iter_dump(4, num_data_outputs, num_addr_bits, "step = 0;")
+    yield f"\t\t\tend else if (kind == {STIMULUS_KINDS['e']}) begin\n"
+    yield "\t\t\t\tif(V(instr_exec) > 0.5) begin\n"
+    yield "\t\t\t\t\tv_idle = 1.0;\n"
+    yield "\t\t\t\t\tv_plim = 0.0;\n"
+    yield "\t\t\t\t\tv_wr = 0.0;\n"
+    yield "\t\t\t\t\tif (trace_level >= 2) $display(\"Instruction executed successfully\");\n"
+    yield "\t\t\t\t\tstep = 0;\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\tend else if (step == 3) begin\n"
+    yield "\t\t\t\tv_idle = 1.0;\n"
+    yield "\t\t\t\tif (trace_level >= 2 && message == 1) $display(\"Data written successfully\");\n"
+    yield "\t\t\t\tif (trace_level >= 2 && message == 2) $display(\"Instruction written successfully\");\n"
+    yield f"\t\t\t\tstep = (kind == {STIMULUS_KINDS['r']}) ? 4 : 0;\n"
+    yield "\t\t\tend else if (step == 4) begin\n"
+    yield "\t\t\t\tif (trace_level >= 1) $display(\"Data read successfully\");\n"
+    yield "\t\t\t\tif (trace_level >= 1) $display("
+    yield ", ".join(f"V(cross_data{i})" for i in reversed(range(num_data_outputs)))
+    yield ");\n"
+    yield "\t\t\t\tstep = 0;\n"
+    yield "\t\t\tend else begin\n"
+    yield "\t\t\t\tstep = step + 1;\n"
+    yield "\t\t\tend\n"
+    yield "\t\tend\n\n"
+
+    yield from _iter_outputs(num_data_outputs, num_addr_bits, event_driven)
+
+
+def generate_stimulus_testbench(row_bits, col_bits, no_of_data_bits, out=None, event_driven=False,
+                                trace_level="cycle", stimulus="stimulus.txt", dump=DUMP_FILE, compact=False):
+    """
+    Generates the stimulus file driven testbench from
+    iter_stimulus_testbench into out, or into testbench.va when no
+    file-like sink is given. Programs are written with write_stimulus and
+    need no regeneration.
+    """
+    chunks = iter_stimulus_testbench(row_bits, col_bits, no_of_data_bits, event_driven, trace_level, stimulus, dump,
+                                     compact)
+    first = next(chunks, None)
+    if first is None:
+        return
+    if out is None:
+        with open("testbench.va", "w") as f:
+            f.write(first)
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        out.write(first)
+        for chunk in chunks:
+            out.write(chunk)
+
+
+if __name__ == "__main__":
+    generate_testbench(2, 4, 1)
+    print("Testbench generated and saved as: testbench.va")
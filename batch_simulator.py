@@ -0,0 +1,223 @@
+import numpy as np
+
+from Testbench import OPCODES as OPCODE_FIELDS
+from simulator import instruction_words
+
+# Opcodes of the instructions run and run_program model, from the fields
+# Testbench.OPCODES assembles
+OPCODES = {name: int(OPCODE_FIELDS[name], 2) for name in ("MAJ", "AND", "OR", "NOT", "HALT", "JMP", "JT", "JF")}
+
+
+def new_memory(batch, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Zeroed crossbars for a batch of independent runs.
+
+    Returns:
+        ndarray: uint8 array of shape (batch, cells). Cell index is
+        word_address * 2**bit_ad_bits + bit_address, where the word address
+        is the row bits followed by the column bits, as on the address bus.
+    """
+    return np.zeros((batch, 2 ** (row_ad_bits + col_ad_bits + bit_ad_bits)), dtype=np.uint8)
+
+
+def as_words(memory, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    View of the memory indexed [run, row, word, bit].
+    """
+    return memory.reshape(memory.shape[0], 2 ** row_ad_bits, 2 ** col_ad_bits, 2 ** bit_ad_bits)
+
+
+def load_dump(source, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Load a crossbar dump (Testbench 'd' action) or an image written by
+    crossbar.write_image: one hex word per line in address order, bit k of
+    the value is bit k of the word.
+
+    Args:
+        source (str or file-like): Path of the dump or an open file.
+
+    Returns:
+        ndarray: uint8 array of shape (cells,), indexed as new_memory();
+        add a leading axis to use it as a batch of one.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            return load_dump(f, row_ad_bits, col_ad_bits, bit_ad_bits)
+    values = np.array([int(word, 16) for word in source.read().split()], dtype=np.int64)
+    num_words = 2 ** (row_ad_bits + col_ad_bits)
+    if len(values) != num_words:
+        raise ValueError(f"Dump has {len(values)} words, expected {num_words}")
+    bits = (values[:, None] >> np.arange(2 ** bit_ad_bits)) & 1
+    return bits.astype(np.uint8).reshape(-1)
+
+
+def _to_bits(values, width):
+    # MSB first, matching the address strings the testbench takes
+    shifts = np.arange(width - 1, -1, -1)
+    return ((np.asarray(values)[..., None] >> shifts) & 1).astype(np.uint8)
+
+
+def _from_bits(bits):
+    width = bits.shape[-1]
+    weights = 1 << np.arange(width - 1, -1, -1)
+    return (bits.astype(np.int64) * weights).sum(axis=-1)
+
+
+def encode(opcode, a, b, c, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Encode instructions in the layout Testbench.generate_testbench stores:
+    3-bit opcode, then operands a, b and c as word address and bit address,
+    padded with zeros to whole words. Element k of the result is the bit
+    written to position k of the instruction (data{k mod word} of word
+    k // word).
+
+    Args:
+        opcode, a, b, c (array_like): Opcodes and operand cell indices, any
+            broadcastable shape.
+
+    Returns:
+        ndarray: uint8 bits with a trailing axis of instruction_length words.
+    """
+    field = row_ad_bits + col_ad_bits + bit_ad_bits
+    length = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits) * 2 ** bit_ad_bits
+    opcode, a, b, c = np.broadcast_arrays(opcode, a, b, c)
+    bits = np.zeros(opcode.shape + (length,), dtype=np.uint8)
+    bits[..., 0:3] = _to_bits(opcode, 3)
+    bits[..., 3:3 + field] = _to_bits(a, field)
+    bits[..., 3 + field:3 + 2 * field] = _to_bits(b, field)
+    bits[..., 3 + 2 * field:3 + 3 * field] = _to_bits(c, field)
+    return bits
+
+
+def decode(bits, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Inverse of encode(), as the controller reads v_instruction_*.
+
+    Returns:
+        tuple: opcode, a, b, c arrays of cell indices.
+    """
+    field = row_ad_bits + col_ad_bits + bit_ad_bits
+    opcode = _from_bits(bits[..., 0:3])
+    a = _from_bits(bits[..., 3:3 + field])
+    b = _from_bits(bits[..., 3 + field:3 + 2 * field])
+    c = _from_bits(bits[..., 3 + 2 * field:3 + 3 * field])
+    return opcode, a, b, c
+
+
+def run(memory, opcode, a, b, c):
+    """
+    Execute one instruction stream per run, vectorized across the batch.
+
+    Each instruction reads a, b and c, computes MAJ(a, b, c), AND(a, b),
+    OR(a, b) or NOT(a) through the scratch cell (the last cell of the array)
+    and writes the result to c, so the scratch cell also ends up holding it.
+    Opcodes 4-7 have no execute branch (or are control flow, see
+    run_program) and leave memory untouched, which makes them usable as
+    padding for streams of different length.
+
+    Args:
+        memory (ndarray): (batch, cells) array from new_memory(), updated in
+            place.
+        opcode, a, b, c (array_like): Shape (steps,) to run the same program
+            on every input vector, or (batch, steps) for independent programs.
+
+    Returns:
+        ndarray: memory.
+    """
+    batch, cells = memory.shape
+    opcode, a, b, c = (np.broadcast_to(np.asarray(x), (batch, np.shape(x)[-1])) for x in (opcode, a, b, c))
+    runs = np.arange(batch)
+    scratch = cells - 1
+    for t in range(opcode.shape[1]):
+        op = opcode[:, t]
+        va = memory[runs, a[:, t]]
+        vb = memory[runs, b[:, t]]
+        vc = memory[runs, c[:, t]]
+        conditions = [op == OPCODES[name] for name in ("MAJ", "AND", "OR", "NOT")]
+        result = np.select(conditions, [(va & vb) | (va & vc) | (vb & vc), va & vb, va | vb, 1 - va]).astype(np.uint8)
+        valid = np.any(conditions, axis=0)
+        memory[runs, scratch] = np.where(valid, result, memory[runs, scratch])
+        memory[runs, c[:, t]] = np.where(valid, result, memory[runs, c[:, t]])
+    return memory
+
+
+def fetch(memory, addresses, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Read the instruction stored at each word address, wrapping the column
+    inside the row as state 0 of the controller does.
+
+    Args:
+        addresses (ndarray): Word addresses, shape (batch,).
+
+    Returns:
+        ndarray: Instruction bits, shape (batch, instruction_length words).
+    """
+    word = 2 ** bit_ad_bits
+    words = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits)
+    col_mask = 2 ** col_ad_bits - 1
+    addresses = np.asarray(addresses)[:, None]
+    offsets = np.arange(words)
+    word_addr = (addresses & ~col_mask) | ((addresses + offsets) & col_mask)
+    cells = (word_addr[..., None] * word + np.arange(word)).reshape(len(addresses), -1)
+    return memory[np.arange(len(addresses))[:, None], cells]
+
+
+def run_stored(memory, addresses, row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Execute instructions already written into each crossbar, like a series
+    of 'e' actions. Instructions are fetched step by step, so a program may
+    overwrite its own later instructions just as it would in hardware.
+
+    Args:
+        addresses (array_like): Word addresses of the instructions to
+            execute, shape (steps,) or (batch, steps).
+    """
+    batch = memory.shape[0]
+    addresses = np.broadcast_to(np.asarray(addresses), (batch, np.shape(addresses)[-1]))
+    for t in range(addresses.shape[1]):
+        bits = fetch(memory, addresses[:, t], row_ad_bits, col_ad_bits, bit_ad_bits)
+        opcode, a, b, c = decode(bits, row_ad_bits, col_ad_bits, bit_ad_bits)
+        run(memory, opcode[:, None], a[:, None], b[:, None], c[:, None])
+    return memory
+
+
+def run_program(memory, start, row_ad_bits, col_ad_bits, bit_ad_bits, max_steps=100000):
+    """
+    Run the stored program of every crossbar from its start address until
+    HALT, as the controller generated with program_counter=True does (see
+    simulator.next_pc and contoller.CONTROL_OPCODES).
+
+    Args:
+        start (array_like): Word address of the first instruction, scalar or
+            shape (batch,).
+        max_steps (int): Give up after this many instructions.
+
+    Returns:
+        ndarray: Number of instructions each run executed, HALT included.
+    """
+    batch = memory.shape[0]
+    words = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits)
+    row_words = 2 ** col_ad_bits
+    pc = np.broadcast_to(np.asarray(start), (batch,)).copy()
+    running = np.ones(batch, dtype=bool)
+    steps = np.zeros(batch, dtype=np.int64)
+    runs = np.arange(batch)
+    for _ in range(max_steps):
+        if not running.any():
+            return steps
+        bits = fetch(memory, pc, row_ad_bits, col_ad_bits, bit_ad_bits)
+        opcode, a, b, c = decode(bits, row_ad_bits, col_ad_bits, bit_ad_bits)
+        opcode = np.where(running, opcode, OPCODES["HALT"])
+        run(memory, opcode[:, None], a[:, None], b[:, None], c[:, None])
+        taken = (opcode == OPCODES["JMP"]) | \
+                ((opcode == OPCODES["JT"]) & (memory[runs, a] == 1)) | \
+                ((opcode == OPCODES["JF"]) & (memory[runs, a] == 0))
+        following = pc + words
+        following = np.where(following % row_words + words > row_words, (following // row_words + 1) * row_words, following)
+        following = following % (2 ** (row_ad_bits + col_ad_bits))
+        steps += running
+        running &= opcode != OPCODES["HALT"]
+        pc = np.where(running, np.where(taken, c >> bit_ad_bits, following), pc)
+    if running.any():
+        raise RuntimeError(f"Programs did not halt within {max_steps} instructions")
+    return steps
@@ -0,0 +1,764 @@
+import re
+
+from crossbar import preload_image
+from simulator import instruction_words, next_pc, simulate
+from Testbench import OPERANDS
+
+
+class Mig:
+    """
+    Majority-inverter graph. A signal is 2 * node + complement, node 0 is
+    the constant, so signals 0 and 1 are the constants. Nodes are inputs
+    (None) or majority nodes (x, y, z) of signals, structurally hashed
+    and stored with at most one complemented input, by the self-duality
+    M(~x, ~y, ~z) = ~M(x, y, z). Nodes are numbered in topological order.
+    """
+
+    def __init__(self):
+        self.nodes = [None]
+        self.levels = [0]
+        self.inputs = []
+        self.outputs = []
+        self.table = {}
+
+    def add_input(self, name):
+        self.nodes.append(None)
+        self.levels.append(0)
+        signal = 2 * (len(self.nodes) - 1)
+        self.inputs.append((name, signal))
+        return signal
+
+    def add_output(self, name, signal):
+        self.outputs.append((name, signal))
+
+    def maj(self, x, y, z):
+        x, y, z = sorted((x, y, z))
+        # M(x, x, z) = x and M(x, ~x, z) = z; a signal and its complement
+        # are neighbours once sorted
+        if x == y or y == z:
+            return y
+        if x ^ 1 == y:
+            return z
+        if y ^ 1 == z:
+            return x
+        inverted = (x & 1) + (y & 1) + (z & 1) >= 2
+        if inverted:
+            x, y, z = x ^ 1, y ^ 1, z ^ 1
+        key = (x, y, z)
+        node = self.table.get(key)
+        if node is None:
+            self.nodes.append(key)
+            self.levels.append(1 + max(self.levels[s >> 1] for s in key))
+            node = self.table[key] = len(self.nodes) - 1
+        return 2 * node + inverted
+
+    def and_(self, x, y):
+        return self.maj(x, y, 0)
+
+    def or_(self, x, y):
+        return self.maj(x, y, 1)
+
+    def xor(self, x, y):
+        # the sequence of the fused XOR opcode, see contoller.FUSED_MICROCODE
+        return self.and_(self.and_(x, y) ^ 1, self.or_(x, y))
+
+    def reachable(self):
+        """
+        Majority nodes the outputs depend on, in topological order.
+        """
+        seen = set()
+        stack = [s >> 1 for _, s in self.outputs]
+        while stack:
+            node = stack.pop()
+            if node in seen or self.nodes[node] is None:
+                continue
+            seen.add(node)
+            stack.extend(s >> 1 for s in self.nodes[node])
+        return sorted(seen)
+
+    def size(self):
+        return len(self.reachable())
+
+    def depth(self):
+        return max((self.levels[s >> 1] for _, s in self.outputs), default=0)
+
+    def evaluate(self, values, mask=1):
+        """
+        Output values by name for input values by name. Values are bit
+        vectors, mask has a one for every bit in use, so all 2^n input
+        patterns can be checked at once.
+        """
+        v = [0] * len(self.nodes)
+        for name, s in self.inputs:
+            v[s >> 1] = values[name] & mask
+        for n, node in enumerate(self.nodes):
+            if node is not None:
+                x, y, z = (v[s >> 1] ^ (mask if s & 1 else 0) for s in node)
+                v[n] = (x & y) | (x & z) | (y & z)
+        return {name: v[s >> 1] ^ (mask if s & 1 else 0) for name, s in self.outputs}
+
+
+def _tokens(text):
+    for token in re.findall(r"[A-Za-z_][\w.\[\]]*|\d+|\S", text):
+        yield token
+
+
+class _ExpressionParser:
+    # Recursive descent over | (lowest), ^, & and the unary ~ or !, with
+    # maj(x, y, z) or M(x, y, z) and the constants 0 and 1
+    def __init__(self, text, lookup):
+        self.tokens = list(_tokens(text))
+        self.position = 0
+        self.lookup = lookup
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"Expected {expected or 'an operand'} at {' '.join(self.tokens[self.position:]) or 'the end'!r}")
+        self.position += 1
+        return token
+
+    def parse(self, graph):
+        self.graph = graph
+        signal = self.binary(0)
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected {self.peek()!r}")
+        return signal
+
+    def binary(self, level):
+        operators = ("|", "^", "&")
+        if level == len(operators):
+            return self.unary()
+        signal = self.binary(level + 1)
+        while self.peek() == operators[level]:
+            self.take()
+            other = self.binary(level + 1)
+            signal = [self.graph.or_, self.graph.xor, self.graph.and_][level](signal, other)
+        return signal
+
+    def unary(self):
+        if self.peek() in ("~", "!"):
+            self.take()
+            return self.unary() ^ 1
+        token = self.take()
+        if token == "(":
+            signal = self.binary(0)
+            self.take(")")
+            return signal
+        if token in ("0", "1"):
+            return int(token)
+        if token.lower() in ("maj", "m") and self.peek() == "(":
+            self.take("(")
+            x = self.binary(0)
+            self.take(",")
+            y = self.binary(0)
+            self.take(",")
+            z = self.binary(0)
+            self.take(")")
+            return self.graph.maj(x, y, z)
+        if not re.match(r"[A-Za-z_]", token):
+            raise ValueError(f"Unexpected {token!r}")
+        return self.lookup(token)
+
+
+def _parse_expressions(lines):
+    # name = expression lines, with optional "input" and "output" lines
+    graph = Mig()
+    signals = {}
+    declared_outputs = None
+    assigned = []
+    read = set()
+
+    def lookup(name):
+        read.add(name)
+        if name not in signals:
+            signals[name] = graph.add_input(name)
+        return signals[name]
+
+    for line in lines:
+        words = line.split()
+        if words[0] == "input":
+            for name in words[1:]:
+                if name not in signals:
+                    signals[name] = graph.add_input(name)
+            continue
+        if words[0] == "output":
+            declared_outputs = (declared_outputs or []) + words[1:]
+            continue
+        name, equals, expression = line.partition("=")
+        name = name.strip()
+        if not equals or not re.fullmatch(r"[A-Za-z_][\w.\[\]]*", name):
+            raise ValueError(f"Expected 'name = expression', got {line!r}")
+        if name in signals:
+            raise ValueError(f"{name} is assigned twice or after it is read")
+        signals[name] = _ExpressionParser(expression, lookup).parse(graph)
+        assigned.append(name)
+    outputs = declared_outputs if declared_outputs is not None else [n for n in assigned if n not in read]
+    for name in outputs:
+        if name not in signals:
+            raise ValueError(f"Output {name} is never assigned")
+        graph.add_output(name, signals[name])
+    return graph
+
+
+def _parse_blif(lines):
+    # .inputs, .outputs and .names covers; a cover lists the input
+    # patterns (0, 1 or -) of its onset, or of its offset when the output
+    # column is 0
+    inputs, outputs, covers = [], [], {}
+    current = None
+    for line in lines:
+        words = line.split()
+        if words[0] == ".inputs":
+            inputs += words[1:]
+        elif words[0] == ".outputs":
+            outputs += words[1:]
+        elif words[0] == ".names":
+            current = covers[words[-1]] = (words[1:-1], [])
+        elif words[0] in (".model", ".end"):
+            current = None
+        elif words[0].startswith("."):
+            raise ValueError(f"Unsupported BLIF construct {words[0]}")
+        elif current is not None:
+            pattern, value = (words if len(words) == 2 else ("", words[0]))
+            if len(pattern) != len(current[0]) or value not in "01":
+                raise ValueError(f"Invalid cover line {line!r}")
+            current[1].append((pattern, value))
+        else:
+            raise ValueError(f"Cover line {line!r} outside .names")
+
+    graph = Mig()
+    signals = {name: graph.add_input(name) for name in inputs}
+    resolving = set()
+
+    def resolve(name):
+        if name in signals:
+            return signals[name]
+        if name not in covers:
+            raise ValueError(f"{name} is neither an input nor defined by .names")
+        if name in resolving:
+            raise ValueError(f"{name} depends on itself")
+        resolving.add(name)
+        fanins, rows = covers[name]
+        fanin_signals = [resolve(f) for f in fanins]
+        signal = 0
+        for pattern, _ in rows:
+            cube = 1
+            for bit, s in zip(pattern, fanin_signals):
+                if bit != "-":
+                    cube = graph.and_(cube, s if bit == "1" else s ^ 1)
+            signal = graph.or_(signal, cube)
+        if rows and rows[0][1] == "0":
+            signal ^= 1
+        resolving.discard(name)
+        signals[name] = signal
+        return signal
+
+    for name in outputs:
+        graph.add_output(name, resolve(name))
+    return graph
+
+
+def parse_netlist(source):
+    """
+    Reads a Boolean netlist into a Mig, '#' starts a comment. Either one
+    assignment per line,
+
+        input a b cin
+        output s cout
+        t = a ^ b
+        s = t ^ cin
+        cout = maj(a, b, cin)
+
+    with |, ^, & and ~ (or !) from lowest to highest precedence,
+    maj(x, y, z) or M(x, y, z) and the constants 0 and 1, or a BLIF
+    netlist of .inputs, .outputs and .names covers. Names that are read
+    but not assigned are inputs, and without an output line the assigned
+    names nothing reads are the outputs.
+
+    Args:
+        source (str or file-like): Path of the netlist or an open file.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            return parse_netlist(f)
+    lines = []
+    for line in source:
+        line = line.split('#', 1)[0].strip()
+        if lines and lines[-1].endswith("\\"):
+            lines[-1] = lines[-1][:-1] + " " + line
+        elif line:
+            lines.append(line)
+    if any(line.startswith(".") for line in lines):
+        return _parse_blif(lines)
+    return _parse_expressions(lines)
+
+
+def _fanouts(graph, nodes):
+    fanout = [0] * len(graph.nodes)
+    for node in nodes:
+        for s in graph.nodes[node]:
+            fanout[s >> 1] += 1
+    for _, s in graph.outputs:
+        fanout[s >> 1] += 1
+    return fanout
+
+
+def _rewrite_pass(graph):
+    # One bottom-up rebuild of the nodes the outputs need
+    new = Mig()
+    mapping = [0] * len(graph.nodes)
+    for name, s in graph.inputs:
+        mapping[s >> 1] = new.add_input(name)
+    nodes = graph.reachable()
+    fanout = _fanouts(graph, nodes)
+
+    def image(s):
+        return mapping[s >> 1] ^ (s & 1)
+
+    def level(s):
+        return new.levels[image(s) >> 1]
+
+    def inner(s):
+        # inputs of the majority node behind s, complemented with it, when
+        # nothing else reads it
+        node = graph.nodes[s >> 1]
+        if node is None or fanout[s >> 1] != 1:
+            return None
+        return [x ^ (s & 1) for x in node]
+
+    for node in nodes:
+        children = graph.nodes[node]
+        built = None
+        # distributivity: M(M(x, y, u), M(x, y, v), z) = M(x, y, M(u, v, z))
+        for i, j, k in ((0, 1, 2), (0, 2, 1), (1, 2, 0)):
+            first, second = inner(children[i]), inner(children[j])
+            if first is None or second is None:
+                continue
+            shared = [s for s in first if s in second]
+            if len(shared) < 2:
+                continue
+            x, y = shared[:2]
+            u = [s for s in first if s not in (x, y)][0]
+            v = [s for s in second if s not in (x, y)][0]
+            built = new.maj(image(x), image(y), new.maj(image(u), image(v), image(children[k])))
+            break
+        if built is None:
+            # associativity: M(x, u, M(y, u, z)) = M(z, u, M(y, u, x)), when
+            # moving z up a level makes the node shallower
+            current = 1 + max(level(s) for s in children)
+            for k in range(3):
+                below = inner(children[k])
+                if below is None:
+                    continue
+                others = [children[i] for i in range(3) if i != k]
+                for u in others:
+                    if u not in below:
+                        continue
+                    x = [s for s in others if s != u][0]
+                    for z in below:
+                        if z == u:
+                            continue
+                        y = [s for s in below if s not in (u, z)][0]
+                        depth = 1 + max(level(z), level(u), 1 + max(level(y), level(u), level(x)))
+                        if depth < current:
+                            current = depth
+                            built = (z, u, y, x)
+            if built is not None:
+                z, u, y, x = built
+                built = new.maj(image(z), image(u), new.maj(image(y), image(u), image(x)))
+        if built is None:
+            built = new.maj(*(image(s) for s in children))
+        mapping[node] = built
+    for name, s in graph.outputs:
+        new.add_output(name, image(s))
+    return _sweep(new)
+
+
+def _sweep(graph):
+    # Copy of the graph without the nodes no output needs
+    new = Mig()
+    mapping = [0] * len(graph.nodes)
+    for name, s in graph.inputs:
+        mapping[s >> 1] = new.add_input(name)
+    for node in graph.reachable():
+        mapping[node] = new.maj(*(mapping[s >> 1] ^ (s & 1) for s in graph.nodes[node]))
+    for name, s in graph.outputs:
+        new.add_output(name, mapping[s >> 1] ^ (s & 1))
+    return new
+
+
+def rewrite(graph, passes=8):
+    """
+    Rebuilds a graph with fewer majority nodes and less depth. Every pass
+    applies distributivity, M(M(x, y, u), M(x, y, v), z) = M(x, y,
+    M(u, v, z)), to save a node, and otherwise associativity, M(x, u,
+    M(y, u, z)) = M(z, u, M(y, u, x)), to move the deepest input up a
+    level, on nodes nothing else reads. Passes repeat while the size, then
+    the depth, goes down.
+    """
+    best = _sweep(graph)
+    for _ in range(passes):
+        new = _rewrite_pass(best)
+        if (new.size(), new.depth()) >= (best.size(), best.depth()):
+            break
+        best = new
+    return best
+
+
+class Compilation:
+    def __init__(self, graph, original, instructions, program, cells, temporaries, code_address, options):
+        self.graph = graph
+        self.original = original
+        self.instructions = instructions
+        self.program = program
+        self.cells = cells
+        self.temporaries = temporaries
+        self.code_address = code_address
+        self.options = options
+
+
+def _emit(graph, cells, pool, fused_ops):
+    # Instructions as (mnemonic, operand cells) computing every output of
+    # the graph into its cell. The destination of MAJ is also its operand
+    # c, so it is the copy of one input, preferably the complemented one
+    # (copied by NOT) or one whose cell is not needed any more.
+    nodes = graph.reachable()
+    order = {node: n for n, node in enumerate(nodes)}
+    fanout = _fanouts(graph, nodes)
+    end = len(nodes)
+    inputs = {s >> 1: cells[name] for name, s in graph.inputs}
+    # node an output cell is computed into directly
+    bound = {}
+    for name, s in graph.outputs:
+        if s & 1 == 0 and graph.nodes[s >> 1] is not None and s >> 1 not in bound:
+            bound[s >> 1] = cells[name]
+    last_use = {}
+    last_inverted_use = {}
+    for node in nodes:
+        for s in graph.nodes[node]:
+            (last_inverted_use if s & 1 else last_use)[s >> 1] = order[node]
+    for name, s in graph.outputs:
+        last_use[s >> 1] = end
+    # XOR patterns for the fused opcode: M(0, ~M(0, p, q), M(1, p, q)) with
+    # the inner nodes read by nothing else
+    fused = {}
+    if fused_ops:
+        for node in nodes:
+            x, y, z = graph.nodes[node]
+            if x != 0 or y & 1 == z & 1:
+                continue
+            inverted, plain = (y, z) if y & 1 else (z, y)
+            a, b = graph.nodes[inverted >> 1], graph.nodes[plain >> 1]
+            if a is None or b is None or a[0] != 0 or b[0] != 1 or a[1:] != b[1:]:
+                continue
+            if fanout[inverted >> 1] == 1 and fanout[plain >> 1] == 1 and not {inverted >> 1, plain >> 1} & set(bound):
+                fused[node] = a[1:]
+                last_use.pop(inverted >> 1, None)
+                last_inverted_use.pop(inverted >> 1, None)
+                last_use.pop(plain >> 1, None)
+                for s in a[1:]:
+                    last = last_inverted_use if s & 1 else last_use
+                    last[s >> 1] = max(last.get(s >> 1, -1), order[node])
+    skipped = {s >> 1 for node in fused for s in graph.nodes[node][1:]}
+
+    instructions = []
+    value = dict(inputs)
+    complement = {}
+    used = set()
+
+    def allocate():
+        cell = pool.pop(0)
+        used.add(cell)
+        return cell
+
+    def release(cell):
+        pool.append(cell)
+        pool.sort()
+
+    def operand(s):
+        # cell holding signal s, a NOT into a temporary for a complement
+        if s & 1 == 0:
+            return value[s >> 1]
+        if s >> 1 not in complement:
+            complement[s >> 1] = allocate()
+            instructions.append(("NOT", [value[s >> 1], complement[s >> 1]]))
+        return complement[s >> 1]
+
+    def move(s, cell):
+        # one instruction copying signal s into cell, from the cell of s
+        # or, once that is released, by NOT of its complement
+        if s >> 1 in (complement if s & 1 else value):
+            source = complement[s >> 1] if s & 1 else value[s >> 1]
+            if fused_ops:
+                instructions.append(("COPY", [source, cell]))
+            else:
+                instructions.append(("OR", [source, source, cell]))
+        else:
+            instructions.append(("NOT", [value[s >> 1] if s & 1 else complement[s >> 1], cell]))
+
+    def disposable(s, n):
+        # cell of s that no later instruction or output reads
+        if s & 1:
+            if s >> 1 in complement and last_inverted_use.get(s >> 1) == n:
+                return complement[s >> 1]
+            return None
+        if s >> 1 in inputs or s >> 1 in bound or last_use.get(s >> 1) != n:
+            return None
+        if s >> 1 not in complement and last_inverted_use.get(s >> 1, -1) > n:
+            return None
+        return value[s >> 1]
+
+    for n, node in enumerate(nodes):
+        if node in skipped:
+            continue
+        x, y, z = graph.nodes[node]
+        if node in fused:
+            p, q = fused[node]
+            a, b = operand(p), operand(q)
+            destination = bound[node] if node in bound else allocate()
+            instructions.append(("XOR", [a, b, destination]))
+        elif x in (0, 1):
+            a, b = operand(y), operand(z)
+            destination = bound[node] if node in bound else allocate()
+            instructions.append(("AND" if x == 0 else "OR", [a, b, destination]))
+        else:
+            signals = [x, y, z]
+            target = next((s for s in signals if s & 1), None)
+            in_place = None
+            if node not in bound:
+                for s in ([target] if target is not None else signals):
+                    in_place = disposable(s, n)
+                    if in_place is not None:
+                        target = s
+                        break
+            if target is None:
+                target = z
+            rest = [s for s in signals if s != target]
+            a, b = operand(rest[0]), operand(rest[1])
+            if in_place is not None:
+                destination = in_place
+                if target & 1:
+                    del complement[target >> 1]
+                else:
+                    del value[target >> 1]
+            else:
+                destination = bound[node] if node in bound else allocate()
+                move(target, destination)
+            instructions.append(("MAJ", [a, b, destination]))
+        value[node] = destination
+        # free the cells nothing reads any more
+        for s in fused.get(node, graph.nodes[node]):
+            child = s >> 1
+            if child in complement and last_inverted_use.get(child, -1) <= n:
+                release(complement.pop(child))
+            if child in value and child not in inputs and child not in bound and last_use.get(child, -1) <= n \
+                    and (child in complement or last_inverted_use.get(child, -1) <= n):
+                release(value.pop(child))
+
+    for name, s in graph.outputs:
+        cell = cells[name]
+        if s >> 1 == 0:
+            # a constant: x AND ~x or x OR ~x of the output cell itself
+            temporary = allocate()
+            instructions.append(("NOT", [cell, temporary]))
+            instructions.append(("AND" if s == 0 else "OR", [cell, temporary, cell]))
+            release(temporary)
+        elif value.get(s >> 1) != cell or s & 1:
+            move(s, cell)
+    return instructions, used
+
+
+def _cell_name(cell, row_ad_bits, col_ad_bits, bit_ad_bits):
+    return f"{format(cell >> bit_ad_bits, f'0{row_ad_bits + col_ad_bits}b')}:{format(cell % 2 ** bit_ad_bits, f'0{bit_ad_bits}b')}"
+
+
+def compile_program(source, row_ad_bits, col_ad_bits, bit_ad_bits, cells=None, data_address=0, code_address=None,
+                    program_counter=False, compact=False, fused_ops=False, optimize=True):
+    """
+    Compiles a Boolean netlist into a program of MAJ, AND, OR and NOT
+    instructions for the controller, as Testbench actions.
+
+    Args:
+        source (Mig, str or file-like): The graph, or a netlist for
+            parse_netlist.
+        row_ad_bits (int): Number of row address bits.
+        col_ad_bits (int): Number of column address bits.
+        bit_ad_bits (int): Number of bit address bits.
+        cells (dict): "word:bit" binary cell of an input or output by name.
+            The others, and the temporaries, are placed from bit 0 of
+            data_address on. Input cells are only read.
+        data_address (int): Word address of the first data cell.
+        code_address (int): Word address the program is stored from, by
+            default the start of the row after the data.
+        program_counter (bool): End the program with HALT and start it
+            with one 'e' action, for a controller generated with
+            program_counter=True; otherwise every instruction gets an 'e'.
+        compact (bool): Encode for a controller generated with
+            compact=True, which needs every data cell in one row.
+        fused_ops (bool): Also use the XOR and COPY opcodes of a controller
+            generated with fused_ops=True.
+        optimize (bool): Rewrite the graph first, see rewrite.
+
+    Returns:
+        Compilation: the graph compiled, the graph as parsed, the
+        instructions as (mnemonic, operand cells), the program ('i' actions
+        and then 'e' actions, see Testbench.validate_program), the "word:bit"
+        cell of every input and output, the number of temporary cells, the
+        first code word and the options of the controller it is for.
+    """
+    if program_counter and fused_ops:
+        raise ValueError("fused_ops and program_counter both need opcodes 4-7")
+    graph = source if isinstance(source, Mig) else parse_netlist(source)
+    original = _sweep(graph)
+    if optimize:
+        graph = rewrite(original)
+    row_cells = 2 ** (col_ad_bits + bit_ad_bits)
+    # the scratch cell of the execute step is the last one of the array
+    scratch = 2 ** (row_ad_bits + col_ad_bits + bit_ad_bits) - 1
+    first = data_address * 2 ** bit_ad_bits
+    if compact:
+        last = (first // row_cells + 1) * row_cells
+    elif code_address is not None:
+        last = code_address * 2 ** bit_ad_bits
+    else:
+        last = scratch
+    pool = list(range(first, min(last, scratch)))
+
+    placed = {}
+    for name, cell in (cells or {}).items():
+        word, _, bit = cell.partition(':')
+        if len(word) != row_ad_bits + col_ad_bits or len(bit) != bit_ad_bits or set(word + bit) - set("01"):
+            raise ValueError(f"Invalid cell {cell!r} for {name}, expected {row_ad_bits + col_ad_bits} binary digits, ':' and {bit_ad_bits} binary digits")
+        placed[name] = int(word, 2) * 2 ** bit_ad_bits + int(bit, 2)
+    names = [name for name, _ in graph.inputs] + [name for name, _ in graph.outputs]
+    for name in placed:
+        if name not in names:
+            raise ValueError(f"{name} is not an input or output of the netlist")
+    for cell in placed.values():
+        if cell in pool:
+            pool.remove(cell)
+    for name in names:
+        if name not in placed:
+            if not pool:
+                raise ValueError("The data cells do not fit before the program")
+            placed[name] = pool.pop(0)
+    if len(set(placed.values())) != len(placed) or scratch in placed.values():
+        raise ValueError("Inputs and outputs need cells of their own, other than the scratch cell")
+    if compact and len({cell // row_cells for cell in placed.values()}) > 1:
+        raise ValueError("The compact encoding needs every data cell in one row")
+
+    free = len(pool)
+    try:
+        instructions, temporaries = _emit(graph, placed, pool, fused_ops)
+    except IndexError:
+        raise ValueError(f"The temporaries need more than the {free} free data cells") from None
+    if program_counter:
+        instructions.append(("HALT", []))
+
+    data = list(placed.values()) + list(temporaries)
+    data_start, data_end = min(data) // 2 ** bit_ad_bits, max(data) // 2 ** bit_ad_bits + 1
+    if code_address is None:
+        code_address = -(-data_end // 2 ** col_ad_bits) * 2 ** col_ad_bits
+    program = []
+    address = code_address
+    for name, operands in instructions:
+        short = compact and "b" not in OPERANDS[name]
+        words = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact, short)
+        if address + words > scratch >> bit_ad_bits or (address < data_end and address + words > data_start):
+            raise ValueError(f"The {len(instructions)} instructions do not fit between the data and the scratch cell from word {code_address}")
+        following = next_pc(address, row_ad_bits, col_ad_bits, bit_ad_bits, compact, short)
+        text = " ".join([name] + [_cell_name(c, row_ad_bits, col_ad_bits, bit_ad_bits) for c in operands])
+        program.append(('i', format(address, f'0{row_ad_bits + col_ad_bits}b'), text))
+        address = following
+    executes = [op[1] for op in program[:1]] if program_counter else [op[1] for op in program]
+    program += [('e', addr) for addr in executes]
+    options = {"row_ad_bits": row_ad_bits, "col_ad_bits": col_ad_bits, "bit_ad_bits": bit_ad_bits,
+               "program_counter": program_counter, "compact": compact, "fused_ops": fused_ops}
+    named = {name: _cell_name(cell, row_ad_bits, col_ad_bits, bit_ad_bits) for name, cell in placed.items()}
+    return Compilation(graph, original, instructions, program, named, len(temporaries), code_address, options)
+
+
+def input_writes(compilation, values):
+    """
+    'w' actions that store input values by name (0 or 1) in their cells,
+    one per word; the other bits of those words are cleared.
+    """
+    bit_ad_bits = compilation.options["bit_ad_bits"]
+    words = {}
+    for name, bit in values.items():
+        if name not in compilation.cells:
+            raise ValueError(f"{name} is not an input of the program")
+        word, _, position = compilation.cells[name].partition(':')
+        words.setdefault(word, [0] * 2 ** bit_ad_bits)[int(position, 2)] = int(bit)
+    # data is MSB first, cell bit k gets data[-1-k]
+    return [('w', word, "".join(str(b) for b in reversed(bits))) for word, bits in words.items()]
+
+
+def predict_cycles(compilation, handshake=False, icache_entries=0, pipelined=False, open_row=False,
+                   forwarding=False):
+    """
+    Cycles the program of a compilation takes on the controller, from the
+    first 'e' on, with the instructions preloaded (see
+    crossbar.preload_image). Straight-line programs take the same number
+    of cycles for any input, so it runs on a cleared array.
+
+    Args:
+        handshake, icache_entries, pipelined, open_row, forwarding: Passed
+            on to simulator.simulate with the options of the compilation.
+    """
+    options = compilation.options
+    image, rest = preload_image(compilation.program, options["row_ad_bits"], options["col_ad_bits"],
+                                options["bit_ad_bits"], compact=options["compact"])
+    return simulate(rest, options["row_ad_bits"], options["col_ad_bits"], options["bit_ad_bits"], trace=False,
+                    image=image, handshake=handshake, program_counter=options["program_counter"],
+                    icache_entries=icache_entries, pipelined=pipelined, open_row=open_row, forwarding=forwarding,
+                    compact=options["compact"], fused_ops=options["fused_ops"]).cycles
+
+
+def compile_report(compilation, **simulation):
+    """
+    Summary of a compilation: majority nodes and depth before and after
+    rewriting, instructions by mnemonic, cells used and the cycles
+    predict_cycles gives, with its keyword arguments.
+    """
+    counts = {}
+    for name, _ in compilation.instructions:
+        counts[name] = counts.get(name, 0) + 1
+    cycles = predict_cycles(compilation, **simulation)
+    graph, original = compilation.graph, compilation.original
+    lines = [
+        f"Majority nodes: {graph.size()}, depth {graph.depth()} "
+        f"({original.size()} and {original.depth()} before rewriting)",
+        f"Instructions: {len(compilation.instructions)} "
+        f"({', '.join(f'{name} {count}' for name, count in counts.items())})",
+        f"Cells: {len(graph.inputs)} inputs, {len(graph.outputs)} outputs, {compilation.temporaries} temporaries",
+        f"Program: from word {compilation.code_address}",
+        f"Predicted cycles: {cycles} ({cycles / max(len(compilation.instructions), 1):.1f} per instruction)",
+    ]
+    lines += [f"  {name} at {cell}" for name, cell in compilation.cells.items()]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    import io
+
+    from Testbench import generate_testbench
+
+    # Example: a 2-bit ripple-carry adder
+    netlist = io.StringIO("""
+        input a0 a1 b0 b1 cin
+        output s0 s1 cout
+        c1 = maj(a0, b0, cin)
+        s0 = a0 ^ b0 ^ cin
+        s1 = a1 ^ b1 ^ c1
+        cout = maj(a1, b1, c1)
+    """)
+    compilation = compile_program(netlist, 3, 5, 2, program_counter=True)
+    print(compile_report(compilation))
+    values = {"a0": 1, "a1": 0, "b0": 1, "b1": 1, "cin": 0}
+    with open("testbench.va", "w") as f:
+        generate_testbench(3, 5, 2, out=f, program=input_writes(compilation, values) + compilation.program)
@@ -1,565 +1,1249 @@
-import math
-
-def generate_veriloga(row_ad_bits, col_ad_bits, bit_ad_bits):
-    # Calculate the condition
-    required_value = 3 * (1 + row_ad_bits + col_ad_bits + bit_ad_bits)
-    max_value = 2 ** (col_ad_bits + bit_ad_bits)
-    
-    # Check the condition and find the nearest valid value
-    if required_value > max_value:
-        raise ValueError(f"Condition 3(1 + row_ad_bits + col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits) is not satisfied for row_ad_bits={row_ad_bits}, col_ad_bits={col_ad_bits}, bit_ad_bits={bit_ad_bits}")
-    
-    # Find the nearest integer greater than or equal to the required value, divisible by 2^(bit_ad_bits)
-    instruction_length = math.ceil(required_value / (2 ** bit_ad_bits))
-
-    addressses = [f'address_{i}' for i in range(row_ad_bits + col_ad_bits)]
-    data_ins = [f'data_in_{i}' for i in range(2 ** bit_ad_bits)]
-    crossbar_datas = [f'crossbar_data_{i}' for i in range(2 ** bit_ad_bits)]
-    row_ads = [f'row_ad_{i}' for i in range(row_ad_bits)]
-    col_ads = [f'col_ad_{i}' for i in range(col_ad_bits)]
-    write_datas = [f'write_data_{i}' for i in range(2 ** bit_ad_bits)]
-    bit_ads = [f'bit_ad_{i}' for i in range(bit_ad_bits)]
-    data_outs = [f'data_out_{i}' for i in range(2 ** bit_ad_bits)]
-    instructions = [f'instruction_{i}' for i in range(instruction_length * (2 ** bit_ad_bits))]
-
-    # Generate the Verilog-A code
-    veriloga_code = f"""`include "disciplines.vams"
-
-module controller (
-\tinput electrical en,
-\tinput electrical plim,
-\tinput electrical idle,"""
-
-    # Inputs
-    for a in addressses:
-        veriloga_code += f"\n\tinput electrical {a},"
-    veriloga_code += "\n\tinput electrical wr,"
-    for d in data_ins:
-        veriloga_code += f"\n\tinput electrical {d},"
-    for c in crossbar_datas:
-        veriloga_code += f"\n\tinput electrical {c},"
-
-    # Outputs
-    for r in row_ads:
-        veriloga_code += f"\n\toutput electrical {r},"
-    for c in col_ads:
-        veriloga_code += f"\n\toutput electrical {c},"
-    veriloga_code += """
-\toutput electrical row_idle,
-\toutput electrical col_idle,
-\toutput electrical write_read,
-\toutput electrical bit_or_word,"""
-    for w in write_datas:
-        veriloga_code += f"\n\toutput electrical {w},"
-    for b in bit_ads:
-        veriloga_code += f"\n\toutput electrical {b},"
-    veriloga_code += """
-\toutput electrical maj,
-\toutput electrical majp,
-\toutput electrical majn,"""
-    for d in data_outs:
-        veriloga_code += f"\n\toutput electrical {d},"
-    veriloga_code += "\n\toutput electrical instr_exec_status\n);\n"
-
-    # Parameters
-    veriloga_code += f"""
-\tparameter integer row_ad_bits = {row_ad_bits};
-\tparameter integer col_ad_bits = {col_ad_bits};
-\tparameter integer bit_ad_bits = {bit_ad_bits};
-\tparameter integer instruction_length = {instruction_length};
-
-\tinteger state = 0;
-\tinteger read_write_state = 0;
-\treal v_en_prev;
-\tinteger no_of_words_fetched = 0;
-\tinteger internal_state = 0;
-\tinteger col_ad = 0;
-\treal a_reg;
-\treal b_reg;
-\treal c_reg;
-"""
-
-    # Internal state signals
-    for sig_group in [row_ads, col_ads, write_datas, bit_ads, data_outs, instructions]:
-        for sig in sig_group:
-            veriloga_code += f"\treal v_{sig};\n"
-    veriloga_code += "\treal v_row_idle, v_col_idle, v_write_read, v_bit_or_word;\n"
-    veriloga_code += "\treal v_maj, v_majp, v_majn, v_instr_exec_status;\n\n"
-
-    # Analog process block
-    veriloga_code += "analog begin\n"
-    veriloga_code += "\t@(initial_step) begin\n"
-    veriloga_code += "\t\tv_en_prev = V(en);\n"
-    veriloga_code += "\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\tv_instr_exec_status = 0.0;\n"
-    veriloga_code += "\tend\n\n"
-    for s in reversed(addressses[0:col_ad_bits]):
-        veriloga_code += f"\tcol_ad = col_ad *2 + (V({s}) > 0.5 ? 1 : 0);\n"
-    
-    veriloga_code += "\tif(V(idle) > 0.5) begin\n"
-    veriloga_code += "\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\tif(V(plim) < 0.5 && v_instr_exec_status > 0.5) begin\n"
-    veriloga_code += "\t\t\tv_instr_exec_status = 0;\n"
-    veriloga_code += "\t\t\tstate = 0;\n"
-    veriloga_code += "\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\tno_of_words_fetched = 0;\n"
-    veriloga_code += "\t\tend\n"
-    veriloga_code += "\tend\n"
-
-
-    veriloga_code += "\telse if (V(en) > 0.5 && v_en_prev < 0.5) begin\n"
-    veriloga_code += "\t\tif ((V(plim) > 0.5 || state != 0 || internal_state != 0 || no_of_words_fetched > 0) && v_instr_exec_status < 0.5 && read_write_state == 0) begin\n"
-    veriloga_code += "\t\t\t$display(\"In plim\", state, internal_state);\n"
-    veriloga_code += "\t\t\tcase (state)\n"
-    veriloga_code += "\t\t\t\t0: begin\n"
-    for i, r in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\tv_{r} = V({addressses[col_ad_bits + i]});\n"
-    veriloga_code += "\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tcase (no_of_words_fetched)\n"
-    for i in range(instruction_length):
-        veriloga_code += f"\t\t\t\t\t\t{i}: begin\n"
-        veriloga_code += f"\t\t\t\t\t\t\tcase (internal_state)\n"
-        veriloga_code += f"\t\t\t\t\t\t\t\t0: begin\n"
-        for j, c in enumerate(col_ads):
-            veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = ((col_ad + {i})/{2**j})%2;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 0.0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-        veriloga_code += f"\t\t\t\t\t\t\t\tend\n"
-        veriloga_code += f"\t\t\t\t\t\t\t\t1: begin\n"
-        for j, c in enumerate(crossbar_datas):
-            veriloga_code += f"\t\t\t\t\t\t\t\t\tv_instruction_{i*2**bit_ad_bits + j} = V({c});\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-        veriloga_code += "\t\t\t\t\t\t\t\t\tno_of_words_fetched = no_of_words_fetched + 1;\n"
-        if i == instruction_length - 1:
-            veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 1;\n"
-            veriloga_code += "\t\t\t\t\t\t\t\t\tno_of_words_fetched = 0;\n"
-        veriloga_code += f"\t\t\t\t\t\t\t\tend\n"
-        veriloga_code += f"\t\t\t\t\t\t\tendcase\n"
-        veriloga_code += f"\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t1: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\tcase (internal_state)\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t0: begin\n"
-    for i, c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+row_ad_bits+col_ad_bits+bit_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t1: begin\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+row_ad_bits+col_ad_bits+bit_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+row_ad_bits+col_ad_bits+bit_ad_bits+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tb_reg = V(crossbar_data_0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t3: begin\n"
-    for i, c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t4: begin\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t5: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\ta_reg = V(crossbar_data_0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t6: begin\n"
-    for i, c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 7;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t7: begin\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 8;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t8: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tc_reg = V(crossbar_data_0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 2;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\tif(v_instruction_0 < 0.5 && v_instruction_1 < 0.5 && v_instruction_2 < 0.5) begin //MAJ(@a,@b,@c)\n"
-    veriloga_code += "\t\t\t\t\t\t\tcase (internal_state)\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t0: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (b_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t1: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(col_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
-    for i, b in enumerate(bit_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majp = (a_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majn = (c_reg < 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"MAJ\", a_reg, b_reg, c_reg);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t3: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t4: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t5: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"OUTPUT\", v_write_data_0);\n"
-    for i,c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)};\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+row_ad_bits};\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t6: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\tif(v_instruction_0 < 0.5 && v_instruction_1 < 0.5 && v_instruction_2 > 0.5) begin //AND(@a,@b,@c) AND(a,b) stores in c\n"
-    veriloga_code += "\t\t\t\t\t\t\tcase (internal_state)\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t0: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t1: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(col_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
-    for i, b in enumerate(bit_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majp = (a_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majn = (b_reg < 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"AND\", a_reg, b_reg);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t3: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t4: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t5: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"OUTPUT\", v_write_data_0);\n"
-    for i,c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)};\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+row_ad_bits};\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t6: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\tif(v_instruction_0 < 0.5 && v_instruction_1 > 0.5 && v_instruction_2 < 0.5) begin //OR(@a,@b,@c) OR(a,b) stores in c\n"
-    veriloga_code += "\t\t\t\t\t\t\tcase (internal_state)\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t0: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t1: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(col_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
-    for i, b in enumerate(bit_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majp = (a_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majn = (b_reg < 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"OR\", a_reg, b_reg);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t3: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t4: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t5: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"OUTPUT\", v_write_data_0);\n"
-    for i,c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)};\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+row_ad_bits};\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t6: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\tif(v_instruction_0 < 0.5 && v_instruction_1 > 0.5 && v_instruction_2 > 0.5) begin //NOT(@a,@b,@c) NOT(a) stores in c\n"
-    veriloga_code += "\t\t\t\t\t\t\tcase (internal_state)\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t0: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (a_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t1: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    for i, c in enumerate(col_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
-    for i, b in enumerate(bit_ads):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majp = (a_reg < 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_majn = (a_reg > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"NOT\", a_reg);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t3: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t4: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t5: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"OUTPUT\", v_write_data_0);\n"
-    for i,c in enumerate(reversed(row_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)};\n"
-    for i,c in enumerate(reversed(col_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{c} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+row_ad_bits};\n"
-    for i,b in enumerate(reversed(bit_ads)):
-        veriloga_code += f"\t\t\t\t\t\t\t\t\tv_{b} = v_instruction_{i+3+2*(row_ad_bits+col_ad_bits+bit_ad_bits)+col_ad_bits+row_ad_bits};\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t6: begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\tstate = 3;\n"
-    veriloga_code += "\t\t\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t\t\tendcase\n"
-    veriloga_code += "\t\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\t3: begin\n"
-    veriloga_code += "\t\t\t\t\t\tstate = 0;\n"
-    veriloga_code += "\t\t\t\t\t\tinternal_state = 0;\n"
-    veriloga_code += "\t\t\t\t\t\tv_instr_exec_status = 1.0;\n"
-    veriloga_code += "\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\tendcase\n"
-
-
-    # RAM read/write
-    veriloga_code += "\t\tend else if((V(plim) < 0.5 || read_write_state != 0) && state == 0) begin\n"
-    veriloga_code += "\t\t\t\t\t\t\t\t\t$display(\"In RAM\", read_write_state);\n"
-    veriloga_code += "\t\t\tv_instr_exec_status = 0.0;\n"
-    veriloga_code += "\t\t\tcase (read_write_state)\n"
-    veriloga_code += "\t\t\t\t0: begin\n"
-    for i, r in enumerate(row_ads):
-        veriloga_code += f"\t\t\t\t\tv_{r} = V({addressses[col_ad_bits + i]});\n"
-    veriloga_code += "\t\t\t\t\tv_row_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tread_write_state = 1;\n"
-    veriloga_code += "\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t1: begin\n"
-    for i, c in enumerate(col_ads):
-        veriloga_code += f"\t\t\t\t\tv_{c} = V({addressses[i]});\n"
-    veriloga_code += "\t\t\t\t\tv_col_idle = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tv_write_read = V(wr);\n"
-    veriloga_code += "\t\t\t\t\tv_bit_or_word = 0.0;\n"
-    for i,d in enumerate(data_ins):
-        veriloga_code += f"\t\t\t\t\tv_write_data_{i} = V({d});\n"
-    for b in bit_ads:
-        veriloga_code += f"\t\t\t\t\tv_{b} = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tv_maj = 0.0;\n\t\t\t\t\tv_majp = 0.0;\n\t\t\t\t\tv_majn = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tread_write_state = 2;\n"
-    veriloga_code += "\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t2: begin\n"
-    veriloga_code += "\t\t\t\t\tif (V(wr) < 0.5) begin\n"
-    for i, c in enumerate(crossbar_datas):
-        veriloga_code += f"\t\t\t\t\t\tv_{data_outs[i]} = V({c});\n"
-    veriloga_code += "\t\t\t\t\tend else begin\n"
-    for d in data_outs:
-        veriloga_code += f"\t\t\t\t\t\tv_{d} = 0.0;\n"
-    veriloga_code += "\t\t\t\t\tend\n"
-    veriloga_code += "\t\t\t\t\tv_row_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\tv_col_idle = 1.0;\n"
-    veriloga_code += "\t\t\t\t\tread_write_state = 0;\n"
-    veriloga_code += "\t\t\t\tend\n"
-    veriloga_code += "\t\t\tendcase\n"
-    veriloga_code += "\t\tend\n\tend\n"
-
-    # Continuous assignments
-    for sig in row_ads + col_ads + write_datas + bit_ads + data_outs:
-        veriloga_code += f"\tV({sig}) <+ v_{sig};\n"
-    veriloga_code += "\tV(row_idle) <+ v_row_idle;\n"
-    veriloga_code += "\tV(col_idle) <+ v_col_idle;\n"
-    veriloga_code += "\tV(write_read) <+ v_write_read;\n"
-    veriloga_code += "\tV(bit_or_word) <+ v_bit_or_word;\n"
-    veriloga_code += "\tV(maj) <+ v_maj;\n"
-    veriloga_code += "\tV(majp) <+ v_majp;\n"
-    veriloga_code += "\tV(majn) <+ v_majn;\n"
-    veriloga_code += "\tV(instr_exec_status) <+ v_instr_exec_status;\n"
-    veriloga_code += "\tv_en_prev = V(en);\nend\nendmodule"
-
-    return veriloga_code
-
-
-# Example
-code = generate_veriloga(2, 4, 1)
-
-# write the code to a file
-with open("controller_full.va", "w") as f:
-    f.write(code)
-
+import math
+
+# Levels of the trace_level module parameter. Every $display is guarded by
+# it, so tracing can be turned down per instance without regenerating.
+TRACE_LEVELS = {"off": 0, "summary": 1, "instruction": 2, "cycle": 3}
+
+# Microcode ROM for the PLIM execute step (state 2). Every opcode runs the
+# same sequence: write rom_scratch into the scratch cell (last address),
+# apply the memristive majority with rom_majp/rom_majn, read the scratch
+# cell back and write it to operand c. An entry is
+# opcode: (mnemonic, rom_scratch, rom_majp, rom_majn, $display arguments).
+MICROCODE = {
+    0: ("MAJ", "(b_reg > 0.5 ? 1.0 : 0.0)", "(a_reg > 0.5 ? 1.0 : 0.0)", "(c_reg < 0.5 ? 1.0 : 0.0)", "a_reg, b_reg, c_reg"),
+    1: ("AND", "0.0", "(a_reg > 0.5 ? 1.0 : 0.0)", "(b_reg < 0.5 ? 1.0 : 0.0)", "a_reg, b_reg"),
+    2: ("OR", "1.0", "(a_reg > 0.5 ? 1.0 : 0.0)", "(b_reg < 0.5 ? 1.0 : 0.0)", "a_reg, b_reg"),
+    3: ("NOT", "(a_reg > 0.5 ? 1.0 : 0.0)", "(a_reg < 0.5 ? 1.0 : 0.0)", "(a_reg > 0.5 ? 1.0 : 0.0)", "a_reg"),
+}
+
+# Control opcodes of the program counter, see generate_veriloga. Jumps go
+# to the word address of operand c; JT and JF test the bit at operand a.
+# An entry is opcode: (mnemonic, condition on a_reg for the jump), HALT has
+# no condition and JMP an empty one.
+CONTROL_OPCODES = {
+    4: ("HALT", None),
+    5: ("JMP", ""),
+    6: ("JT", "a_reg > 0.5"),
+    7: ("JF", "a_reg < 0.5"),
+}
+
+
+# Word-parallel execute ROM of generate_veriloga(word_ops=True), for the
+# word majority of CAS_temp.generate_cas_module(word_maj=True). Opcodes 4-7
+# apply MAJ, AND, OR and NOT to every bit of the operand words: the scratch
+# word is written from rom_scratch, then write_data carries majp and
+# write_data_n majn bit by bit. An entry is
+# opcode: (mnemonic, rom_scratch, rom_majp, rom_majn), with {j} the bit.
+WORD_MICROCODE = {
+    4: ("VMAJ", "(b_word[{j}] > 0.5 ? 1.0 : 0.0)", "(a_word[{j}] > 0.5 ? 1.0 : 0.0)", "(c_word[{j}] < 0.5 ? 1.0 : 0.0)"),
+    5: ("VAND", "0.0", "(a_word[{j}] > 0.5 ? 1.0 : 0.0)", "(b_word[{j}] < 0.5 ? 1.0 : 0.0)"),
+    6: ("VOR", "1.0", "(a_word[{j}] > 0.5 ? 1.0 : 0.0)", "(b_word[{j}] < 0.5 ? 1.0 : 0.0)"),
+    7: ("VNOT", "(a_word[{j}] > 0.5 ? 1.0 : 0.0)", "(a_word[{j}] < 0.5 ? 1.0 : 0.0)", "(a_word[{j}] > 0.5 ? 1.0 : 0.0)"),
+}
+
+
+# Fused execute sequences of generate_veriloga(fused_ops=True), on
+# opcodes 4-7 like WORD_MICROCODE. The operands stay in a_reg, b_reg and
+# c_reg for the whole sequence. A step (destination, x, y, z) writes x
+# into the scratch cell and applies the memristive majority so that it
+# holds MAJ(x, y, z), then reads it back into register t0 or t1 or writes
+# it to operand b or c; a step (destination, x) writes x to the operand
+# directly. Inputs are a, b, c, t0, t1, 0 and 1, a leading ~ inverts.
+# An entry is opcode: (mnemonic, steps), see fused_schedule.
+FUSED_MICROCODE = {
+    # b = a + b + c, c = carry out: ripple-carry addition into b
+    4: ("FA", [("t0", "a", "b", "c"), ("t1", "a", "b", "~c"), ("b", "~t0", "c", "t1"), ("c", "t0")]),
+    5: ("XOR", [("t0", "a", "b", "0"), ("t1", "a", "b", "1"), ("c", "~t0", "t1", "0")]),
+    6: ("COPY", [("c", "a")]),
+}
+
+
+def fused_operands(steps, written=True):
+    """
+    Operands a FUSED_MICROCODE sequence reads, and writes unless written
+    is False, in "abc" order.
+    """
+    used = {name.lstrip("~") for step in steps for name in step[0 if written else 1:]}
+    return "".join(x for x in "abc" if x in used)
+
+
+def fused_schedule(steps):
+    """
+    Edges of a FUSED_MICROCODE sequence, as the execute state runs them
+    from internal state 0 on. Each edge is a list of actions:
+    ("latch", t) reads the scratch cell into register t, ("scratch", x)
+    writes x into it, ("select",) selects it, ("majority", y, z) applies
+    the majority, ("release",) and ("read",) read it back, ("store", k, x)
+    writes x, or the value read back when x is None, to operand k, and
+    ("idle",) ends the instruction. A register result is latched on the
+    first edge of the next step.
+    """
+    edges = []
+    pending = []
+    for n, (destination, *inputs) in enumerate(steps):
+        if len(inputs) == 1:
+            edges.append(pending + [("store", "abc".index(destination), inputs[0])])
+            pending = []
+            continue
+        edges.append(pending + [("scratch", inputs[0])])
+        edges.append([("select",)])
+        edges.append([("majority", inputs[1], inputs[2])])
+        edges.append([("release",)])
+        edges.append([("read",)])
+        if destination in ("t0", "t1"):
+            if n == len(steps) - 1:
+                raise ValueError(f"The last step of a fused sequence must write an operand, not {destination}")
+            pending = [("latch", destination)]
+        else:
+            edges.append([("store", "abc".index(destination), None)])
+            pending = []
+    edges.append([("idle",)])
+    return edges
+
+
+# Operand fields of the compact encoding, in the order they are stored,
+# see compact_lengths
+COMPACT_OPERANDS = "acb"
+
+
+def compact_lengths(row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Bits of an instruction in the compact encoding of
+    generate_veriloga(compact=True): the opcode, the row of the operands
+    relative to the row the instruction is stored in, then operands a, c
+    and b as column and bit address. The short form leaves operand b out.
+
+    Returns:
+        tuple: Length of the full and of the short form in bits.
+    """
+    operand = col_ad_bits + bit_ad_bits
+    return 3 + row_ad_bits + 3 * operand, 3 + row_ad_bits + 2 * operand
+
+
+def trace_level_value(trace_level):
+    """
+    Maps a TRACE_LEVELS name or number to the trace_level parameter value.
+    """
+    if trace_level in TRACE_LEVELS:
+        return TRACE_LEVELS[trace_level]
+    if trace_level in TRACE_LEVELS.values():
+        return trace_level
+    raise ValueError(f"Unknown trace level {trace_level!r}, expected one of {list(TRACE_LEVELS)}")
+
+
+def _iter_icache_invalidate(indent, address, icache_entries, col_ad_bits, row_mask=None):
+    # Drops every cached instruction with a word at address (same row,
+    # column inside the instruction, which wraps within the row). With
+    # row_mask the rows only have to match on its low bits.
+    row_words = 2 ** col_ad_bits
+    if row_mask is None:
+        same_row = f"icache_tag[icache_k] / {row_words} == icache_write_addr / {row_words}"
+    else:
+        same_row = f"(icache_tag[icache_k] / {row_words} & ~({row_mask})) == (icache_write_addr / {row_words} & ~({row_mask}))"
+    yield f"{indent}icache_write_addr = {address};\n"
+    yield f"{indent}for (icache_k = 0; icache_k < {icache_entries}; icache_k = icache_k + 1)\n"
+    yield (f"{indent}\tif (icache_tag[icache_k] >= 0 && {same_row}"
+           f" && (icache_write_addr - icache_tag[icache_k] + {row_words}) % {row_words} < instruction_length)\n")
+    yield f"{indent}\t\ticache_tag[icache_k] = -1;\n"
+
+
+def _iter_icache_lookup(indent, fetch_addr, instructions, icache_entries, advance_pc):
+    # Looks the instruction up once, before its first word is fetched, and
+    # loads it on a hit. Leaves an "else begin" open for the fetch.
+    t = indent
+    yield f"{t}if (no_of_words_fetched == 0 && internal_state == 0) begin\n"
+    yield f"{t}\ticache_fetch_addr = {fetch_addr};\n"
+    yield f"{t}\ticache_hit = -1;\n"
+    yield f"{t}\tfor (icache_k = 0; icache_k < {icache_entries}; icache_k = icache_k + 1)\n"
+    yield f"{t}\t\tif (icache_tag[icache_k] == icache_fetch_addr) icache_hit = icache_k;\n"
+    yield f"{t}\tif (icache_hit >= 0) begin\n"
+    yield f"{t}\t\ticache_hits = icache_hits + 1;\n"
+    yield f"{t}\t\tif (trace_level >= 3) $display(\"icache hit\", icache_fetch_addr, icache_hits, icache_misses);\n"
+    yield f"{t}\tend else begin\n"
+    yield f"{t}\t\ticache_misses = icache_misses + 1;\n"
+    yield f"{t}\t\tif (trace_level >= 3) $display(\"icache miss\", icache_fetch_addr, icache_hits, icache_misses);\n"
+    yield f"{t}\tend\n"
+    yield f"{t}end\n"
+    yield f"{t}if (icache_hit >= 0) begin\n"
+    for j, sig in enumerate(instructions):
+        yield f"{t}\tv_{sig} = icache_data[icache_hit * {len(instructions)} + {j}];\n"
+    for line in advance_pc:
+        yield f"{t}\t" + line
+    yield f"{t}\ticache_hit = -1;\n"
+    yield f"{t}\tstate = 1;\n"
+    yield f"{t}end else begin\n"
+
+
+def _iter_icache_fill(indent, instructions, icache_entries):
+    # round robin replacement
+    yield f"{indent}icache_tag[icache_next] = icache_fetch_addr;\n"
+    for j, sig in enumerate(instructions):
+        yield f"{indent}icache_data[icache_next * {len(instructions)} + {j}] = v_{sig};\n"
+    yield f"{indent}icache_next = (icache_next + 1) % {icache_entries};\n"
+
+
+def iter_veriloga(row_ad_bits, col_ad_bits, bit_ad_bits, microcode=MICROCODE, event_driven=False,
+                  trace_level="cycle", handshake=False, program_counter=False, icache_entries=0, pipelined=False,
+                  open_row=False, word_ops=False, multi_row=False, forwarding=False, compact=False, fused_ops=False,
+                  burst=False):
+    """
+    Yields the controller module chunk by chunk.
+    """
+    if word_ops and program_counter:
+        raise ValueError(f"word_ops and program_counter both need opcodes {sorted(WORD_MICROCODE)}")
+    if word_ops and set(microcode) & set(WORD_MICROCODE):
+        raise ValueError(f"Opcodes {sorted(WORD_MICROCODE)} are taken by word_ops")
+    if fused_ops and (word_ops or program_counter):
+        raise ValueError(f"fused_ops, word_ops and program_counter all need opcodes {sorted(FUSED_MICROCODE)}")
+    if fused_ops and set(microcode) & set(FUSED_MICROCODE):
+        raise ValueError(f"Opcodes {sorted(FUSED_MICROCODE)} are taken by fused_ops")
+    if pipelined and not program_counter:
+        raise ValueError("pipelined needs program_counter, only the program counter knows the next instruction")
+    if pipelined and open_row:
+        raise ValueError("open_row has no row activation to skip in pipelined reads, which drive row and column together")
+    if pipelined and forwarding:
+        raise ValueError("forwarding skips operand reads of the sequential read states, not of the pipelined ones")
+    if program_counter and set(microcode) & set(CONTROL_OPCODES):
+        raise ValueError(f"Opcodes {sorted(CONTROL_OPCODES)} are taken by the program counter")
+    # Calculate the condition
+    required_value = 3 * (1 + row_ad_bits + col_ad_bits + bit_ad_bits)
+    max_value = 2 ** (col_ad_bits + bit_ad_bits)
+
+    # Check the condition and find the nearest valid value
+    if compact:
+        required_value, short_value = compact_lengths(row_ad_bits, col_ad_bits, bit_ad_bits)
+        if required_value > max_value:
+            raise ValueError(f"Condition 3 + row_ad_bits + 3(col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits) is not satisfied for row_ad_bits={row_ad_bits}, col_ad_bits={col_ad_bits}, bit_ad_bits={bit_ad_bits}")
+        short_length = math.ceil(short_value / (2 ** bit_ad_bits))
+    elif required_value > max_value:
+        raise ValueError(f"Condition 3(1 + row_ad_bits + col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits) is not satisfied for row_ad_bits={row_ad_bits}, col_ad_bits={col_ad_bits}, bit_ad_bits={bit_ad_bits}")
+
+    # Find the nearest integer greater than or equal to the required value, divisible by 2^(bit_ad_bits)
+    instruction_length = math.ceil(required_value / (2 ** bit_ad_bits))
+
+    addressses = [f'address_{i}' for i in range(row_ad_bits + col_ad_bits)]
+    masks = [f'mask_{i}' for i in range(row_ad_bits)] if multi_row else []
+    counts = [f'count_{i}' for i in range(col_ad_bits)] if burst else []
+    row_masks = [f'row_mask_{i}' for i in range(row_ad_bits)] if multi_row else []
+    data_ins = [f'data_in_{i}' for i in range(2 ** bit_ad_bits)]
+    crossbar_datas = [f'crossbar_data_{i}' for i in range(2 ** bit_ad_bits)]
+    row_ads = [f'row_ad_{i}' for i in range(row_ad_bits)]
+    col_ads = [f'col_ad_{i}' for i in range(col_ad_bits)]
+    write_datas = [f'write_data_{i}' for i in range(2 ** bit_ad_bits)]
+    write_data_ns = [f'write_data_n_{i}' for i in range(2 ** bit_ad_bits)] if word_ops else []
+    bit_ads = [f'bit_ad_{i}' for i in range(bit_ad_bits)]
+    data_outs = [f'data_out_{i}' for i in range(2 ** bit_ad_bits)]
+    instructions = [f'instruction_{i}' for i in range(instruction_length * (2 ** bit_ad_bits))]
+    # Word addresses, as on the address bus: the inputs, and operand c of
+    # the instruction (MSB first)
+    field = row_ad_bits + col_ad_bits + bit_ad_bits
+    input_address = " + ".join(f"(V({a}) > 0.5 ? {2**i} : 0)" for i, a in enumerate(addressses))
+    opcode_bits = "(v_instruction_0 > 0.5 ? 4 : 0) + (v_instruction_1 > 0.5 ? 2 : 0) + (v_instruction_2 > 0.5 ? 1 : 0)"
+    if compact:
+        # The operands share operand_row, latched at the end of the fetch;
+        # column and bit fields follow the row offset in COMPACT_OPERANDS
+        # order
+        operand = col_ad_bits + bit_ad_bits
+        column_offsets = [3 + row_ad_bits + COMPACT_OPERANDS.index(x) * operand for x in "abc"]
+        operand_words = [f"operand_row * {2**col_ad_bits} + " + " + ".join(
+            f"(v_instruction_{column_offsets[k] + i} > 0.5 ? {2**(col_ad_bits - 1 - i)} : 0)" for i in range(col_ad_bits))
+            for k in range(3)]
+        operand_rows = ["operand_row"] * 3
+        operand_cells = [f"operand_row * {2**operand} + " + " + ".join(
+            f"(v_instruction_{column_offsets[k] + i} > 0.5 ? {2**(operand - 1 - i)} : 0)" for i in range(operand))
+            for k in range(3)]
+        # Opcodes without operand b are stored in the short form
+        short_opcodes = [op for op, entry in microcode.items() if "b_reg" not in "".join(entry[1:4])]
+        if program_counter:
+            short_opcodes += list(CONTROL_OPCODES)
+        if word_ops:
+            short_opcodes += [op for op, entry in WORD_MICROCODE.items() if "b_word" not in "".join(entry[1:])]
+        if fused_ops:
+            short_opcodes += [op for op, (name, steps) in FUSED_MICROCODE.items() if "b" not in fused_operands(steps)]
+        is_short = " || ".join(f"opcode == {op}" for op in sorted(short_opcodes)) or "0"
+        fetched_length = f"(({is_short}) ? short_length : instruction_length)"
+    else:
+        column_offsets = [3 + k*field + row_ad_bits for k in range(3)]
+        operand_words = [" + ".join(f"(v_instruction_{3 + k*field + i} > 0.5 ? {2**(row_ad_bits + col_ad_bits - 1 - i)} : 0)"
+                                    for i in range(row_ad_bits + col_ad_bits)) for k in range(3)]
+        operand_rows = [" + ".join(f"(v_instruction_{3 + k*field + i} > 0.5 ? {2**(row_ad_bits - 1 - i)} : 0)"
+                                   for i in range(row_ad_bits)) for k in range(3)]
+        # Cell addresses of the operands, compared with the last destination
+        operand_cells = [" + ".join(f"(v_instruction_{3 + k*field + i} > 0.5 ? {2**(field - 1 - i)} : 0)"
+                                    for i in range(field)) for k in range(3)]
+        fetched_length = "instruction_length"
+    # Word address of operand c, the jump target
+    target = operand_words[2]
+    # Program counter step at the end of a fetch; an instruction that would
+    # not fit in the row starts the next one
+    advance_pc = [
+        f"next_pc = pc + {fetched_length};\n",
+        f"if (next_pc % {2**col_ad_bits} + instruction_length > {2**col_ad_bits}) next_pc = (next_pc / {2**col_ad_bits} + 1) * {2**col_ad_bits};\n",
+        f"next_pc = next_pc % {2**(row_ad_bits + col_ad_bits)};\n",
+    ]
+    fetch_done = advance_pc if program_counter else []
+    if compact:
+        fetch_row = f"pc / {2**col_ad_bits}" if program_counter else f"({input_address}) / {2**col_ad_bits}"
+        row_offset = " + ".join(f"(v_instruction_{3 + i} > 0.5 ? {2**(row_ad_bits - 1 - i)} : 0)"
+                                for i in range(row_ad_bits))
+        fetch_done = [f"opcode = {opcode_bits};\n",
+                      f"operand_row = ({fetch_row} + {row_offset}) % {2**row_ad_bits};\n"] + fetch_done
+    operand_width = "(opcode >= 4 ? 0.0 : 1.0)" if word_ops else "1.0"
+
+    def iter_operand(k, part, t):
+        # Drives the row, column or bit address of operand k, MSB first
+        if part == "row":
+            for i, c in enumerate(reversed(row_ads)):
+                if compact:
+                    yield f"{t}v_{c} = (operand_row / {2**(row_ad_bits - 1 - i)}) % 2;\n"
+                else:
+                    yield f"{t}v_{c} = v_instruction_{i + 3 + k*field};\n"
+        elif part == "col":
+            for i, c in enumerate(reversed(col_ads)):
+                yield f"{t}v_{c} = v_instruction_{i + column_offsets[k]};\n"
+        else:
+            for i, b in enumerate(reversed(bit_ads)):
+                yield f"{t}v_{b} = v_instruction_{i + column_offsets[k] + col_ad_bits};\n"
+
+    def iter_word_execute():
+        # The execute sequence on whole words, see WORD_MICROCODE
+        t = "\t\t\t\t\t\t\t\t\t"
+        yield "\t\t\t\t\t\telse if (opcode >= 4) begin\n"
+        yield "\t\t\t\t\t\t\tcase (internal_state)\n"
+        yield "\t\t\t\t\t\t\t\t0: begin\n"
+        yield f"{t}v_col_idle = 1.0;\n"
+        yield f"{t}v_write_read = 1.0;\n"
+        yield f"{t}v_bit_or_word = 0.0;\n"
+        yield f"{t}v_maj = 0.0;\n"
+        yield f"{t}v_row_idle = 0.0;\n"
+        for c in row_ads:
+            yield f"{t}v_{c} = 1.0;\n"
+        yield f"{t}case (opcode)\n"
+        for op, (name, scratch, majp, majn) in sorted(WORD_MICROCODE.items()):
+            yield f"{t}\t{op}: begin //{name}\n"
+            for j, w in enumerate(write_datas):
+                yield f"{t}\t\tv_{w} = {scratch.format(j=j)};\n"
+            yield f"{t}\tend\n"
+        yield f"{t}endcase\n"
+        yield f"{t}internal_state = 1;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t1: begin\n"
+        yield f"{t}v_col_idle = 0.0;\n"
+        for c in col_ads:
+            yield f"{t}v_{c} = 1.0;\n"
+        if icache_entries:
+            yield from _iter_icache_invalidate(t, 2 ** (row_ad_bits + col_ad_bits) - 1, icache_entries, col_ad_bits)
+        yield f"{t}internal_state = 2;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t2: begin\n"
+        yield f"{t}v_write_read = 0.0;\n"
+        yield f"{t}v_maj = 1.0;\n"
+        yield f"{t}case (opcode)\n"
+        for op, (name, scratch, majp, majn) in sorted(WORD_MICROCODE.items()):
+            yield f"{t}\t{op}: begin //{name}\n"
+            for j, (w, n) in enumerate(zip(write_datas, write_data_ns)):
+                yield f"{t}\t\tv_{w} = {majp.format(j=j)};\n"
+                yield f"{t}\t\tv_{n} = {majn.format(j=j)};\n"
+            yield f"{t}\t\tif (trace_level >= 2) $display(\"{name}\");\n"
+            yield f"{t}\tend\n"
+        yield f"{t}endcase\n"
+        yield f"{t}internal_state = 3;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t3: begin\n"
+        yield f"{t}v_maj = 0.0;\n"
+        yield f"{t}v_col_idle = 1.0;\n"
+        yield f"{t}internal_state = 4;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t4: begin\n"
+        yield f"{t}v_row_idle = 0.0;\n"
+        yield f"{t}v_col_idle = 0.0;\n"
+        yield f"{t}internal_state = 5;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t5: begin\n"
+        yield f"{t}v_write_read = 1.0;\n"
+        for w, c in zip(write_datas, crossbar_datas):
+            yield f"{t}v_{w} = (V({c}) > 0.5 ? 1.0 : 0.0);\n"
+        yield f"{t}if (trace_level >= 2) $display(\"OUTPUT\", {', '.join('v_' + w for w in write_datas)});\n"
+        if forwarding:
+            # v_write_data_0 holds bit 0 of the word, not the cell at c
+            yield f"{t}fwd_addr = -1;\n"
+        yield from iter_operand(2, "row", t)
+        yield from iter_operand(2, "col", t)
+        if icache_entries:
+            yield from _iter_icache_invalidate(t, target, icache_entries, col_ad_bits)
+        yield f"{t}internal_state = 6;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t6: begin\n"
+        yield f"{t}v_row_idle = 1.0;\n"
+        yield f"{t}v_col_idle = 1.0;\n"
+        yield f"{t}internal_state = 0;\n"
+        yield f"{t}state = 3;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+        yield "\t\t\t\t\t\tend\n"
+
+    def fused_input(name):
+        # Level of a FUSED_MICROCODE input
+        inverted = name.startswith("~")
+        name = name.lstrip("~")
+        if name in ("0", "1"):
+            return f"{int(name) ^ inverted}.0"
+        return f"({name}_reg {'<' if inverted else '>'} 0.5 ? 1.0 : 0.0)"
+
+    def iter_fused_action(action, t):
+        kind = action[0]
+        if kind == "latch":
+            yield f"{t}{action[1]}_reg = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
+        elif kind == "scratch":
+            yield f"{t}v_col_idle = 1.0;\n"
+            yield f"{t}v_write_read = 1.0;\n"
+            yield f"{t}v_bit_or_word = 1.0;\n"
+            yield f"{t}v_maj = 0.0;\n"
+            yield f"{t}v_row_idle = 0.0;\n"
+            for c in row_ads:
+                yield f"{t}v_{c} = 1.0;\n"
+            yield f"{t}v_write_data_0 = {fused_input(action[1])};\n"
+        elif kind == "select":
+            yield f"{t}v_col_idle = 0.0;\n"
+            for c in col_ads:
+                yield f"{t}v_{c} = 1.0;\n"
+            for b in bit_ads:
+                yield f"{t}v_{b} = 1.0;\n"
+            if icache_entries:
+                yield from _iter_icache_invalidate(t, 2 ** (row_ad_bits + col_ad_bits) - 1, icache_entries, col_ad_bits)
+        elif kind == "majority":
+            y, z = action[1:]
+            yield f"{t}v_write_read = 0.0;\n"
+            yield f"{t}v_maj = 1.0;\n"
+            yield f"{t}v_majp = {fused_input(y)};\n"
+            yield f"{t}v_majn = {fused_input(z[1:] if z.startswith('~') else '~' + z)};\n"
+        elif kind == "release":
+            yield f"{t}v_bit_or_word = 1.0;\n"
+            yield f"{t}v_maj = 0.0;\n"
+            yield f"{t}v_col_idle = 1.0;\n"
+        elif kind == "read":
+            yield f"{t}v_row_idle = 0.0;\n"
+            yield f"{t}v_col_idle = 0.0;\n"
+        elif kind == "store":
+            k, value = action[1:]
+            yield f"{t}v_write_read = 1.0;\n"
+            yield f"{t}v_maj = 0.0;\n"
+            yield f"{t}v_bit_or_word = 1.0;\n"
+            yield f"{t}v_row_idle = 0.0;\n"
+            yield f"{t}v_col_idle = 0.0;\n"
+            if value is None:
+                yield f"{t}v_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
+            else:
+                yield f"{t}v_write_data_0 = {fused_input(value)};\n"
+            yield f"{t}if (trace_level >= 2) $display(\"OUTPUT\", v_write_data_0);\n"
+            if forwarding:
+                yield f"{t}fwd_addr = {operand_cells[k]};\n"
+            for part in ("row", "col", "bit"):
+                yield from iter_operand(k, part, t)
+            if icache_entries:
+                yield from _iter_icache_invalidate(t, operand_words[k], icache_entries, col_ad_bits)
+        else:
+            yield f"{t}v_row_idle = 1.0;\n"
+            yield f"{t}v_col_idle = 1.0;\n"
+            yield f"{t}internal_state = 0;\n"
+            yield f"{t}state = 3;\n"
+
+    def iter_fused_execute():
+        # The fused sequences, see FUSED_MICROCODE, unrolled one internal
+        # state per edge
+        t = "\t\t\t\t\t\t\t\t\t\t\t"
+        yield "\t\t\t\t\t\telse if (opcode >= 4) begin\n"
+        yield "\t\t\t\t\t\t\tcase (opcode)\n"
+        for op, (name, steps) in sorted(FUSED_MICROCODE.items()):
+            shown = [f"{x}_reg" for x in fused_operands(steps, written=False)]
+            yield f"\t\t\t\t\t\t\t\t{op}: begin //{name}\n"
+            yield "\t\t\t\t\t\t\t\t\tcase (internal_state)\n"
+            for n, edge in enumerate(fused_schedule(steps)):
+                yield f"\t\t\t\t\t\t\t\t\t\t{n}: begin\n"
+                if n == 0:
+                    yield f"{t}if (trace_level >= 2) $display(\"{name}\", {', '.join(shown)});\n"
+                for action in edge:
+                    yield from iter_fused_action(action, t)
+                if edge[-1][0] != "idle":
+                    yield f"{t}internal_state = {n + 1};\n"
+                yield "\t\t\t\t\t\t\t\t\t\tend\n"
+            yield "\t\t\t\t\t\t\t\t\tendcase\n"
+            yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+        yield "\t\t\t\t\t\tend\n"
+
+    # Internal state that activates the row of operand k, the reads go b, a, c
+    activate_states = {1: 0, 0: 3, 2: 6}
+
+    def iter_activate(k, t):
+        yield from iter_operand(k, "row", t)
+        yield f"{t}v_row_idle = 0.0;\n"
+        yield f"{t}v_col_idle = 1.0;\n"
+        yield f"{t}v_write_read = 0.0;\n"
+        yield f"{t}v_bit_or_word = {operand_width};\n"
+        yield f"{t}v_maj = 0.0;\n"
+
+    def iter_open_row(k, next_k, activate, t):
+        # After reading operand k, keep the row open when operand next_k is
+        # in it and go straight to its column, skipping the activate state
+        yield f"{t}v_col_idle = 1.0;\n"
+        yield f"{t}if (({operand_rows[k]}) == ({operand_rows[next_k]})) begin\n"
+        yield f"{t}\topen_row_saved = open_row_saved + 1;\n"
+        yield f"{t}\tif (trace_level >= 3) $display(\"Open row\", open_row_saved);\n"
+        yield f"{t}\tinternal_state = {activate + 1};\n"
+        yield f"{t}end else begin\n"
+        yield f"{t}\tv_row_idle = 1.0;\n"
+        yield f"{t}\tinternal_state = {activate};\n"
+        yield f"{t}end\n"
+
+    def iter_next_operand(k, rest, t):
+        # After reading operand k, go to the first operand of rest that was
+        # not forwarded, or on to the execute state
+        if not rest:
+            yield f"{t}v_row_idle = 1.0;\n"
+            yield f"{t}v_col_idle = 1.0;\n"
+            yield f"{t}internal_state = 0;\n"
+            yield f"{t}state = 2;\n"
+            return
+        n = rest[0]
+        if forwarding:
+            yield f"{t}if (fwd_{'abc'[n]} == 1) begin\n"
+            yield from iter_next_operand(k, rest[1:], t + "\t")
+            yield f"{t}end else begin\n"
+            t += "\t"
+        if open_row:
+            yield from iter_open_row(k, n, activate_states[n], t)
+        else:
+            yield f"{t}v_row_idle = 1.0;\n"
+            yield f"{t}v_col_idle = 1.0;\n"
+            yield f"{t}internal_state = {activate_states[n]};\n"
+        if forwarding:
+            yield f"{t[:-1]}end\n"
+
+    def iter_forward(t):
+        # Take the operands that are the cell the last instruction wrote
+        # from v_write_data_0 and activate the first one left to read
+        bit_level = "opcode < 4 && " if word_ops else ""
+        for k in (1, 0, 2):
+            yield f"{t}fwd_{'abc'[k]} = ({bit_level}({operand_cells[k]}) == fwd_addr ? 1 : 0);\n"
+            yield f"{t}if (fwd_{'abc'[k]} == 1) {'abc'[k]}_reg = v_write_data_0;\n"
+        yield f"{t}forwarded = forwarded + fwd_a + fwd_b + fwd_c;\n"
+        yield f"{t}if (trace_level >= 3 && fwd_a + fwd_b + fwd_c > 0) $display(\"Forwarded\", fwd_a, fwd_b, fwd_c);\n"
+        yield t
+        for k in (1, 0, 2):
+            yield f"if (fwd_{'abc'[k]} == 0) begin\n"
+            yield from iter_activate(k, t + "\t")
+            yield f"{t}\tinternal_state = {activate_states[k] + 1};\n"
+            yield f"{t}end else "
+        yield "begin\n"
+        yield f"{t}\tinternal_state = 0;\n"
+        yield f"{t}\tstate = 2;\n"
+        yield f"{t}end\n"
+
+    def iter_streamed_fetch(t):
+        # Pipelined fetch at pc, one edge per word: each edge latches the
+        # word read on the previous one and drives the next read
+        if icache_entries:
+            yield from _iter_icache_lookup(t, "pc", instructions, icache_entries, fetch_done)
+        for i, r in enumerate(row_ads):
+            yield f"{t}v_{r} = (pc / {2**(col_ad_bits + i)}) % 2;\n"
+        yield f"{t}v_row_idle = 0.0;\n"
+        yield f"{t}case (no_of_words_fetched)\n"
+        for i in range(instruction_length + 1):
+            yield f"{t}\t{i}: begin\n"
+            if i > 0:
+                for j, c in enumerate(crossbar_datas):
+                    yield f"{t}\t\tv_instruction_{(i-1)*2**bit_ad_bits + j} = V({c});\n"
+            if compact and i == short_length < instruction_length:
+                # The short form ends here, its opcode is already latched and
+                # the full one reads on
+                yield f"{t}\t\topcode = {opcode_bits};\n"
+                yield f"{t}\t\tif ({is_short}) begin\n"
+                yield f"{t}\t\t\tv_col_idle = 1.0;\n"
+                yield f"{t}\t\t\tstate = 1;\n"
+                yield f"{t}\t\t\tno_of_words_fetched = 0;\n"
+                for line in fetch_done[1:]:
+                    yield f"{t}\t\t\t" + line
+                if icache_entries:
+                    yield from _iter_icache_fill(f"{t}\t\t\t", instructions, icache_entries)
+                yield f"{t}\t\tend else begin\n"
+                for j, c in enumerate(col_ads):
+                    yield f"{t}\t\t\tv_{c} = ((pc + {i})/{2**j})%2;\n"
+                yield f"{t}\t\t\tv_col_idle = 0.0;\n"
+                yield f"{t}\t\t\tv_write_read = 0.0;\n"
+                yield f"{t}\t\t\tv_maj = 0.0;\n"
+                yield f"{t}\t\t\tv_bit_or_word = 0.0;\n"
+                yield f"{t}\t\t\tno_of_words_fetched = {i + 1};\n"
+                yield f"{t}\t\tend\n"
+            elif i < instruction_length:
+                for j, c in enumerate(col_ads):
+                    yield f"{t}\t\tv_{c} = ((pc + {i})/{2**j})%2;\n"
+                yield f"{t}\t\tv_col_idle = 0.0;\n"
+                yield f"{t}\t\tv_write_read = 0.0;\n"
+                yield f"{t}\t\tv_maj = 0.0;\n"
+                yield f"{t}\t\tv_bit_or_word = 0.0;\n"
+                yield f"{t}\t\tno_of_words_fetched = {i + 1};\n"
+            else:
+                yield f"{t}\t\tv_col_idle = 1.0;\n"
+                yield f"{t}\t\tstate = 1;\n"
+                yield f"{t}\t\tno_of_words_fetched = 0;\n"
+                for line in fetch_done:
+                    yield f"{t}\t\t" + line
+                if icache_entries:
+                    yield from _iter_icache_fill(f"{t}\t\t", instructions, icache_entries)
+            yield f"{t}\tend\n"
+        yield f"{t}endcase\n"
+        if icache_entries:
+            yield f"{t}end\n"
+
+    # Generate the Verilog-A code
+    yield f"""`include "disciplines.vams"
+
+module controller (
+\tinput electrical en,
+\tinput electrical plim,
+\tinput electrical idle,"""
+
+    # Inputs
+    for a in addressses + masks + counts:
+        yield f"\n\tinput electrical {a},"
+    yield "\n\tinput electrical wr,"
+    for d in data_ins:
+        yield f"\n\tinput electrical {d},"
+    for c in crossbar_datas:
+        yield f"\n\tinput electrical {c},"
+
+    # Outputs
+    for r in row_ads + row_masks:
+        yield f"\n\toutput electrical {r},"
+    for c in col_ads:
+        yield f"\n\toutput electrical {c},"
+    yield """
+\toutput electrical row_idle,
+\toutput electrical col_idle,
+\toutput electrical write_read,
+\toutput electrical bit_or_word,"""
+    for w in write_datas + write_data_ns:
+        yield f"\n\toutput electrical {w},"
+    for b in bit_ads:
+        yield f"\n\toutput electrical {b},"
+    yield """
+\toutput electrical maj,
+\toutput electrical majp,
+\toutput electrical majn,"""
+    for d in data_outs:
+        yield f"\n\toutput electrical {d},"
+    if handshake:
+        yield "\n\toutput electrical ram_ready,"
+        yield "\n\toutput electrical ram_done,"
+    yield "\n\toutput electrical instr_exec_status\n);\n"
+
+    # Parameters
+    t_tr = "\tparameter real t_tr = 10n;\n" if event_driven else ""
+    short_parameter = f"\tparameter integer short_length = {short_length};\n" if compact else ""
+    yield f"""
+\tparameter integer row_ad_bits = {row_ad_bits};
+\tparameter integer col_ad_bits = {col_ad_bits};
+\tparameter integer bit_ad_bits = {bit_ad_bits};
+\tparameter integer instruction_length = {instruction_length};
+{short_parameter}\tparameter integer trace_level = {trace_level_value(trace_level)};
+{t_tr}
+\tinteger state = 0;
+\tinteger read_write_state = 0;
+\treal v_en_prev;
+\tinteger no_of_words_fetched = 0;
+\tinteger internal_state = 0;
+\tinteger col_ad = 0;
+\treal a_reg;
+\treal b_reg;
+\treal c_reg;
+\tinteger opcode;
+\tinteger rom_valid;
+\treal rom_scratch, rom_majp, rom_majn;
+"""
+    if program_counter:
+        yield "\tinteger pc = 0, next_pc = 0;\n"
+        yield "\tinteger running = 0, halted = 0;\n"
+    if open_row:
+        yield "\tinteger open_row_saved = 0;\n"
+    if compact:
+        yield "\tinteger operand_row = 0;\n"
+    if burst:
+        yield "\tinteger burst_left = 0, burst_col = 0;\n"
+    if fused_ops:
+        yield "\treal t0_reg, t1_reg;\n"
+    if forwarding:
+        yield "\tinteger fwd_addr = -1, fwd_a, fwd_b, fwd_c, forwarded = 0;\n"
+    if word_ops:
+        yield f"\treal a_word[0:{len(data_ins) - 1}], b_word[0:{len(data_ins) - 1}], c_word[0:{len(data_ins) - 1}];\n"
+    if icache_entries:
+        yield f"\tinteger icache_tag[0:{icache_entries - 1}];\n"
+        yield f"\treal icache_data[0:{icache_entries * len(instructions) - 1}];\n"
+        yield "\tinteger icache_next = 0, icache_hit = -1, icache_k;\n"
+        yield "\tinteger icache_fetch_addr, icache_write_addr;\n"
+        yield "\tinteger icache_hits = 0, icache_misses = 0;\n"
+
+    # Internal state signals
+    for sig_group in [row_ads, row_masks, col_ads, write_datas, write_data_ns, bit_ads, data_outs, instructions]:
+        for sig in sig_group:
+            yield f"\treal v_{sig};\n"
+    yield "\treal v_row_idle, v_col_idle, v_write_read, v_bit_or_word;\n"
+    yield "\treal v_maj, v_majp, v_majn, v_instr_exec_status;\n"
+    if handshake:
+        yield "\treal v_ram_ready = 0.0, v_ram_done = 0.0;\n"
+    yield "\n"
+
+    # Analog process block
+    yield "analog begin\n"
+    yield "\t@(initial_step) begin\n"
+    yield "\t\tv_en_prev = V(en);\n"
+    yield "\t\tv_row_idle = 1.0;\n"
+    yield "\t\tv_col_idle = 1.0;\n"
+    yield "\t\tv_instr_exec_status = 0.0;\n"
+    if icache_entries:
+        yield f"\t\tfor (icache_k = 0; icache_k < {icache_entries}; icache_k = icache_k + 1)\n"
+        yield "\t\t\ticache_tag[icache_k] = -1;\n"
+    yield "\tend\n\n"
+    if icache_entries or open_row or forwarding:
+        yield "\t@(final_step) begin\n"
+        if icache_entries:
+            yield "\t\tif (trace_level >= 1) $display(\"icache hits\", icache_hits, \"misses\", icache_misses);\n"
+        if open_row:
+            yield "\t\tif (trace_level >= 1) $display(\"open row saved\", open_row_saved, \"cycles\");\n"
+        if forwarding:
+            yield "\t\tif (trace_level >= 1) $display(\"forwarded\", forwarded, \"operands\");\n"
+        yield "\tend\n\n"
+    for s in reversed(addressses[0:col_ad_bits]):
+        yield f"\tcol_ad = col_ad *2 + (V({s}) > 0.5 ? 1 : 0);\n"
+
+    yield "\tif(V(idle) > 0.5) begin\n"
+    yield "\t\tv_row_idle = 1.0;\n"
+    yield "\t\tv_col_idle = 1.0;\n"
+    if handshake:
+        yield "\t\tv_ram_ready = 0.0;\n"
+        yield "\t\tv_ram_done = 0.0;\n"
+    yield "\t\tif(V(plim) < 0.5 && v_instr_exec_status > 0.5) begin\n"
+    yield "\t\t\tv_instr_exec_status = 0;\n"
+    yield "\t\t\tstate = 0;\n"
+    yield "\t\t\tinternal_state = 0;\n"
+    yield "\t\t\tno_of_words_fetched = 0;\n"
+    yield "\t\tend\n"
+    yield "\tend\n"
+
+
+    if event_driven:
+        yield "\t@(cross(V(en) - 0.5, +1)) if (V(idle) < 0.5) begin\n"
+    else:
+        yield "\telse if (V(en) > 0.5 && v_en_prev < 0.5) begin\n"
+    running = " || running == 1" if program_counter else ""
+    yield f"\t\tif ((V(plim) > 0.5 || state != 0 || internal_state != 0 || no_of_words_fetched > 0{running}) && v_instr_exec_status < 0.5 && read_write_state == 0) begin\n"
+    yield "\t\t\tif (trace_level >= 3) $display(\"In plim\", state, internal_state);\n"
+    if program_counter:
+        # The first fetch of a run loads the program counter from the address
+        yield "\t\t\tif (running == 0) begin\n"
+        yield "\t\t\t\tpc = 0;\n"
+        for i, a in enumerate(addressses):
+            yield f"\t\t\t\tpc = pc + (V({a}) > 0.5 ? {2**i} : 0);\n"
+        yield "\t\t\t\trunning = 1;\n"
+        yield "\t\t\tend\n"
+    yield "\t\t\tcase (state)\n"
+    yield "\t\t\t\t0: begin\n"
+    if pipelined:
+        yield from iter_streamed_fetch("\t\t\t\t\t")
+    else:
+        if icache_entries:
+            yield from _iter_icache_lookup("\t\t\t\t\t", "pc" if program_counter else input_address, instructions,
+                                           icache_entries, fetch_done)
+        for i, r in enumerate(row_ads):
+            if program_counter:
+                yield f"\t\t\t\t\tv_{r} = (pc / {2**(col_ad_bits + i)}) % 2;\n"
+            else:
+                yield f"\t\t\t\t\tv_{r} = V({addressses[col_ad_bits + i]});\n"
+        yield "\t\t\t\t\tv_row_idle = 0.0;\n"
+        yield "\t\t\t\t\tcase (no_of_words_fetched)\n"
+        for i in range(instruction_length):
+            yield f"\t\t\t\t\t\t{i}: begin\n"
+            yield f"\t\t\t\t\t\t\tcase (internal_state)\n"
+            yield f"\t\t\t\t\t\t\t\t0: begin\n"
+            for j, c in enumerate(col_ads):
+                if program_counter:
+                    # the instruction wraps inside the row
+                    yield f"\t\t\t\t\t\t\t\t\tv_{c} = ((pc + {i})/{2**j})%2;\n"
+                else:
+                    yield f"\t\t\t\t\t\t\t\t\tv_{c} = ((col_ad + {i})/{2**j})%2;\n"
+            yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+            yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+            yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+            yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 0.0;\n"
+            yield "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
+            yield f"\t\t\t\t\t\t\t\tend\n"
+            yield f"\t\t\t\t\t\t\t\t1: begin\n"
+            for j, c in enumerate(crossbar_datas):
+                yield f"\t\t\t\t\t\t\t\t\tv_instruction_{i*2**bit_ad_bits + j} = V({c});\n"
+            yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+            yield "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
+            yield "\t\t\t\t\t\t\t\t\tno_of_words_fetched = no_of_words_fetched + 1;\n"
+            if i == instruction_length - 1:
+                yield "\t\t\t\t\t\t\t\t\tstate = 1;\n"
+                yield "\t\t\t\t\t\t\t\t\tno_of_words_fetched = 0;\n"
+                for line in fetch_done:
+                    yield "\t\t\t\t\t\t\t\t\t" + line
+                if icache_entries:
+                    yield from _iter_icache_fill("\t\t\t\t\t\t\t\t\t", instructions, icache_entries)
+            elif compact and i == short_length - 1:
+                # The short form ends here, its opcode is already latched
+                yield f"\t\t\t\t\t\t\t\t\topcode = {opcode_bits};\n"
+                yield f"\t\t\t\t\t\t\t\t\tif ({is_short}) begin\n"
+                yield "\t\t\t\t\t\t\t\t\t\tstate = 1;\n"
+                yield "\t\t\t\t\t\t\t\t\t\tno_of_words_fetched = 0;\n"
+                for line in fetch_done[1:]:
+                    yield "\t\t\t\t\t\t\t\t\t\t" + line
+                if icache_entries:
+                    yield from _iter_icache_fill("\t\t\t\t\t\t\t\t\t\t", instructions, icache_entries)
+                yield "\t\t\t\t\t\t\t\t\tend\n"
+            yield f"\t\t\t\t\t\t\t\tend\n"
+            yield f"\t\t\t\t\t\t\tendcase\n"
+            yield f"\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\tendcase\n"
+        if icache_entries:
+            yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\t\t\t1: begin\n"
+    if word_ops:
+        # word operations read whole operand words
+        yield "\t\t\t\t\t\topcode = (v_instruction_0 > 0.5 ? 4 : 0) + (v_instruction_1 > 0.5 ? 2 : 0) + (v_instruction_2 > 0.5 ? 1 : 0);\n"
+    if pipelined:
+        # One edge per operand, b, a then c as below: latch the one read on
+        # the previous edge and drive the next, row and column together
+        yield "\t\t\t\t\t\t\tcase (internal_state)\n"
+        order = [1, 0, 2]
+        for n in range(4):
+            yield f"\t\t\t\t\t\t\t\t{n}: begin\n"
+            if n > 0:
+                yield f"\t\t\t\t\t\t\t\t\t{'abc'[order[n - 1]]}_reg = V(crossbar_data_0);\n"
+            if n == 3:
+                yield "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
+                yield "\t\t\t\t\t\t\t\t\tstate = 2;\n"
+            else:
+                for part in ("row", "col", "bit"):
+                    yield from iter_operand(order[n], part, "\t\t\t\t\t\t\t\t\t")
+                yield "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
+                yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+                yield f"\t\t\t\t\t\t\t\t\tinternal_state = {n + 1};\n"
+            yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+    else:
+        yield "\t\t\t\t\t\t\tcase (internal_state)\n"
+        yield "\t\t\t\t\t\t\t\t0: begin\n"
+        if forwarding:
+            yield from iter_forward("\t\t\t\t\t\t\t\t\t")
+        else:
+            yield from iter_activate(1, "\t\t\t\t\t\t\t\t\t")
+            yield "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t1: begin\n"
+        yield from iter_operand(1, "col", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+        yield from iter_operand(1, "bit", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+        yield f"\t\t\t\t\t\t\t\t\tv_bit_or_word = {operand_width};\n"
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t2: begin\n"
+        yield "\t\t\t\t\t\t\t\t\tb_reg = V(crossbar_data_0);\n"
+        if word_ops:
+            for j, c in enumerate(crossbar_datas):
+                yield f"\t\t\t\t\t\t\t\t\tb_word[{j}] = V({c});\n"
+        yield from iter_next_operand(1, [0, 2], "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t3: begin\n"
+        yield from iter_activate(0, "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t4: begin\n"
+        yield from iter_operand(0, "col", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+        yield from iter_operand(0, "bit", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+        yield f"\t\t\t\t\t\t\t\t\tv_bit_or_word = {operand_width};\n"
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t5: begin\n"
+        yield "\t\t\t\t\t\t\t\t\ta_reg = V(crossbar_data_0);\n"
+        if word_ops:
+            for j, c in enumerate(crossbar_datas):
+                yield f"\t\t\t\t\t\t\t\t\ta_word[{j}] = V({c});\n"
+        yield from iter_next_operand(0, [2], "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t6: begin\n"
+        yield from iter_activate(2, "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 7;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t7: begin\n"
+        yield from iter_operand(2, "col", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+        yield from iter_operand(2, "bit", "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+        yield f"\t\t\t\t\t\t\t\t\tv_bit_or_word = {operand_width};\n"
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 8;\n"
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\t\t8: begin\n"
+        yield "\t\t\t\t\t\t\t\t\tc_reg = V(crossbar_data_0);\n"
+        if word_ops:
+            for j, c in enumerate(crossbar_datas):
+                yield f"\t\t\t\t\t\t\t\t\tc_word[{j}] = V({c});\n"
+        yield from iter_next_operand(2, [], "\t\t\t\t\t\t\t\t\t")
+        yield "\t\t\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+    yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t2: begin\n"
+    yield "\t\t\t\t\t\topcode = (v_instruction_0 > 0.5 ? 4 : 0) + (v_instruction_1 > 0.5 ? 2 : 0) + (v_instruction_2 > 0.5 ? 1 : 0);\n"
+    # Microcode ROM lookup
+    yield "\t\t\t\t\t\trom_valid = 1;\n"
+    yield "\t\t\t\t\t\tcase (opcode)\n"
+    for op, (name, scratch, majp, majn, shown) in sorted(microcode.items()):
+        yield f"\t\t\t\t\t\t\t{op}: begin //{name}\n"
+        yield f"\t\t\t\t\t\t\t\trom_scratch = {scratch};\n"
+        yield f"\t\t\t\t\t\t\t\trom_majp = {majp};\n"
+        yield f"\t\t\t\t\t\t\t\trom_majn = {majn};\n"
+        yield "\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\tdefault: rom_valid = 0;\n"
+    yield "\t\t\t\t\t\tendcase\n"
+    if program_counter:
+        yield "\t\t\t\t\t\tif (opcode >= 4) begin\n"
+        yield "\t\t\t\t\t\t\tcase (opcode)\n"
+        for op, (name, condition) in sorted(CONTROL_OPCODES.items()):
+            if condition is None:
+                yield f"\t\t\t\t\t\t\t\t{op}: halted = 1; //{name}\n"
+            elif not condition:
+                yield f"\t\t\t\t\t\t\t\t{op}: next_pc = {target}; //{name}\n"
+            else:
+                yield f"\t\t\t\t\t\t\t\t{op}: if ({condition}) next_pc = {target}; //{name}\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+        yield "\t\t\t\t\t\t\tif (trace_level >= 2) case (opcode)\n"
+        for op, (name, condition) in sorted(CONTROL_OPCODES.items()):
+            if condition is None:
+                yield f"\t\t\t\t\t\t\t\t{op}: $display(\"{name}\");\n"
+            else:
+                yield f"\t\t\t\t\t\t\t\t{op}: $display(\"{name}\", a_reg, next_pc);\n"
+        yield "\t\t\t\t\t\t\tendcase\n"
+        yield "\t\t\t\t\t\t\tstate = 3;\n"
+        yield "\t\t\t\t\t\tend\n"
+        yield "\t\t\t\t\t\telse if(rom_valid == 1) begin\n"
+    else:
+        yield "\t\t\t\t\t\tif(rom_valid == 1) begin\n"
+    yield "\t\t\t\t\t\t\tcase (internal_state)\n"
+    yield "\t\t\t\t\t\t\t\t0: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
+    for i, c in enumerate(row_ads):
+        yield f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 1;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_data_0 = rom_scratch;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t1: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
+    for i, c in enumerate(col_ads):
+        yield f"\t\t\t\t\t\t\t\t\tv_{c} = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 2;\n"
+    for i, b in enumerate(bit_ads):
+        yield f"\t\t\t\t\t\t\t\t\tv_{b} = 1.0;\n"
+    if icache_entries:
+        yield from _iter_icache_invalidate("\t\t\t\t\t\t\t\t\t", 2 ** (row_ad_bits + col_ad_bits) - 1, icache_entries, col_ad_bits)
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t2: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_read = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_maj = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_majp = rom_majp;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_majn = rom_majn;\n"
+    yield "\t\t\t\t\t\t\t\t\tif (trace_level >= 2) case (opcode)\n"
+    for op, (name, scratch, majp, majn, shown) in sorted(microcode.items()):
+        yield f"\t\t\t\t\t\t\t\t\t\t{op}: $display(\"{name}\", {shown});\n"
+    yield "\t\t\t\t\t\t\t\t\tendcase\n"
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 3;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t3: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 4;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t4: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_row_idle = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_col_idle = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 5;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t5: begin\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_read = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_maj = 0.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_bit_or_word = 1.0;\n"
+    yield "\t\t\t\t\t\t\t\t\tv_write_data_0 = (V(crossbar_data_0) > 0.5 ? 1.0 : 0.0);\n"
+    yield "\t\t\t\t\t\t\t\t\tif (trace_level >= 2) $display(\"OUTPUT\", v_write_data_0);\n"
+    if forwarding:
+        yield f"\t\t\t\t\t\t\t\t\tfwd_addr = {operand_cells[2]};\n"
+    for part in ("row", "col", "bit"):
+        yield from iter_operand(2, part, "\t\t\t\t\t\t\t\t\t")
+    if icache_entries:
+        yield from _iter_icache_invalidate("\t\t\t\t\t\t\t\t\t", target, icache_entries, col_ad_bits)
+    yield "\t\t\t\t\t\t\t\t\tinternal_state = 6;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\t\t6: begin\n"
+    if pipelined:
+        # c was written on the previous edge and the single port is free,
+        # so the fetch of the next instruction starts here instead of
+        # after the state 3 idle edge
+        yield "\t\t\t\t\t\t\t\t\tif (trace_level >= 3) $display(\"Next fetch\", next_pc);\n"
+        yield "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
+        yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+        yield "\t\t\t\t\t\t\t\t\tpc = next_pc;\n"
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
+        yield "\t\t\t\t\t\t\t\t\tstate = 0;\n"
+        yield from iter_streamed_fetch("\t\t\t\t\t\t\t\t\t")
+    else:
+        yield "\t\t\t\t\t\t\t\t\tv_row_idle = 1.0;\n"
+        yield "\t\t\t\t\t\t\t\t\tv_col_idle = 1.0;\n"
+        yield "\t\t\t\t\t\t\t\t\tinternal_state = 0;\n"
+        yield "\t\t\t\t\t\t\t\t\tstate = 3;\n"
+    yield "\t\t\t\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t\t\tendcase\n"
+    yield "\t\t\t\t\t\tend\n"
+    if word_ops:
+        yield from iter_word_execute()
+    if fused_ops:
+        yield from iter_fused_execute()
+    yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\t\t3: begin\n"
+    yield "\t\t\t\t\t\tstate = 0;\n"
+    yield "\t\t\t\t\t\tinternal_state = 0;\n"
+    if program_counter:
+        yield "\t\t\t\t\t\tif (halted == 1) begin\n"
+        yield "\t\t\t\t\t\t\tv_instr_exec_status = 1.0;\n"
+        yield "\t\t\t\t\t\t\thalted = 0;\n"
+        yield "\t\t\t\t\t\t\trunning = 0;\n"
+        yield "\t\t\t\t\t\tend else begin\n"
+        yield "\t\t\t\t\t\t\tpc = next_pc;\n"
+        yield "\t\t\t\t\t\tend\n"
+    else:
+        yield "\t\t\t\t\t\tv_instr_exec_status = 1.0;\n"
+    yield "\t\t\t\t\tend\n"
+    yield "\t\t\tendcase\n"
+
+
+    # RAM read/write
+    yield "\t\tend else if((V(plim) < 0.5 || read_write_state != 0) && state == 0) begin\n"
+    yield "\t\t\t\t\t\t\t\t\tif (trace_level >= 3) $display(\"In RAM\", read_write_state);\n"
+    yield "\t\t\tv_instr_exec_status = 0.0;\n"
+    yield "\t\t\tcase (read_write_state)\n"
+    yield "\t\t\t\t0: begin\n"
+    for i, r in enumerate(row_ads):
+        yield f"\t\t\t\t\tv_{r} = V({addressses[col_ad_bits + i]});\n"
+    for m, r in zip(masks, row_masks):
+        # reads stay on one row
+        yield f"\t\t\t\t\tv_{r} = (V(wr) > 0.5 ? V({m}) : 0.0);\n"
+    if burst:
+        # words after the first, streamed behind this row activation
+        yield "\t\t\t\t\tburst_left = " + " + ".join(f"(V({c}) > 0.5 ? {2**i} : 0)" for i, c in enumerate(counts)) + ";\n"
+    yield "\t\t\t\t\tv_row_idle = 0.0;\n"
+    if handshake:
+        yield "\t\t\t\t\tv_ram_done = 0.0;\n"
+    yield "\t\t\t\t\tread_write_state = 1;\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\t\t1: begin\n"
+    for i, c in enumerate(col_ads):
+        yield f"\t\t\t\t\tv_{c} = V({addressses[i]});\n"
+    if burst:
+        yield "\t\t\t\t\tburst_col = " + " + ".join(f"(V({a}) > 0.5 ? {2**i} : 0)" for i, a in enumerate(addressses[:col_ad_bits])) + ";\n"
+    yield "\t\t\t\t\tv_col_idle = 0.0;\n"
+    yield "\t\t\t\t\tv_write_read = V(wr);\n"
+    yield "\t\t\t\t\tv_bit_or_word = 0.0;\n"
+    for i,d in enumerate(data_ins):
+        yield f"\t\t\t\t\tv_write_data_{i} = V({d});\n"
+    if forwarding:
+        # the forwarded result is gone from v_write_data_0
+        yield "\t\t\t\t\tfwd_addr = -1;\n"
+    for b in bit_ads:
+        yield f"\t\t\t\t\tv_{b} = 0.0;\n"
+    yield "\t\t\t\t\tv_maj = 0.0;\n\t\t\t\t\tv_majp = 0.0;\n\t\t\t\t\tv_majn = 0.0;\n"
+    if handshake and burst:
+        # inputs are latched, the requester may move on after the last word
+        yield "\t\t\t\t\tv_ram_ready = (burst_left == 0 ? 1.0 : 0.0);\n"
+    elif handshake:
+        # inputs are latched, the requester may move on
+        yield "\t\t\t\t\tv_ram_ready = 1.0;\n"
+    if icache_entries:
+        # the testbench may overwrite a cached instruction
+        yield "\t\t\t\t\tif (V(wr) > 0.5) begin\n"
+        row_mask = " + ".join(f"(v_{r} > 0.5 ? {2**i} : 0)" for i, r in enumerate(row_masks)) or None
+        yield from _iter_icache_invalidate("\t\t\t\t\t\t", input_address, icache_entries, col_ad_bits, row_mask)
+        yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\t\tread_write_state = 2;\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\t\t2: begin\n"
+    if handshake:
+        yield "\t\t\t\t\tv_ram_ready = 0.0;\n"
+        yield "\t\t\t\t\tv_ram_done = 1.0;\n"
+        yield "\t\t\t\t\tif (v_write_read < 0.5) begin\n"
+    else:
+        yield "\t\t\t\t\tif (V(wr) < 0.5) begin\n"
+    for i, c in enumerate(crossbar_datas):
+        yield f"\t\t\t\t\t\tv_{data_outs[i]} = V({c});\n"
+    yield "\t\t\t\t\tend else begin\n"
+    for d in data_outs:
+        yield f"\t\t\t\t\t\tv_{d} = 0.0;\n"
+    yield "\t\t\t\t\tend\n"
+    t = "\t\t\t\t\t"
+    if burst:
+        # the next word of the burst goes out on this edge, in the same row
+        yield f"{t}if (burst_left > 0) begin\n"
+        yield f"{t}\tburst_left = burst_left - 1;\n"
+        yield f"{t}\tburst_col = (burst_col + 1) % {2**col_ad_bits};\n"
+        for i, c in enumerate(col_ads):
+            yield f"{t}\tv_{c} = (burst_col >> {i}) & 1;\n"
+        for i, d in enumerate(data_ins):
+            yield f"{t}\tv_write_data_{i} = V({d});\n"
+        if handshake:
+            yield f"{t}\tv_ram_ready = (burst_left == 0 ? 1.0 : 0.0);\n"
+            yield f"{t}\tv_ram_done = 0.0;\n"
+        if icache_entries:
+            yield f"{t}\tif (v_write_read > 0.5) begin\n"
+            row_mask = " + ".join(f"(v_{r} > 0.5 ? {2**i} : 0)" for i, r in enumerate(row_masks)) or None
+            burst_row = " + ".join(f"(v_{r} > 0.5 ? {2**(col_ad_bits + i)} : 0)" for i, r in enumerate(row_ads))
+            burst_address = f"{burst_row} + burst_col"
+            yield from _iter_icache_invalidate(f"{t}\t\t", burst_address, icache_entries, col_ad_bits, row_mask)
+            yield f"{t}\tend\n"
+        yield f"{t}end else begin\n"
+        t += "\t"
+    yield f"{t}v_row_idle = 1.0;\n"
+    yield f"{t}v_col_idle = 1.0;\n"
+    for r in row_masks:
+        yield f"{t}v_{r} = 0.0;\n"
+    yield f"{t}read_write_state = 0;\n"
+    if burst:
+        yield "\t\t\t\t\tend\n"
+    yield "\t\t\t\tend\n"
+    yield "\t\t\tendcase\n"
+    yield "\t\tend\n\tend\n"
+
+    # Continuous assignments
+    outputs = row_ads + row_masks + col_ads + write_datas + write_data_ns + bit_ads + data_outs + ["row_idle", "col_idle", "write_read", "bit_or_word", "maj", "majp", "majn", "instr_exec_status"]
+    if handshake:
+        outputs += ["ram_ready", "ram_done"]
+    for sig in outputs:
+        if event_driven:
+            yield f"\tV({sig}) <+ transition(v_{sig}, 0, t_tr);\n"
+        else:
+            yield f"\tV({sig}) <+ v_{sig};\n"
+    if event_driven:
+        yield "end\nendmodule"
+    else:
+        yield "\tv_en_prev = V(en);\nend\nendmodule"
+
+
+def generate_veriloga(row_ad_bits, col_ad_bits, bit_ad_bits, out=None, microcode=MICROCODE, event_driven=False,
+                      trace_level="cycle", handshake=False, program_counter=False, icache_entries=0,
+                      pipelined=False, open_row=False, word_ops=False, multi_row=False, forwarding=False,
+                      compact=False, fused_ops=False, burst=False):
+    """
+    Generates the controller module.
+
+    Args:
+        row_ad_bits (int): Number of row address bits.
+        col_ad_bits (int): Number of column address bits.
+        bit_ad_bits (int): Number of bit address bits.
+        out (file-like, optional): Sink to stream the module into. When not
+            given the module is returned as a string.
+        microcode (dict, optional): Execute ROM, see MICROCODE. Opcodes 0-7
+            are available; opcodes without an entry are not executed.
+        event_driven (bool, optional): Trigger on @(cross(...)) of en instead
+            of polling it every timestep, and drive every output through
+            transition() so the solver can step over the flat stretches
+            between clock edges.
+        trace_level (str or int, optional): Default of the trace_level
+            parameter, one of TRACE_LEVELS. "summary" keeps only results,
+            "instruction" adds each executed operation and "cycle" adds the
+            per-edge state dumps.
+        handshake (bool, optional): Add the ram_ready and ram_done outputs.
+            ram_ready is high for one edge once a RAM request is latched,
+            so the next one can be driven; ram_done is high for one edge
+            once the access is complete and data_out is valid.
+        program_counter (bool, optional): Keep running after each
+            instruction. The PLIM address loads a program counter, which
+            advances by instruction_length words after every instruction,
+            to the start of the next row when the next instruction would
+            not fit, until a HALT; see CONTROL_OPCODES for the jumps.
+            instr_exec_status is only raised on HALT.
+        icache_entries (int, optional): Keep the last icache_entries fetched
+            instructions by word address and skip the fetch when the next
+            one is among them. Entries are dropped when a RAM write or an
+            executed instruction writes into one of their words. Hits and
+            misses are traced at the "cycle" level and summed up at the end
+            of the simulation. 0 fetches every instruction.
+        pipelined (bool, optional): With program_counter, stream the fetch
+            and the operand reads one word per edge, driving row and column
+            together, and start fetching the next instruction on the edge
+            after the write-back of operand c instead of idling on the
+            state 3 edge. Reads never overlap the write-back, the array has
+            a single port.
+        open_row (bool, optional): Keep the row active between operand
+            reads that hit the same row, skipping its RAS activation edge.
+            The skipped edges are traced at the "cycle" level and summed
+            up at the end of the simulation. Not with pipelined.
+        word_ops (bool, optional): Execute opcodes 4-7 on whole words, see
+            WORD_MICROCODE, for a CAS generated with word_maj=True; adds
+            the write_data_n outputs for its wbn inputs. The bit addresses
+            of the operands are ignored. Not with program_counter.
+        multi_row (bool, optional): Add the mask inputs and row_mask outputs
+            for a RAS generated with multi_row=True. A RAM write passes the
+            mask on, so it reaches every row that matches the address on
+            the unmasked bits; reads and PLiM execution keep the mask low.
+        forwarding (bool, optional): Skip the crossbar read of an operand
+            that is the cell the previous instruction wrote and take it from
+            v_write_data_0, which still holds the result. A RAM access or a
+            word operation in between clears the forwarded address.
+            Forwarded operands are traced at the "cycle" level and summed up
+            at the end of the simulation. Not with pipelined.
+        compact (bool, optional): Read instructions in the compact encoding,
+            see compact_lengths. The operands share one row, stored as an
+            offset from the row of the instruction, so only their column and
+            bit addresses are repeated; the result goes to operand c as
+            before. Opcodes that do not read operand b are stored without it
+            and fetched in short_length words. The program counter advances
+            by the length of the fetched instruction. Allows
+            3 + row_ad_bits + 3(col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits).
+        fused_ops (bool, optional): Execute opcodes 4-7 as the multi-step
+            sequences of FUSED_MICROCODE (full adder, XOR, COPY) in one
+            instruction: the operands are read once and the steps pass
+            their results on in registers, without a fetch or operand read
+            in between. Not with program_counter or word_ops.
+        burst (bool, optional): Add the count inputs, the number of words
+            after the first in a RAM request. They are latched with the row
+            activation, which then stays on while the following words of
+            the row go out one per edge, from the next column on and with
+            the data inputs of that edge; the column wraps within the row.
+            With handshake, ram_ready comes with the last word.
+    """
+    chunks = iter_veriloga(row_ad_bits, col_ad_bits, bit_ad_bits, microcode, event_driven, trace_level, handshake,
+                           program_counter, icache_entries, pipelined, open_row, word_ops, multi_row, forwarding,
+                           compact, fused_ops, burst)
+    if out is None:
+        return "".join(chunks)
+    for chunk in chunks:
+        out.write(chunk)
+
+
+if __name__ == "__main__":
+    # Example
+    with open("controller_full.va", "w") as f:
+        generate_veriloga(2, 4, 1, out=f)
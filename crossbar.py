@@ -0,0 +1,206 @@
+from Testbench import validate_program
+from simulator import instruction_words
+
+
+def new_image(row_ad_bits, col_ad_bits, bit_ad_bits):
+    """
+    Cleared crossbar image indexed [row][word][bit], as
+    simulator.Crossbar.cells.
+    """
+    return [[[0] * 2 ** bit_ad_bits for _ in range(2 ** col_ad_bits)] for _ in range(2 ** row_ad_bits)]
+
+
+def preload_image(program, row_ad_bits, col_ad_bits, bit_ad_bits, image=None, compact=False):
+    """
+    Applies the writes ('w' and 'i' actions) at the start of a testbench
+    program directly to a crossbar image, so they cost no simulated cycles.
+
+    Args:
+        program (list): Testbench actions, see Testbench.validate_program.
+        image (list): Image to update in place, a cleared one by default.
+        compact (bool): Store the instructions in the compact encoding, see
+            Testbench.assemble_compact.
+
+    Returns:
+        tuple: The image and the remaining actions, from the first read or
+        execute on.
+    """
+    if image is None:
+        image = new_image(row_ad_bits, col_ad_bits, bit_ad_bits)
+    num_words = 2 ** col_ad_bits
+    num_bits_per_word = 2 ** bit_ad_bits
+    words = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact)
+    checked = validate_program(program, row_ad_bits, col_ad_bits, bit_ad_bits, compact)
+    for n, op in enumerate(checked):
+        address = int(op[1], 2)
+        if op[0] == 'w':
+            # data is MSB first, cell bit k gets data[-1-k]; a row mask
+            # writes every row that matches on its zero bits
+            mask = int(op[3], 2) if len(op) > 3 else 0
+            for row in range(len(image)):
+                if (row & ~mask) == (address // num_words & ~mask):
+                    image[row][address % num_words] = [int(b) for b in reversed(op[2])]
+        elif op[0] == 'i':
+            # cell bit k of word j gets instruction bit j*num_bits_per_word + k
+            if compact:
+                words = -(-len(op[3]) // num_bits_per_word)
+            instr = op[3].ljust(words * num_bits_per_word, '0')
+            for j in range(words):
+                word = instr[j * num_bits_per_word:(j + 1) * num_bits_per_word]
+                image[(address + j) // num_words][(address + j) % num_words] = [int(b) for b in word]
+        else:
+            return image, list(program[n:])
+    return image, []
+
+
+def write_image(image, out=None, fmt="hex"):
+    """
+    Writes an image as one word per line in address order (row, then word),
+    into out or crossbar.hex. Bit k of a word is bit k of the line's value;
+    with fmt "bin" the line is the word MSB first, as testbench data.
+    """
+    num_bits_per_word = len(image[0][0])
+    lines = []
+    for row in image:
+        for word in row:
+            value = sum(bit << k for k, bit in enumerate(word))
+            if fmt == "hex":
+                lines.append(format(value, f'0{-(-num_bits_per_word // 4)}x'))
+            elif fmt == "bin":
+                lines.append(format(value, f'0{num_bits_per_word}b'))
+            else:
+                raise ValueError(f"Unknown image format {fmt!r}, expected 'hex' or 'bin'")
+    text = "\n".join(lines) + "\n"
+    if out is None:
+        with open("crossbar.hex", "w") as f:
+            f.write(text)
+    else:
+        out.write(text)
+
+
+def read_image(source, row_ad_bits, col_ad_bits, bit_ad_bits, fmt="hex"):
+    """
+    Reads an image written by write_image.
+
+    Args:
+        source (str or file-like): Path of the image file or an open file.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            return read_image(f, row_ad_bits, col_ad_bits, bit_ad_bits, fmt)
+    num_words = 2 ** col_ad_bits
+    num_bits_per_word = 2 ** bit_ad_bits
+    values = [int(line, 16 if fmt == "hex" else 2) for line in source.read().split()]
+    if len(values) != 2 ** row_ad_bits * num_words:
+        raise ValueError(f"Image has {len(values)} words, expected {2 ** row_ad_bits * num_words}")
+    image = new_image(row_ad_bits, col_ad_bits, bit_ad_bits)
+    for address, value in enumerate(values):
+        if value >> num_bits_per_word:
+            raise ValueError(f"Word {address} of the image is wider than {num_bits_per_word} bits")
+        image[address // num_words][address % num_words] = [(value >> k) & 1 for k in range(num_bits_per_word)]
+    return image
+
+
+def iter_crossbar_module(row_ad_bits=2, col_ad_bits=2, bit_ad_bits=2, v_on=1.2, v_write=1.8,
+                         image="", fmt="hex"):
+    """
+    Yields a behavioural 1T1R crossbar to connect between the RAS outputs
+    and the bus CAS (CAS_temp.iter_bus_cas_module) ports. A cell conducts
+    while its row is on, switches to 1 (r_on) or 0 (r_off) when the
+    voltage across it passes v_th in either direction, and starts from the
+    image file at t=0.
+
+    Args:
+        v_on (float): RAS output level of a selected row.
+        v_write (float): CAS write level, v_th is set between it and v_read.
+        image (str): Default of the image file parameter, written by
+            write_image. An empty name starts with every cell at 0.
+        fmt (str): "hex" or "bin", the format of the image file.
+    """
+    num_rows = 2 ** row_ad_bits
+    num_cells = 2 ** (col_ad_bits + bit_ad_bits)
+    num_bits_per_word = 2 ** bit_ad_bits
+    if num_bits_per_word > 31:
+        raise ValueError("Image words must fit in a Verilog-A integer")
+    scan = "%h" if fmt == "hex" else "%b"
+
+    yield f"""// Auto-generated Verilog-A crossbar with preloaded cell states
+
+`include "constants.vams"
+`include "disciplines.vams"
+
+module crossbar(row, vcp, vcn);
+\tparameter integer num_rows = {num_rows};
+\tparameter integer num_cells = {num_cells};
+\tparameter integer num_bits_per_word = {num_bits_per_word};
+\tparameter real v_on = {v_on};
+\tparameter real v_th = {v_write * 2 / 3:g};
+\tparameter real r_on = 1.2k;
+\tparameter real r_off = 100k;
+\tparameter string image = "{image}";
+\tinout [0:{num_rows - 1}] row;
+\tinout [0:{num_cells - 1}] vcp, vcn;
+\telectrical [0:{num_rows - 1}] row;
+\telectrical [0:{num_cells - 1}] vcp, vcn;
+
+\tgenvar r, k;
+\tinteger fd, word, value, b;
+\tinteger state[0:{num_rows * num_cells - 1}];
+\treal g;
+
+\tanalog begin
+\t\t@(initial_step) begin
+\t\t\tfor (b = 0; b < num_rows * num_cells; b = b + 1)
+\t\t\t\tstate[b] = 0;
+\t\t\tif (image != "") begin
+\t\t\t\tfd = $fopen(image, "r");
+\t\t\t\tif (fd == 0) $display("Cannot open crossbar image %s", image);
+\t\t\t\telse begin
+\t\t\t\t\t// One word per line in address order, bit b of the value is cell bit b
+\t\t\t\t\tfor (word = 0; word < num_rows * num_cells / num_bits_per_word; word = word + 1) begin
+\t\t\t\t\t\tif ($fscanf(fd, "{scan}", value) == 1) begin
+\t\t\t\t\t\t\tfor (b = 0; b < num_bits_per_word; b = b + 1)
+\t\t\t\t\t\t\t\tstate[word * num_bits_per_word + b] = (value >> b) & 1;
+\t\t\t\t\t\tend
+\t\t\t\t\tend
+\t\t\t\t\t$fclose(fd);
+\t\t\t\tend
+\t\t\tend
+\t\tend
+
+\t\tfor (k = 0; k < num_cells; k = k + 1) begin
+\t\t\tg = 0.0;
+\t\t\tfor (r = 0; r < num_rows; r = r + 1) begin
+\t\t\t\tif (V(row[r]) > 0.5 * v_on) begin
+\t\t\t\t\tif (V(vcp[k], vcn[k]) > v_th)
+\t\t\t\t\t\tstate[r * num_cells + k] = 1;
+\t\t\t\t\telse if (V(vcp[k], vcn[k]) < -v_th)
+\t\t\t\t\t\tstate[r * num_cells + k] = 0;
+\t\t\t\t\tg = g + (state[r * num_cells + k] ? 1 / r_on : 1 / r_off);
+\t\t\t\tend
+\t\t\tend
+\t\t\tI(vcp[k], vcn[k]) <+ g * V(vcp[k], vcn[k]);
+\t\tend
+\tend
+endmodule
+"""
+
+
+def generate_crossbar_module(row_ad_bits=2, col_ad_bits=2, bit_ad_bits=2, v_on=1.2, v_write=1.8,
+                             image="", fmt="hex", out=None):
+    """
+    Generates the crossbar module. When out (a file-like sink) is given the
+    module is streamed into it, otherwise it is returned as a string.
+    """
+    chunks = iter_crossbar_module(row_ad_bits, col_ad_bits, bit_ad_bits, v_on, v_write, image, fmt)
+    if out is None:
+        return "".join(chunks)
+    for chunk in chunks:
+        out.write(chunk)
+
+
+if __name__ == "__main__":
+    with open("crossbar.va", "w") as f:
+        generate_crossbar_module(2, 4, 1, image="crossbar.hex", out=f)
+
+    print("Crossbar saved to crossbar.va")
@@ -0,0 +1,1137 @@
+import math
+
+from contoller import COMPACT_OPERANDS, FUSED_MICROCODE, compact_lengths, fused_operands, fused_schedule
+from Testbench import group_bursts, validate_program
+
+
+def instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact=False, short=False):
+    """
+    Number of crossbar words one instruction occupies, with the same bound
+    that contoller.generate_veriloga enforces. With compact the length of
+    the compact encoding, of its short form when short is set.
+    """
+    required_value = 3 * (1 + row_ad_bits + col_ad_bits + bit_ad_bits)
+    max_value = 2 ** (col_ad_bits + bit_ad_bits)
+    if compact:
+        required_value, short_value = compact_lengths(row_ad_bits, col_ad_bits, bit_ad_bits)
+        if required_value > max_value:
+            raise ValueError(f"Condition 3 + row_ad_bits + 3(col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits) is not satisfied for row_ad_bits={row_ad_bits}, col_ad_bits={col_ad_bits}, bit_ad_bits={bit_ad_bits}")
+        return math.ceil((short_value if short else required_value) / (2 ** bit_ad_bits))
+    if required_value > max_value:
+        raise ValueError(f"Condition 3(1 + row_ad_bits + col_ad_bits + bit_ad_bits) <= 2^(col_ad_bits + bit_ad_bits) is not satisfied for row_ad_bits={row_ad_bits}, col_ad_bits={col_ad_bits}, bit_ad_bits={bit_ad_bits}")
+    return math.ceil(required_value / (2 ** bit_ad_bits))
+
+
+def next_pc(pc, row_ad_bits, col_ad_bits, bit_ad_bits, compact=False, short=False):
+    """
+    Word address of the instruction after the one at pc, as the controller's
+    program counter steps: instruction_words on, or the start of the next
+    row when the next instruction would not fit in this one. compact and
+    short give the encoding of the instruction at pc, see instruction_words.
+    """
+    words = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact)
+    pc += instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact, short)
+    if pc % 2 ** col_ad_bits + words > 2 ** col_ad_bits:
+        pc = (pc // 2 ** col_ad_bits + 1) * 2 ** col_ad_bits
+    return pc % 2 ** (row_ad_bits + col_ad_bits)
+
+
+def ras_decode(row_ads, idle, row_mask=None):
+    """
+    Row select driven by RAS.generate_ras_veriloga, one-hot unless a
+    multi_row RAS gets a mask.
+
+    Args:
+        row_ads (list): Row address levels, index 0 is the LSB.
+        idle (int): Level of the idle input.
+        row_mask (list): Mask levels, index 0 is the LSB. Rows that match
+            the address on the unmasked bits are selected.
+    """
+    outputs = [0] * (2 ** len(row_ads))
+    if idle < 0.5:
+        idx = sum(1 << i for i, r in enumerate(row_ads) if r > 0.5)
+        mask = sum(1 << i for i, m in enumerate(row_mask or []) if m > 0.5)
+        for row in range(len(outputs)):
+            if (row & ~mask) == (idx & ~mask):
+                outputs[row] = 1
+    return outputs
+
+
+class Controller:
+    """
+    Edge-level model of the controller emitted by contoller.generate_veriloga.
+    Every call to step() is one rising edge of en.
+    """
+
+    def __init__(self, row_ad_bits, col_ad_bits, bit_ad_bits, program_counter=False, icache_entries=0,
+                 pipelined=False, open_row=False, word_ops=False, multi_row=False, forwarding=False,
+                 compact=False, fused_ops=False, burst=False):
+        if pipelined and not program_counter:
+            raise ValueError("pipelined needs program_counter, only the program counter knows the next instruction")
+        if pipelined and open_row:
+            raise ValueError("open_row has no row activation to skip in pipelined reads, which drive row and column together")
+        if pipelined and forwarding:
+            raise ValueError("forwarding skips operand reads of the sequential read states, not of the pipelined ones")
+        if word_ops and program_counter:
+            raise ValueError("word_ops and program_counter both need opcodes 4-7")
+        if fused_ops and (word_ops or program_counter):
+            raise ValueError("fused_ops, word_ops and program_counter all need opcodes 4-7")
+        self.open_row = open_row
+        self.forwarding = forwarding
+        # Cell the last instruction wrote, whose value is still in
+        # write_data[0], and the operands taken from it
+        self.forward_cell = -1
+        self.forwarded = [0, 0, 0]
+        self.forwarded_operands = 0
+        self.word_ops = word_ops
+        self.fused_ops = fused_ops
+        self.burst = burst
+        # Words still to come in the current RAM burst, and the column of
+        # the last one
+        self.burst_left = 0
+        self.burst_col = 0
+        self.multi_row = multi_row
+        self.open_row_saved = 0
+        self.program_counter = program_counter
+        self.pipelined = pipelined
+        self.icache_entries = icache_entries
+        self.icache_tags = [-1] * icache_entries
+        self.icache_data = [None] * icache_entries
+        self.icache_next = 0
+        self.icache_fetch_addr = 0
+        self.icache_hits = 0
+        self.icache_misses = 0
+        self.pc = 0
+        self.next_pc = 0
+        self.running = 0
+        self.halted = 0
+        self.row_ad_bits = row_ad_bits
+        self.col_ad_bits = col_ad_bits
+        self.bit_ad_bits = bit_ad_bits
+        self.word_bits = 2 ** bit_ad_bits
+        self.instruction_length = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact)
+        self.compact = compact
+        self.short_length = instruction_words(row_ad_bits, col_ad_bits, bit_ad_bits, compact, compact)
+        # Row of the operands of a compact instruction, latched at the end
+        # of its fetch
+        self.operand_row_value = 0
+
+        self.state = 0
+        self.read_write_state = 0
+        self.no_of_words_fetched = 0
+        self.internal_state = 0
+        self.a_reg = 0
+        self.b_reg = 0
+        self.c_reg = 0
+        # Results passed between the steps of a fused sequence
+        self.t0_reg = 0
+        self.t1_reg = 0
+        self.a_word = [0] * 2 ** bit_ad_bits
+        self.b_word = [0] * 2 ** bit_ad_bits
+        self.c_word = [0] * 2 ** bit_ad_bits
+        self.instruction = [0] * (self.instruction_length * self.word_bits)
+
+        self.row_ad = [0] * row_ad_bits
+        self.row_mask = [0] * row_ad_bits
+        self.col_ad = [0] * col_ad_bits
+        self.bit_ad = [0] * bit_ad_bits
+        self.write_data = [0] * self.word_bits
+        self.write_data_n = [0] * self.word_bits
+        self.data_out = [0] * self.word_bits
+        self.row_idle = 1
+        self.col_idle = 1
+        self.write_read = 0
+        self.bit_or_word = 0
+        self.maj = 0
+        self.majp = 0
+        self.majn = 0
+        self.instr_exec_status = 0
+        self.ram_ready = 0
+        self.ram_done = 0
+
+    def column_offset(self, k):
+        # Operand k field: row bits, column bits, bit address, all MSB first;
+        # compact instructions keep only the column and bit address, in
+        # COMPACT_OPERANDS order after the row offset
+        if self.compact:
+            return 3 + self.row_ad_bits + COMPACT_OPERANDS.index("abc"[k]) * (self.col_ad_bits + self.bit_ad_bits)
+        return 3 + k * (self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits) + self.row_ad_bits
+
+    def operand_row(self, k):
+        if self.compact:
+            for i in range(self.row_ad_bits):
+                self.row_ad[i] = (self.operand_row_value >> i) & 1
+            return
+        offset = 3 + k * (self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits)
+        for i in range(self.row_ad_bits):
+            self.row_ad[self.row_ad_bits - 1 - i] = self.instruction[offset + i]
+
+    def operand_column(self, k):
+        offset = self.column_offset(k)
+        for i in range(self.col_ad_bits):
+            self.col_ad[self.col_ad_bits - 1 - i] = self.instruction[offset + i]
+        offset += self.col_ad_bits
+        for i in range(self.bit_ad_bits):
+            self.bit_ad[self.bit_ad_bits - 1 - i] = self.instruction[offset + i]
+
+    def opcode(self):
+        return self.instruction[0] * 4 + self.instruction[1] * 2 + self.instruction[2]
+
+    def is_short(self):
+        # Opcodes without operand b, see Testbench.OPERANDS
+        op = self.opcode()
+        if self.fused_ops and op in FUSED_MICROCODE:
+            return "b" not in fused_operands(FUSED_MICROCODE[op][1])
+        return op == 3 or (op > 3 and self.program_counter) or (op == 7 and self.word_ops)
+
+    def operand_row_address(self, k):
+        if self.compact:
+            return self.operand_row_value
+        offset = 3 + k * (self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits)
+        row = 0
+        for bit in self.instruction[offset:offset + self.row_ad_bits]:
+            row = row * 2 + (1 if bit > 0.5 else 0)
+        return row
+
+    def operand_address(self, k):
+        # Word address of operand k
+        if self.compact:
+            offset = self.column_offset(k)
+            address = self.operand_row_value
+            for bit in self.instruction[offset:offset + self.col_ad_bits]:
+                address = address * 2 + (1 if bit > 0.5 else 0)
+            return address
+        offset = 3 + k * (self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits)
+        address = 0
+        for bit in self.instruction[offset:offset + self.row_ad_bits + self.col_ad_bits]:
+            address = address * 2 + (1 if bit > 0.5 else 0)
+        return address
+
+    def operand_cell(self, k):
+        # Cell address of operand k, its word address then the bit address
+        if self.compact:
+            offset = self.column_offset(k)
+            cell = self.operand_row_value
+            for bit in self.instruction[offset:offset + self.col_ad_bits + self.bit_ad_bits]:
+                cell = cell * 2 + (1 if bit > 0.5 else 0)
+            return cell
+        offset = 3 + k * (self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits)
+        cell = 0
+        for bit in self.instruction[offset:offset + self.row_ad_bits + self.col_ad_bits + self.bit_ad_bits]:
+            cell = cell * 2 + (1 if bit > 0.5 else 0)
+        return cell
+
+    def fetched(self, address):
+        # End of the fetch of the instruction at word address: latch the
+        # operand row of a compact one and step the program counter past it
+        if self.compact:
+            offset = 0
+            for bit in self.instruction[3:3 + self.row_ad_bits]:
+                offset = offset * 2 + (1 if bit > 0.5 else 0)
+            self.operand_row_value = (address // 2 ** self.col_ad_bits + offset) % 2 ** self.row_ad_bits
+        self.next_pc = next_pc(self.pc, self.row_ad_bits, self.col_ad_bits, self.bit_ad_bits, self.compact,
+                               self.compact and self.is_short())
+
+    def icache_invalidate(self, address, row_mask=0):
+        # Drop cached instructions with a word at address, in every row
+        # that matches on the bits outside row_mask, see
+        # contoller._iter_icache_invalidate
+        row_words = 2 ** self.col_ad_bits
+        for k, tag in enumerate(self.icache_tags):
+            if tag >= 0 and (tag // row_words & ~row_mask) == (address // row_words & ~row_mask) \
+                    and (address - tag) % row_words < self.instruction_length:
+                self.icache_tags[k] = -1
+
+    def step(self, en_inputs, crossbar_data):
+        """
+        Advance by one en edge.
+
+        Args:
+            en_inputs (dict): Levels of plim, idle, wr, address (list, LSB first)
+                and data_in (list) as seen at the edge.
+            crossbar_data (list): Levels on crossbar_data_* at the edge.
+
+        Returns:
+            list: Strings the generated module would $display on this edge.
+        """
+        display = []
+        address = en_inputs["address"]
+        col_ad = sum(1 << i for i in range(self.col_ad_bits) if address[i] > 0.5)
+
+        if en_inputs["idle"] > 0.5:
+            self.row_idle = 1
+            self.col_idle = 1
+            self.ram_ready = 0
+            self.ram_done = 0
+            if en_inputs["plim"] < 0.5 and self.instr_exec_status > 0.5:
+                self.instr_exec_status = 0
+                self.state = 0
+                self.internal_state = 0
+                self.no_of_words_fetched = 0
+            return display
+
+        plim = en_inputs["plim"] > 0.5
+        if (plim or self.state != 0 or self.internal_state != 0 or self.no_of_words_fetched > 0 or self.running) \
+                and self.instr_exec_status < 0.5 and self.read_write_state == 0:
+            display.append(f"In plim {self.state} {self.internal_state}")
+            if self.program_counter and not self.running:
+                self.pc = sum(1 << i for i, v in enumerate(address) if v > 0.5)
+                self.running = 1
+            if self.program_counter:
+                address = [(self.pc >> i) & 1 for i in range(len(address))]
+                col_ad = self.pc
+            if self.state == 0 and self.pipelined:
+                self.fetch_streamed(crossbar_data, display)
+            elif self.state == 0:
+                self.fetch(address, col_ad, crossbar_data, display)
+            elif self.state == 1 and self.pipelined:
+                self.read_operands_streamed(crossbar_data)
+            elif self.state == 1:
+                self.read_operands(crossbar_data, display)
+            elif self.state == 2:
+                self.execute(crossbar_data, display)
+            elif self.state == 3:
+                self.state = 0
+                self.internal_state = 0
+                if not self.program_counter:
+                    self.instr_exec_status = 1
+                elif self.halted:
+                    self.instr_exec_status = 1
+                    self.halted = 0
+                    self.running = 0
+                else:
+                    self.pc = self.next_pc
+        elif (not plim or self.read_write_state != 0) and self.state == 0:
+            display.append(f"In RAM {self.read_write_state}")
+            self.instr_exec_status = 0
+            self.ram(en_inputs, crossbar_data)
+        return display
+
+    def icache_lookup(self, address, display):
+        # True when the instruction at address was loaded from the cache
+        self.icache_fetch_addr = address
+        if address in self.icache_tags:
+            self.icache_hits += 1
+            display.append(f"icache hit {address} {self.icache_hits} {self.icache_misses}")
+            self.instruction = list(self.icache_data[self.icache_tags.index(address)])
+            self.fetched(address)
+            self.state = 1
+            return True
+        self.icache_misses += 1
+        display.append(f"icache miss {address} {self.icache_hits} {self.icache_misses}")
+        return False
+
+    def icache_fill(self):
+        self.icache_tags[self.icache_next] = self.icache_fetch_addr
+        self.icache_data[self.icache_next] = list(self.instruction)
+        self.icache_next = (self.icache_next + 1) % self.icache_entries
+
+    def fetch(self, address, col_ad, crossbar_data, display):
+        if self.icache_entries and self.no_of_words_fetched == 0 and self.internal_state == 0:
+            if self.icache_lookup(sum(1 << i for i, v in enumerate(address) if v > 0.5), display):
+                return
+        for i in range(self.row_ad_bits):
+            self.row_ad[i] = address[self.col_ad_bits + i]
+        self.row_idle = 0
+        i = self.no_of_words_fetched
+        if i >= self.instruction_length:
+            return
+        if self.internal_state == 0:
+            for j in range(self.col_ad_bits):
+                self.col_ad[j] = ((col_ad + i) >> j) & 1
+            self.col_idle = 0
+            self.write_read = 0
+            self.maj = 0
+            self.bit_or_word = 0
+            self.internal_state = 1
+        elif self.internal_state == 1:
+            for j in range(self.word_bits):
+                self.instruction[i * self.word_bits + j] = crossbar_data[j]
+            self.col_idle = 1
+            self.internal_state = 0
+            self.no_of_words_fetched += 1
+            if i == self.instruction_length - 1 or (self.compact and i == self.short_length - 1 and self.is_short()):
+                self.state = 1
+                self.no_of_words_fetched = 0
+                self.fetched(sum(1 << j for j, v in enumerate(address) if v > 0.5))
+                if self.icache_entries:
+                    self.icache_fill()
+
+    def fetch_streamed(self, crossbar_data, display):
+        # Pipelined fetch at pc, one edge per word: latch the word read on
+        # the previous edge and drive the next read
+        if self.icache_entries and self.no_of_words_fetched == 0:
+            if self.icache_lookup(self.pc, display):
+                return
+        for i in range(self.row_ad_bits):
+            self.row_ad[i] = (self.pc >> (self.col_ad_bits + i)) & 1
+        self.row_idle = 0
+        i = self.no_of_words_fetched
+        if i > 0:
+            for j in range(self.word_bits):
+                self.instruction[(i - 1) * self.word_bits + j] = crossbar_data[j]
+        if i < self.instruction_length and not (self.compact and i == self.short_length and self.is_short()):
+            for j in range(self.col_ad_bits):
+                self.col_ad[j] = ((self.pc + i) >> j) & 1
+            self.col_idle = 0
+            self.write_read = 0
+            self.maj = 0
+            self.bit_or_word = 0
+            self.no_of_words_fetched = i + 1
+        else:
+            self.col_idle = 1
+            self.state = 1
+            self.no_of_words_fetched = 0
+            self.fetched(self.pc)
+            if self.icache_entries:
+                self.icache_fill()
+
+    def read_operands(self, crossbar_data, display):
+        # Internal states 0-2 read b, 3-5 read a, 6-8 read c
+        k = [1, 0, 2][self.internal_state // 3]
+        phase = self.internal_state % 3
+        # word operations read whole operand words
+        width = 0 if self.word_ops and self.opcode() > 3 else 1
+        if self.forwarding and self.internal_state == 0:
+            # take the operands the last instruction wrote from write_data[0]
+            self.forwarded = [1 if width == 1 and self.operand_cell(n) == self.forward_cell else 0 for n in range(3)]
+            for n in range(3):
+                if self.forwarded[n]:
+                    setattr(self, "abc"[n] + "_reg", self.write_data[0])
+            self.forwarded_operands += sum(self.forwarded)
+            if any(self.forwarded):
+                display.append("Forwarded " + " ".join(str(f) for f in self.forwarded))
+            left = [n for n in (1, 0, 2) if not self.forwarded[n]]
+            if not left:
+                self.state = 2
+                return
+            k = left[0]
+            self.internal_state = [3, 0, 6][k]
+        if phase == 0:
+            self.operand_row(k)
+            self.row_idle = 0
+            self.col_idle = 1
+            self.write_read = 0
+            self.bit_or_word = width
+            self.maj = 0
+        elif phase == 1:
+            self.operand_column(k)
+            self.col_idle = 0
+            self.write_read = 0
+            self.bit_or_word = width
+        else:
+            value = 1 if crossbar_data[0] > 0.5 else 0
+            if self.word_ops:
+                setattr(self, "abc"[k] + "_word", [1 if v > 0.5 else 0 for v in crossbar_data])
+            if k == 0:
+                self.a_reg = value
+            elif k == 1:
+                self.b_reg = value
+            else:
+                self.c_reg = value
+            self.col_idle = 1
+            following = [n for n in [1, 0, 2][self.internal_state // 3 + 1:] if not self.forwarded[n]]
+            if not following:
+                self.row_idle = 1
+                self.internal_state = 0
+                self.state = 2
+                return
+            self.internal_state = [3, 0, 6][following[0]]
+            if self.open_row and self.operand_row_address(k) == self.operand_row_address(following[0]):
+                # next operand in the open row, skip its activation
+                self.open_row_saved += 1
+                display.append(f"Open row {self.open_row_saved}")
+            else:
+                self.row_idle = 1
+                return
+        self.internal_state += 1
+
+    def read_operands_streamed(self, crossbar_data):
+        # One edge per operand, b, a then c: latch the one read on the
+        # previous edge and drive the next
+        order = [1, 0, 2]
+        n = self.internal_state
+        if n > 0:
+            setattr(self, "abc"[order[n - 1]] + "_reg", 1 if crossbar_data[0] > 0.5 else 0)
+        if n == 3:
+            self.row_idle = 1
+            self.col_idle = 1
+            self.internal_state = 0
+            self.state = 2
+            return
+        self.operand_row(order[n])
+        self.operand_column(order[n])
+        self.row_idle = 0
+        self.col_idle = 0
+        self.write_read = 0
+        self.bit_or_word = 1
+        self.maj = 0
+        self.internal_state = n + 1
+
+    def execute(self, crossbar_data, display):
+        op = self.opcode()
+        if op > 3 and self.program_counter:
+            # HALT, JMP, JT, JF, see contoller.CONTROL_OPCODES
+            target = self.operand_address(2)
+            if op == 4:
+                self.halted = 1
+                display.append("HALT")
+            else:
+                if op == 5 or (op == 6 and self.a_reg > 0.5) or (op == 7 and self.a_reg < 0.5):
+                    self.next_pc = target
+                display.append(f"{['JMP', 'JT', 'JF'][op - 5]} {self.a_reg} {self.next_pc}")
+            self.state = 3
+            return
+        if op > 3 and self.word_ops:
+            self.execute_word(op, crossbar_data, display)
+            return
+        if op in FUSED_MICROCODE and self.fused_ops:
+            self.execute_fused(op, crossbar_data, display)
+            return
+        if op > 3:
+            # No branch of the generated module matches opcodes 4-7
+            return
+        if self.internal_state == 0:
+            self.col_idle = 1
+            self.write_read = 1
+            self.bit_or_word = 1
+            self.maj = 0
+            self.row_idle = 0
+            self.row_ad = [1] * self.row_ad_bits
+            self.write_data[0] = [self.b_reg, 0, 1, self.a_reg][op]
+            self.internal_state = 1
+        elif self.internal_state == 1:
+            self.col_idle = 0
+            self.write_read = 1
+            self.bit_or_word = 1
+            self.maj = 0
+            self.row_idle = 0
+            self.col_ad = [1] * self.col_ad_bits
+            self.bit_ad = [1] * self.bit_ad_bits
+            if self.icache_entries:
+                self.icache_invalidate(2 ** (self.row_ad_bits + self.col_ad_bits) - 1)
+            self.internal_state = 2
+        elif self.internal_state == 2:
+            self.write_read = 0
+            self.maj = 1
+            if op == 3:
+                self.majp = 1 - self.a_reg
+                self.majn = self.a_reg
+                display.append(f"NOT {self.a_reg}")
+            else:
+                self.majp = self.a_reg
+                self.majn = 1 - (self.c_reg if op == 0 else self.b_reg)
+                if op == 0:
+                    display.append(f"MAJ {self.a_reg} {self.b_reg} {self.c_reg}")
+                else:
+                    display.append(f"{['AND', 'OR'][op - 1]} {self.a_reg} {self.b_reg}")
+            self.internal_state = 3
+        elif self.internal_state == 3:
+            self.bit_or_word = 1
+            self.maj = 0
+            self.col_idle = 1
+            self.internal_state = 4
+        elif self.internal_state == 4:
+            self.row_idle = 0
+            self.col_idle = 0
+            self.internal_state = 5
+        elif self.internal_state == 5:
+            self.write_read = 1
+            self.maj = 0
+            self.bit_or_word = 1
+            self.write_data[0] = 1 if crossbar_data[0] > 0.5 else 0
+            display.append(f"OUTPUT {self.write_data[0]}")
+            if self.forwarding:
+                self.forward_cell = self.operand_cell(2)
+            self.operand_row(2)
+            self.operand_column(2)
+            if self.icache_entries:
+                self.icache_invalidate(self.operand_address(2))
+            self.internal_state = 6
+        elif self.internal_state == 6:
+            if self.pipelined:
+                # the next fetch starts without the state 3 idle edge, see
+                # contoller.generate_veriloga
+                display.append(f"Next fetch {self.next_pc}")
+                self.row_idle = 1
+                self.col_idle = 1
+                self.pc = self.next_pc
+                self.internal_state = 0
+                self.state = 0
+                self.fetch_streamed(crossbar_data, display)
+                return
+            self.row_idle = 1
+            self.col_idle = 1
+            self.internal_state = 0
+            self.state = 3
+
+    def fused_input(self, name):
+        # Level of a contoller.FUSED_MICROCODE input
+        inverted = name.startswith("~")
+        name = name.lstrip("~")
+        if name in ("0", "1"):
+            value = int(name)
+        else:
+            value = 1 if getattr(self, name + "_reg") > 0.5 else 0
+        return 1 - value if inverted else value
+
+    def execute_fused(self, op, crossbar_data, display):
+        # contoller.FUSED_MICROCODE, one edge of contoller.fused_schedule
+        # per internal state
+        name, steps = FUSED_MICROCODE[op]
+        if self.internal_state == 0:
+            display.append(" ".join([name] + [str(getattr(self, x + "_reg")) for x in fused_operands(steps, False)]))
+        for action in fused_schedule(steps)[self.internal_state]:
+            kind = action[0]
+            if kind == "latch":
+                setattr(self, action[1] + "_reg", 1 if crossbar_data[0] > 0.5 else 0)
+            elif kind == "scratch":
+                self.col_idle = 1
+                self.write_read = 1
+                self.bit_or_word = 1
+                self.maj = 0
+                self.row_idle = 0
+                self.row_ad = [1] * self.row_ad_bits
+                self.write_data[0] = self.fused_input(action[1])
+            elif kind == "select":
+                self.col_idle = 0
+                self.col_ad = [1] * self.col_ad_bits
+                self.bit_ad = [1] * self.bit_ad_bits
+                if self.icache_entries:
+                    self.icache_invalidate(2 ** (self.row_ad_bits + self.col_ad_bits) - 1)
+            elif kind == "majority":
+                self.write_read = 0
+                self.maj = 1
+                self.majp = self.fused_input(action[1])
+                self.majn = 1 - self.fused_input(action[2])
+            elif kind == "release":
+                self.bit_or_word = 1
+                self.maj = 0
+                self.col_idle = 1
+            elif kind == "read":
+                self.row_idle = 0
+                self.col_idle = 0
+            elif kind == "store":
+                k, value = action[1:]
+                self.write_read = 1
+                self.maj = 0
+                self.bit_or_word = 1
+                self.row_idle = 0
+                self.col_idle = 0
+                if value is None:
+                    self.write_data[0] = 1 if crossbar_data[0] > 0.5 else 0
+                else:
+                    self.write_data[0] = self.fused_input(value)
+                display.append(f"OUTPUT {self.write_data[0]}")
+                if self.forwarding:
+                    self.forward_cell = self.operand_cell(k)
+                self.operand_row(k)
+                self.operand_column(k)
+                if self.icache_entries:
+                    self.icache_invalidate(self.operand_address(k))
+            else:
+                self.row_idle = 1
+                self.col_idle = 1
+                self.internal_state = 0
+                self.state = 3
+                return
+        self.internal_state += 1
+
+    def execute_word(self, op, crossbar_data, display):
+        # contoller.WORD_MICROCODE: the execute sequence on whole words
+        if self.internal_state == 0:
+            self.col_idle = 1
+            self.write_read = 1
+            self.bit_or_word = 0
+            self.maj = 0
+            self.row_idle = 0
+            self.row_ad = [1] * self.row_ad_bits
+            self.write_data = [[b, 0, 1, a][op - 4] for a, b in zip(self.a_word, self.b_word)]
+            self.internal_state = 1
+        elif self.internal_state == 1:
+            self.col_idle = 0
+            self.col_ad = [1] * self.col_ad_bits
+            if self.icache_entries:
+                self.icache_invalidate(2 ** (self.row_ad_bits + self.col_ad_bits) - 1)
+            self.internal_state = 2
+        elif self.internal_state == 2:
+            self.write_read = 0
+            self.maj = 1
+            if op == 7:
+                self.write_data = [1 - a for a in self.a_word]
+                self.write_data_n = list(self.a_word)
+            else:
+                self.write_data = list(self.a_word)
+                self.write_data_n = [1 - v for v in (self.c_word if op == 4 else self.b_word)]
+            display.append(["VMAJ", "VAND", "VOR", "VNOT"][op - 4])
+            self.internal_state = 3
+        elif self.internal_state == 3:
+            self.maj = 0
+            self.col_idle = 1
+            self.internal_state = 4
+        elif self.internal_state == 4:
+            self.row_idle = 0
+            self.col_idle = 0
+            self.internal_state = 5
+        elif self.internal_state == 5:
+            self.write_read = 1
+            self.write_data = [1 if v > 0.5 else 0 for v in crossbar_data]
+            display.append("OUTPUT " + " ".join(str(v) for v in self.write_data))
+            # write_data[0] holds bit 0 of the word, not the cell at c
+            self.forward_cell = -1
+            self.operand_row(2)
+            self.operand_column(2)
+            if self.icache_entries:
+                self.icache_invalidate(self.operand_address(2))
+            self.internal_state = 6
+        elif self.internal_state == 6:
+            self.row_idle = 1
+            self.col_idle = 1
+            self.internal_state = 0
+            self.state = 3
+
+    def ram(self, en_inputs, crossbar_data):
+        address = en_inputs["address"]
+        if self.read_write_state == 0:
+            for i in range(self.row_ad_bits):
+                self.row_ad[i] = address[self.col_ad_bits + i]
+            if self.multi_row:
+                # reads stay on one row
+                self.row_mask = [m if en_inputs["wr"] > 0.5 else 0 for m in en_inputs["mask"]]
+            if self.burst:
+                # words after the first, streamed behind this row activation
+                self.burst_left = sum(1 << i for i, c in enumerate(en_inputs["count"]) if c > 0.5)
+            self.row_idle = 0
+            self.ram_done = 0
+            self.read_write_state = 1
+        elif self.read_write_state == 1:
+            for i in range(self.col_ad_bits):
+                self.col_ad[i] = address[i]
+            if self.burst:
+                self.burst_col = sum(1 << i for i in range(self.col_ad_bits) if address[i] > 0.5)
+            self.col_idle = 0
+            self.write_read = en_inputs["wr"]
+            self.bit_or_word = 0
+            self.write_data = list(en_inputs["data_in"])
+            # the forwarded result is gone from write_data[0]
+            self.forward_cell = -1
+            self.bit_ad = [0] * self.bit_ad_bits
+            self.maj = 0
+            self.majp = 0
+            self.majn = 0
+            # inputs are latched, the requester may move on after the last word
+            self.ram_ready = 1 if self.burst_left == 0 else 0
+            if self.icache_entries and en_inputs["wr"] > 0.5:
+                self.icache_invalidate(sum(1 << i for i, v in enumerate(address) if v > 0.5),
+                                       sum(1 << i for i, m in enumerate(self.row_mask) if m > 0.5))
+            self.read_write_state = 2
+        elif self.read_write_state == 2:
+            # same level as wr, which is still held at this edge
+            self.ram_ready = 0
+            self.ram_done = 1
+            if self.write_read < 0.5:
+                self.data_out = list(crossbar_data)
+            else:
+                self.data_out = [0] * self.word_bits
+            if self.burst_left > 0:
+                # the next word of the burst goes out on this edge, in the
+                # same row
+                self.burst_left -= 1
+                self.burst_col = (self.burst_col + 1) % 2 ** self.col_ad_bits
+                self.col_ad = [(self.burst_col >> i) & 1 for i in range(self.col_ad_bits)]
+                self.write_data = list(en_inputs["data_in"])
+                self.ram_ready = 1 if self.burst_left == 0 else 0
+                self.ram_done = 0
+                if self.icache_entries and self.write_read > 0.5:
+                    row = sum(1 << i for i, v in enumerate(self.row_ad) if v > 0.5)
+                    self.icache_invalidate(row * 2 ** self.col_ad_bits + self.burst_col,
+                                           sum(1 << i for i, m in enumerate(self.row_mask) if m > 0.5))
+                return
+            self.row_idle = 1
+            self.col_idle = 1
+            self.row_mask = [0] * self.row_ad_bits
+            self.read_write_state = 0
+
+    def signals(self):
+        sig = {
+            "state": self.state,
+            "internal_state": self.internal_state,
+            "read_write_state": self.read_write_state,
+            "no_of_words_fetched": self.no_of_words_fetched,
+        }
+        for name in ["row_ad", "col_ad", "write_data", "bit_ad", "data_out"]:
+            for i, v in enumerate(getattr(self, name)):
+                sig[f"{name}_{i}"] = v
+        for name in ["row_idle", "col_idle", "write_read", "bit_or_word", "maj", "majp", "majn", "instr_exec_status",
+                     "ram_ready", "ram_done"]:
+            sig[name] = getattr(self, name)
+        if self.multi_row:
+            for i, v in enumerate(self.row_mask):
+                sig[f"row_mask_{i}"] = v
+        if self.word_ops:
+            for i, v in enumerate(self.write_data_n):
+                sig[f"write_data_n_{i}"] = v
+        if self.icache_entries:
+            sig["icache_hits"] = self.icache_hits
+            sig["icache_misses"] = self.icache_misses
+        return sig
+
+
+class Crossbar:
+    """
+    Memristive array behind the RAS and CAS_temp.generate_cas_module blocks.
+    cells[row][word][bit] holds the logic state of each memristor.
+    """
+
+    def __init__(self, row_ad_bits, col_ad_bits, bit_ad_bits):
+        self.num_rows = 2 ** row_ad_bits
+        self.num_words = 2 ** col_ad_bits
+        self.num_bits_per_word = 2 ** bit_ad_bits
+        self.cells = [[[0] * self.num_bits_per_word for _ in range(self.num_words)] for _ in range(self.num_rows)]
+        self.outb = [0] * self.num_bits_per_word
+
+    def step(self, ctrl, ras_bits=None):
+        """
+        Apply the CAS branch selected by the controller outputs.
+
+        Args:
+            ras_bits (list): Indices of the controller's row_ad outputs wired
+                to the RAS inputs, LSB first, when the controller has more
+                row bits than the array (a bank of system.generate_system).
+
+        Returns:
+            list: The RAS outputs for this cycle.
+        """
+        if ras_bits is None:
+            rows = ras_decode(ctrl.row_ad, ctrl.row_idle, ctrl.row_mask)
+        else:
+            rows = ras_decode([ctrl.row_ad[i] for i in ras_bits], ctrl.row_idle, [ctrl.row_mask[i] for i in ras_bits])
+        if ctrl.col_idle > 0.5:
+            return rows
+        active = [r for r, on in enumerate(rows) if on]
+        ca_decoded = sum(1 << i for i, v in enumerate(ctrl.col_ad) if v > 0.5)
+        ba_decoded = sum(1 << i for i, v in enumerate(ctrl.bit_ad) if v > 0.5)
+        word_mode = ctrl.bit_or_word < 0.5
+
+        if ctrl.maj > 0.5 and word_mode:
+            # Word majority of CAS_temp.generate_cas_module(word_maj=True),
+            # majp and majn per bit on write_data and write_data_n
+            for r in active:
+                cell = self.cells[r][ca_decoded]
+                for bit in range(self.num_bits_per_word):
+                    if ctrl.write_data[bit] > 0.5 and ctrl.write_data_n[bit] < 0.5:
+                        cell[bit] = 1
+                    elif ctrl.write_data[bit] < 0.5 and ctrl.write_data_n[bit] > 0.5:
+                        cell[bit] = 0
+        elif ctrl.maj > 0.5:
+            # Resistive majority: RM3(P, Q, R) = MAJ(P, !Q, R)
+            for r in active:
+                cell = self.cells[r][ca_decoded]
+                if ctrl.majp > 0.5 and ctrl.majn < 0.5:
+                    cell[ba_decoded] = 1
+                elif ctrl.majp < 0.5 and ctrl.majn > 0.5:
+                    cell[ba_decoded] = 0
+        elif ctrl.write_read > 0.5:
+            for r in active:
+                cell = self.cells[r][ca_decoded]
+                if word_mode:
+                    for bit in range(self.num_bits_per_word):
+                        cell[bit] = 1 if ctrl.write_data[bit] > 0.5 else 0
+                else:
+                    cell[ba_decoded] = 1 if ctrl.write_data[0] > 0.5 else 0
+        else:
+            # No active row means no read current
+            word = self.cells[active[0]][ca_decoded] if active else [0] * self.num_bits_per_word
+            if word_mode:
+                self.outb = list(word)
+            else:
+                self.outb[0] = word[ba_decoded]
+        return rows
+
+    def word(self, address):
+        return self.cells[address >> (self.num_words.bit_length() - 1)][address & (self.num_words - 1)]
+
+
+def testbench_states(operations, row_bits, col_bits, no_of_data_bits, handshake=False, multi_row=False,
+                     compact=False, burst=False):
+    """
+    Expand a list of testbench actions into the per-clock states that
+    Testbench.generate_testbench emits for them.
+
+    Args:
+        operations (list): Testbench program, see Testbench.validate_program.
+        row_bits (int): Number of row address bits.
+        col_bits (int): Number of column address bits.
+        no_of_data_bits (int): Number of bit address bits.
+        handshake (bool): Sequence on ram_ready and ram_done, as
+            generate_testbench(handshake=True) does.
+        multi_row (bool): Allow row masks on writes, as
+            generate_testbench(multi_row=True) does.
+        compact (bool): Store the instructions in the compact encoding, as
+            generate_testbench(compact=True) does.
+        burst (bool): Send the accesses Testbench.group_bursts joins as
+            bursts, as generate_testbench(burst=True) does.
+
+    Returns:
+        list: One dict per state with the outputs it sets, the controller
+        output it waits on (instr_exec, ram_ready or ram_done) and what it
+        reports.
+    """
+    num_addr_bits = row_bits + col_bits
+    num_data_outputs = 2 ** no_of_data_bits
+    words = instruction_words(row_bits, col_bits, no_of_data_bits, compact)
+
+    def drive(plim, wr, addr, bits=None, mask=None):
+        # bits[k] drives data{k}, addr and mask are MSB first; every write
+        # drives the mask, as generate_testbench(multi_row=True) does
+        first = {"plim": plim, "wr": wr, "idle": 0, "addr": [int(a) for a in reversed(addr)]}
+        if bits is not None:
+            first["data"] = [int(b) for b in bits]
+            first["mask"] = [int(m) for m in reversed(mask or "0" * row_bits)]
+        return {"set": first}
+
+    def write_states(addr, bits, message, mask=None):
+        return [drive(0, 1, addr, bits, mask), {}, {}, {"set": {"idle": 1}, "display": message}]
+
+    def dump_states():
+        # back to back word reads, see Testbench._iter_dump
+        num_words = 2 ** num_addr_bits
+        states = [drive(0, 0, '0' * num_addr_bits)]
+        for step in range(1, 3 * num_words + 2):
+            s = {}
+            if step % 3 == 0:
+                if step // 3 < num_words:
+                    s["set"] = {"addr": [(step // 3 >> i) & 1 for i in range(num_addr_bits)]}
+                else:
+                    s["set"] = {"idle": 1}
+            elif step % 3 == 1 and step > 3:
+                s["dump"] = format((step - 4) // 3, f'0{num_addr_bits}b')
+            if step == 3 * num_words + 1:
+                s["display"] = "Crossbar dumped"
+            states.append(s)
+        return states
+
+    executed = {"set": {"idle": 1, "plim": 0, "wr": 0}, "wait": "instr_exec",
+                "display": "Instruction executed successfully"}
+
+    def burst_states(op):
+        # see Testbench._iter_burst; the first state is the request
+        kind, addr = op[0], op[1]
+        count = len(op[2]) if kind == 'W' else op[2]
+        if kind == 'W':
+            first = drive(0, 1, addr, reversed(op[2][0]))
+        else:
+            first = drive(0, 0, addr)
+        first["set"]["count"] = [((count - 1) >> i) & 1 for i in range(col_bits)]
+        states = [first, {"set": {"count": [0] * col_bits}}]
+        if kind == 'W':
+            states += [{"set": {"data": [int(b) for b in reversed(word)]}} for word in op[2][1:]]
+            if not handshake:
+                states += [{}, {"set": {"idle": 1}, "display": "Burst written successfully"}]
+            return states
+        states += [{} for _ in range(count + 2)]
+        for k, s in enumerate(states[1:]):
+            if k > count:
+                s.setdefault("set", {})["idle"] = 1
+            if k >= 3:
+                s["display"] = "Data read successfully"
+                s["read"] = format(int(addr, 2) + k - 3, f'0{num_addr_bits}b')
+        return states
+
+    states = []
+    # release of the previous action in handshake mode, merged into the
+    # first state of the next one
+    pending = {}
+    checked = validate_program(operations, row_bits, col_bits, no_of_data_bits, compact)
+    if burst:
+        checked = group_bursts(checked, row_bits, col_bits, no_of_data_bits, compact)
+    for n, op in enumerate(checked):
+        action = op[0]
+        addr = op[1]
+        if action in ('W', 'R'):
+            bursted = burst_states(op)
+            if handshake:
+                bursted[0].update(pending)
+                pending = {"wait": "ram_ready", "display": "Burst written successfully"} if action == 'W' else {}
+            states += bursted
+            continue
+        if action == 'w' and len(op) > 3 and not multi_row:
+            raise ValueError(f"Operation {n}: row masks need multi_row")
+        if action == 'i':
+            instr = op[3]
+            if compact:
+                words = math.ceil(len(instr) / num_data_outputs)
+            instr += '0' * (words * num_data_outputs - len(instr))
+            chunks = []
+            for j in range(words):
+                data = instr[j * num_data_outputs:(j + 1) * num_data_outputs]
+                word_addr = format(int(addr, 2) + j, f'0{num_addr_bits}b')
+                message = "Instruction written successfully" if j == words - 1 else None
+                chunks.append((word_addr, data, message))
+        if not handshake:
+            if action == 'w':
+                data = op[2]
+                states += write_states(addr, reversed(data), "Data written successfully", op[3] if len(op) > 3 else None)
+            elif action == 'r':
+                states += [drive(0, 0, addr), {}, {}, {"set": {"idle": 1}},
+                           {"set": {"idle": 1}, "display": "Data read successfully", "read": addr}]
+            elif action == 'i':
+                for word_addr, data, message in chunks:
+                    states += write_states(word_addr, data, message)
+            elif action == 'e':
+                states += [drive(1, 0, addr), executed]
+            elif action == 'd':
+                states += dump_states()
+            continue
+        if action == 'w':
+            states.append(dict(drive(0, 1, addr, reversed(op[2]), op[3] if len(op) > 3 else None), **pending))
+            pending = {"wait": "ram_ready", "display": "Data written successfully"}
+        elif action == 'i':
+            for word_addr, data, message in chunks:
+                states.append(dict(drive(0, 1, word_addr, data), **pending))
+                pending = {"wait": "ram_ready", "display": message}
+        elif action == 'r':
+            states += [dict(drive(0, 0, addr), **pending), {"set": {"idle": 1}, "wait": "ram_ready"}]
+            pending = {"wait": "ram_done", "display": "Data read successfully", "read": addr}
+        elif action == 'e':
+            states += [dict(drive(1, 0, addr), **pending), executed]
+            pending = {}
+        elif action == 'd':
+            dump = dump_states()
+            dump[0].update(pending)
+            states += dump
+            pending = {}
+    if pending:
+        states.append(dict({"set": {"idle": 1}}, **pending))
+    return states
+
+
+class SimulationResult:
+    def __init__(self, cycles, trace, reads, display, crossbar):
+        self.cycles = cycles
+        self.trace = trace
+        self.reads = reads
+        self.display = display
+        self.crossbar = crossbar
+
+
+def simulate(operations, row_ad_bits, col_ad_bits, bit_ad_bits, trace=True, max_cycles=1000000, image=None,
+             handshake=False, program_counter=False, icache_entries=0, pipelined=False, open_row=False,
+             word_ops=False, multi_row=False, forwarding=False, compact=False, fused_ops=False, burst=False):
+    """
+    Run a testbench program through cycle-accurate models of the generated
+    testbench, controller, RAS, CAS and crossbar, with clk and en tied together.
+
+    Every signal is registered: on each edge the testbench and controller see
+    the values the other side drove on the previous edge, as they do through
+    the transition() and solver delays of the analog simulation.
+
+    Args:
+        operations (list): Testbench actions, see testbench_states.
+        row_ad_bits (int): Number of row address bits.
+        col_ad_bits (int): Number of column address bits.
+        bit_ad_bits (int): Number of bit address bits.
+        trace (bool): Record every signal on every cycle.
+        max_cycles (int): Give up after this many cycles.
+        image (list): Crossbar contents at t=0 indexed [row][word][bit], see
+            crossbar.preload_image and crossbar.read_image.
+        handshake (bool): Sequence the testbench on ram_ready and ram_done,
+            see testbench_states.
+        program_counter (bool): Model the controller generated with
+            program_counter=True, where an 'e' action runs until HALT.
+        icache_entries (int): Model the controller's instruction cache with
+            this many entries, see contoller.generate_veriloga. The display
+            log ends with the hit and miss counts.
+        pipelined (bool): Model the controller generated with
+            pipelined=True.
+        open_row (bool): Model the controller generated with open_row=True.
+            The display log ends with the number of cycles it saved.
+        word_ops (bool): Model the controller generated with word_ops=True
+            and a CAS with word_maj=True.
+        multi_row (bool): Model the controller and RAS generated with
+            multi_row=True, where writes with a row mask reach every
+            matching row.
+        forwarding (bool): Model the controller generated with
+            forwarding=True. The display log ends with the number of
+            operands it forwarded.
+        compact (bool): Model the controller and testbench generated with
+            compact=True.
+        fused_ops (bool): Model the controller generated with
+            fused_ops=True.
+        burst (bool): Model the controller and testbench generated with
+            burst=True.
+
+    Returns:
+        SimulationResult: cycles taken, per-cycle trace, read and dumped
+        words as (address, data) with data MSB first, display log and final
+        crossbar contents indexed [row][word][bit].
+    """
+    states = testbench_states(operations, row_ad_bits, col_ad_bits, bit_ad_bits, handshake, multi_row, compact, burst)
+    ctrl = Controller(row_ad_bits, col_ad_bits, bit_ad_bits, program_counter, icache_entries, pipelined, open_row,
+                      word_ops, multi_row, forwarding, compact, fused_ops, burst)
+    xbar = Crossbar(row_ad_bits, col_ad_bits, bit_ad_bits)
+    if image is not None:
+        xbar.cells = [[list(word) for word in row] for row in image]
+    word_bits = 2 ** bit_ad_bits
+
+    tb = {"plim": 0, "wr": 0, "idle": 1,
+          "data": [0] * word_bits, "addr": [0] * (row_ad_bits + col_ad_bits), "mask": [0] * row_ad_bits,
+          "count": [0] * col_ad_bits}
+    tb_state = 0
+    cycles = 0
+    log = []
+    reads = []
+    trace_rows = []
+    rows = ras_decode(ctrl.row_ad, ctrl.row_idle, ctrl.row_mask)
+
+    while tb_state < len(states):
+        if cycles >= max_cycles:
+            raise RuntimeError(f"Simulation did not finish within {max_cycles} cycles")
+        # Values driven on the previous edge
+        seen = {"plim": tb["plim"], "wr": tb["wr"], "idle": tb["idle"],
+                "address": list(tb["addr"]), "data_in": list(tb["data"]), "mask": list(tb["mask"]),
+                "count": list(tb["count"])}
+        ready = {"instr_exec": ctrl.instr_exec_status, "ram_ready": ctrl.ram_ready, "ram_done": ctrl.ram_done}
+        crossbar_data = list(xbar.outb)
+        data_out = list(ctrl.data_out)
+
+        s = states[tb_state]
+        if not s.get("wait") or ready[s["wait"]] > 0.5:
+            for key, value in s.get("set", {}).items():
+                tb[key] = list(value) if isinstance(value, list) else value
+            if s.get("display"):
+                log.append((cycles, s["display"]))
+            if "read" in s:
+                data = "".join(str(b) for b in reversed(data_out))
+                reads.append((s["read"], data))
+                log.append((cycles, data))
+            if "dump" in s:
+                reads.append((s["dump"], "".join(str(b) for b in reversed(data_out))))
+            tb_state += 1
+
+        for message in ctrl.step(seen, crossbar_data):
+            log.append((cycles, message))
+        rows = xbar.step(ctrl)
+
+        if trace:
+            sig = {"cycle": cycles, "tb_state": tb_state}
+            sig.update({"plim": tb["plim"], "wr": tb["wr"], "idle": tb["idle"]})
+            for i, v in enumerate(tb["addr"]):
+                sig[f"addr{i}"] = v
+            for i, v in enumerate(tb["data"]):
+                sig[f"data{i}"] = v
+            sig.update(ctrl.signals())
+            for i, v in enumerate(rows):
+                sig[f"ras_out{i}"] = v
+            for i, v in enumerate(xbar.outb):
+                sig[f"outb{i}"] = v
+            trace_rows.append(sig)
+        cycles += 1
+
+    if icache_entries:
+        log.append((cycles, f"icache hits {ctrl.icache_hits} misses {ctrl.icache_misses}"))
+    if open_row:
+        log.append((cycles, f"open row saved {ctrl.open_row_saved} cycles"))
+    if forwarding:
+        log.append((cycles, f"forwarded {ctrl.forwarded_operands} operands"))
+    return SimulationResult(cycles, trace_rows, reads, log, xbar.cells)
@@ -0,0 +1,609 @@
+from CAS_temp import iter_bus_cas_module
+from RAS import iter_ras_veriloga
+from Testbench import OPERANDS, WORD_OPERATIONS, expand_compact, validate_program
+from contoller import iter_veriloga
+from crossbar import iter_crossbar_module
+from simulator import Controller, Crossbar, SimulationResult, simulate, testbench_states
+
+# How a host word address is split between banks: "block" gives each bank
+# a contiguous range (bank = top row bits), "row" deals consecutive rows
+# out to the banks in turn (bank = low row bits)
+INTERLEAVES = ("block", "row")
+
+
+def bank_bits(num_banks):
+    """
+    Number of address bits that select a bank.
+    """
+    if num_banks < 1 or num_banks & (num_banks - 1):
+        raise ValueError(f"num_banks must be a power of two, got {num_banks}")
+    return num_banks.bit_length() - 1
+
+
+def ras_bits(num_banks, row_ad_bits, interleave="block"):
+    """
+    Indices of the bank controller's row_ad outputs, LSB first, that drive
+    the row_ad_bits inputs of its RAS. The bank controllers work on host
+    addresses; the bits left out select the bank.
+    """
+    if interleave not in INTERLEAVES:
+        raise ValueError(f"Unknown interleave {interleave!r}, expected one of {INTERLEAVES}")
+    first = bank_bits(num_banks) if interleave == "row" else 0
+    return list(range(first, first + row_ad_bits))
+
+
+def split_address(address, num_banks, row_ad_bits, col_ad_bits, interleave="block"):
+    """
+    Bank and bank-local word address of a host word address.
+
+    Returns:
+        tuple: (bank, local address), the local address being row bits
+        followed by column bits as on a single-bank address bus.
+    """
+    bits = bank_bits(num_banks)
+    row, col = address >> col_ad_bits, address % 2 ** col_ad_bits
+    if interleave == "row":
+        bank, local_row = row % num_banks, row >> bits
+    elif interleave == "block":
+        bank, local_row = row >> row_ad_bits, row % 2 ** row_ad_bits
+    else:
+        raise ValueError(f"Unknown interleave {interleave!r}, expected one of {INTERLEAVES}")
+    return bank, (local_row << col_ad_bits) + col
+
+
+def join_address(bank, local, num_banks, row_ad_bits, col_ad_bits, interleave="block"):
+    """
+    Inverse of split_address: the host word address of a bank-local one.
+    """
+    bits = bank_bits(num_banks)
+    local_row, col = local >> col_ad_bits, local % 2 ** col_ad_bits
+    if interleave == "row":
+        row = (local_row << bits) + bank
+    elif interleave == "block":
+        row = (bank << row_ad_bits) + local_row
+    else:
+        raise ValueError(f"Unknown interleave {interleave!r}, expected one of {INTERLEAVES}")
+    return (row << col_ad_bits) + col
+
+
+def scratch_cells(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block"):
+    """
+    Host (word address, bit) of the scratch cell of each bank. Every bank
+    controller takes the last cell of its own array as scratch, so unlike
+    the single-bank design, which only gives up the last cell of the host
+    address space, num_banks host cells are overwritten by execution.
+    """
+    local = 2 ** (row_ad_bits + col_ad_bits) - 1
+    return [(join_address(k, local, num_banks, row_ad_bits, col_ad_bits, interleave), 2 ** bit_ad_bits - 1)
+            for k in range(num_banks)]
+
+
+def iter_frontend_module(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block"):
+    """
+    Yields the front-end module between a host (the testbench, with
+    handshake=True) and num_banks bank controllers. Its host side has the
+    ports of a single controller with bank_bits more row bits. Every edge
+    it routes the host's request to the bank selected by the address:
+
+    - a RAM request is latched onto the bank bus for the three edges of
+      the controller's RAM cycle, and ram_ready is pulsed to the host at
+      once, so the next request can go to another bank meanwhile; data_out
+      and ram_done follow the bank of the last RAM request. ram_done is
+      held low from the latching edge until the request is released, as
+      the bank only drops the ram_done of its previous access once the
+      new RAM cycle starts.
+    - a PLIM request is posted: the bank is launched and instr_exec_status
+      raised, and the bank keeps running while the host moves on. busy is
+      high while any bank runs. Once a bank reports instr_exec_status it is
+      idled for one edge so it can take the next request.
+
+    A request for a bank that is still running waits until it is done.
+    """
+    bits = bank_bits(num_banks)
+    if interleave not in INTERLEAVES:
+        raise ValueError(f"Unknown interleave {interleave!r}, expected one of {INTERLEAVES}")
+    num_addr_bits = row_ad_bits + bits + col_ad_bits
+    word_bits = 2 ** bit_ad_bits
+    addresses = [f"address_{i}" for i in range(num_addr_bits)]
+    data_ins = [f"data_in_{i}" for i in range(word_bits)]
+    data_outs = [f"data_out_{i}" for i in range(word_bits)]
+    first = col_ad_bits + (0 if interleave == "row" else row_ad_bits)
+    select = " + ".join(f"(V({addresses[first + i]}) > 0.5 ? {2**i} : 0)" for i in range(bits)) or "0"
+
+    yield """`include "disciplines.vams"
+
+module frontend (
+\tinput electrical en,
+\tinput electrical plim,
+\tinput electrical idle,"""
+    for a in addresses:
+        yield f"\n\tinput electrical {a},"
+    yield "\n\tinput electrical wr,"
+    for d in data_ins:
+        yield f"\n\tinput electrical {d},"
+    for d in data_outs:
+        yield f"\n\toutput electrical {d},"
+    yield """
+\toutput electrical ram_ready,
+\toutput electrical ram_done,
+\toutput electrical instr_exec_status,
+\toutput electrical busy,"""
+    for k in range(num_banks):
+        for s in ["plim", "idle", "wr"] + addresses + data_ins:
+            yield f"\n\toutput electrical b{k}_{s},"
+        for s in data_outs + ["ram_ready", "ram_done"]:
+            yield f"\n\tinput electrical b{k}_{s},"
+        yield f"\n\tinput electrical b{k}_instr_exec_status" + ("," if k < num_banks - 1 else "")
+    yield "\n);\n"
+
+    yield f"""
+\tparameter integer num_banks = {num_banks};
+\treal v_en_prev;
+\tinteger bank;
+\tinteger ram_bank = 0;
+\tinteger mode[0:{num_banks - 1}];
+\tinteger ram[0:{num_banks - 1}];
+\tinteger k;
+"""
+    for d in data_outs + ["ram_ready", "ram_done", "instr_exec_status", "busy"]:
+        yield f"\treal v_{d} = 0.0;\n"
+    for k in range(num_banks):
+        for s in ["plim", "idle", "wr"] + addresses + data_ins:
+            yield f"\treal v_b{k}_{s};\n"
+    yield "\n"
+
+    yield "analog begin\n"
+    yield "\t@(initial_step) begin\n"
+    yield "\t\tv_en_prev = V(en);\n"
+    yield f"\t\tfor (k = 0; k < {num_banks}; k = k + 1) begin\n"
+    yield "\t\t\tmode[k] = 0;\n"
+    yield "\t\t\tram[k] = 0;\n"
+    yield "\t\tend\n"
+    for k in range(num_banks):
+        yield f"\t\tv_b{k}_idle = 1.0;\n"
+        yield f"\t\tv_b{k}_plim = 0.0;\n"
+    yield "\tend\n\n"
+
+    yield "\tif (V(en) > 0.5 && v_en_prev < 0.5) begin\n"
+    yield f"\t\tbank = {select};\n"
+    yield "\t\tv_ram_ready = 0.0;\n"
+    # Read results of the bank that served the last RAM request
+    yield "\t\tcase (ram_bank)\n"
+    for k in range(num_banks):
+        yield f"\t\t\t{k}: begin\n"
+        for d in data_outs:
+            yield f"\t\t\t\tv_{d} = V(b{k}_{d});\n"
+        yield f"\t\t\t\tv_ram_done = ram[{k}] > 0 ? 0.0 : V(b{k}_ram_done);\n"
+        yield "\t\t\tend\n"
+    yield "\t\tendcase\n"
+    yield "\t\tif (V(idle) > 0.5 && V(plim) < 0.5) v_instr_exec_status = 0.0;\n"
+    for k in range(num_banks):
+        b = f"b{k}_"
+        yield f"\t\t// Bank {k}\n"
+        yield f"\t\tif (mode[{k}] == 1) begin\n"
+        yield f"\t\t\tif (V({b}instr_exec_status) > 0.5) begin\n"
+        yield f"\t\t\t\tv_{b}idle = 1.0;\n"
+        yield f"\t\t\t\tv_{b}plim = 0.0;\n"
+        yield f"\t\t\t\tmode[{k}] = 2;\n"
+        yield "\t\t\tend\n"
+        yield f"\t\tend else if (mode[{k}] == 2) begin\n"
+        yield f"\t\t\tmode[{k}] = 0;\n"
+        yield f"\t\tend else if (ram[{k}] > 0) begin\n"
+        # the latched request stays on the bank bus
+        yield f"\t\t\tram[{k}] = ram[{k}] - 1;\n"
+        yield "\t\tend else begin\n"
+        yield f"\t\t\tv_{b}idle = 1.0;\n"
+        yield f"\t\t\tv_{b}plim = 0.0;\n"
+        yield f"\t\t\tif (bank == {k} && V(idle) < 0.5) begin\n"
+        yield "\t\t\t\tif (V(plim) > 0.5 && v_instr_exec_status < 0.5) begin\n"
+        for a in addresses:
+            yield f"\t\t\t\t\tv_{b}{a} = V({a});\n"
+        yield f"\t\t\t\t\tv_{b}wr = 0.0;\n"
+        yield f"\t\t\t\t\tv_{b}plim = 1.0;\n"
+        yield f"\t\t\t\t\tv_{b}idle = 0.0;\n"
+        yield "\t\t\t\t\tv_instr_exec_status = 1.0;\n"
+        yield f"\t\t\t\t\tmode[{k}] = 1;\n"
+        yield "\t\t\t\tend else if (V(plim) < 0.5) begin\n"
+        for a in addresses + data_ins + ["wr"]:
+            yield f"\t\t\t\t\tv_{b}{a} = V({a});\n"
+        yield f"\t\t\t\t\tv_{b}idle = 0.0;\n"
+        yield "\t\t\t\t\tv_ram_ready = 1.0;\n"
+        yield "\t\t\t\t\tv_ram_done = 0.0;\n"
+        yield f"\t\t\t\t\tram_bank = {k};\n"
+        yield f"\t\t\t\t\tram[{k}] = 2;\n"
+        yield "\t\t\t\tend\n"
+        yield "\t\t\tend\n"
+        yield "\t\tend\n"
+    yield "\t\tv_busy = 0.0;\n"
+    yield f"\t\tfor (k = 0; k < {num_banks}; k = k + 1)\n"
+    yield "\t\t\tif (mode[k] != 0) v_busy = 1.0;\n"
+    yield "\tend\n\n"
+
+    for d in data_outs + ["ram_ready", "ram_done", "instr_exec_status", "busy"]:
+        yield f"\tV({d}) <+ v_{d};\n"
+    for k in range(num_banks):
+        for s in ["plim", "idle", "wr"] + addresses + data_ins:
+            yield f"\tV(b{k}_{s}) <+ v_b{k}_{s};\n"
+    yield "\tv_en_prev = V(en);\nend\nendmodule\n"
+
+
+def iter_system_module(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block", images=None):
+    """
+    Yields the top-level module: the front-end and, per bank, a controller,
+    RAS, bus CAS and crossbar instance, wired as generate_system emits them.
+    Its ports are the host side of the front-end, so it drops in where a
+    single controller (with handshake=True) was.
+
+    Args:
+        images (list): Crossbar image file of each bank, see
+            crossbar.write_image. Banks start cleared by default.
+    """
+    bits = bank_bits(num_banks)
+    num_addr_bits = row_ad_bits + bits + col_ad_bits
+    word_bits = 2 ** bit_ad_bits
+    num_cells = 2 ** col_ad_bits * word_bits
+    addresses = [f"address_{i}" for i in range(num_addr_bits)]
+    data_ins = [f"data_in_{i}" for i in range(word_bits)]
+    data_outs = [f"data_out_{i}" for i in range(word_bits)]
+    host = ["en", "plim", "idle"] + addresses + ["wr"] + data_ins + data_outs + \
+        ["ram_ready", "ram_done", "instr_exec_status", "busy"]
+    wired = ras_bits(num_banks, row_ad_bits, interleave)
+
+    yield f"""
+// {num_banks} banks, {interleave} interleaved
+
+module plim_system({', '.join(host)});
+\tinput {', '.join(host[:3 + num_addr_bits + 1 + word_bits])};
+\toutput {', '.join(host[3 + num_addr_bits + 1 + word_bits:])};
+\telectrical {', '.join(host)};
+"""
+    for k in range(num_banks):
+        b = f"b{k}_"
+        scalars = ["plim", "idle", "wr"] + addresses + data_ins + data_outs + \
+            ["ram_ready", "ram_done", "instr_exec_status", "row_idle", "col_idle", "write_read", "bit_or_word",
+             "maj", "majp", "majn"] + [f"row_ad_{i}" for i in range(row_ad_bits + bits)]
+        yield f"\telectrical {', '.join(b + s for s in scalars)};\n"
+        yield f"\telectrical [0:{col_ad_bits - 1}] {b}ca;\n"
+        yield f"\telectrical [0:{bit_ad_bits - 1}] {b}ba;\n"
+        yield f"\telectrical [0:{word_bits - 1}] {b}wb, {b}outb;\n"
+        yield f"\telectrical [0:{2 ** row_ad_bits - 1}] {b}row;\n"
+        yield f"\telectrical [0:{num_cells - 1}] {b}vcp, {b}vcn;\n"
+
+    ports = [f".{s}({s})" for s in host]
+    for k in range(num_banks):
+        for s in ["plim", "idle", "wr"] + addresses + data_ins + data_outs + ["ram_ready", "ram_done", "instr_exec_status"]:
+            ports.append(f".b{k}_{s}(b{k}_{s})")
+    yield f"\n\tfrontend fe ({', '.join(ports)});\n"
+
+    for k in range(num_banks):
+        b = f"b{k}_"
+        ports = [".en(en)"] + [f".{s}({b}{s})" for s in ["plim", "idle"] + addresses + ["wr"] + data_ins]
+        ports += [f".crossbar_data_{j}({b}outb[{j}])" for j in range(word_bits)]
+        ports += [f".row_ad_{i}({b}row_ad_{i})" for i in range(row_ad_bits + bits)]
+        ports += [f".col_ad_{i}({b}ca[{i}])" for i in range(col_ad_bits)]
+        ports += [f".{s}({b}{s})" for s in ["row_idle", "col_idle", "write_read", "bit_or_word"]]
+        ports += [f".write_data_{j}({b}wb[{j}])" for j in range(word_bits)]
+        ports += [f".bit_ad_{i}({b}ba[{i}])" for i in range(bit_ad_bits)]
+        ports += [f".{s}({b}{s})" for s in ["maj", "majp", "majn"] + data_outs + ["ram_ready", "ram_done", "instr_exec_status"]]
+        yield f"\n\tcontroller ctrl{k} ({', '.join(ports)});\n"
+        ports = [f".in{i}({b}row_ad_{r})" for i, r in enumerate(wired)]
+        ports += [f".out{j}({b}row[{j}])" for j in range(2 ** row_ad_bits)] + [f".idle({b}row_idle)"]
+        yield f"\tRAS ras{k} ({', '.join(ports)});\n"
+        yield (f"\tCAS cas{k} (.wr({b}write_read), .bit_or_word({b}bit_or_word), .maj({b}maj), .majp({b}majp),"
+               f" .majn({b}majn), .idle({b}col_idle), .ca({b}ca), .ba({b}ba), .wb({b}wb), .vcp({b}vcp), .vcn({b}vcn),"
+               f" .outb({b}outb));\n")
+        image = f" #(.image(\"{images[k]}\"))" if images else ""
+        yield f"\tcrossbar{image} xbar{k} (.row({b}row), .vcp({b}vcp), .vcn({b}vcn));\n"
+    yield "endmodule\n"
+
+
+def generate_system(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block", out=None, images=None,
+                    trace_level="cycle", program_counter=False, icache_entries=0, pipelined=False, open_row=False,
+                    forwarding=False, compact=False, fused_ops=False):
+    """
+    Generates a num_banks bank system: the controller, RAS, bus CAS,
+    crossbar and front-end modules and the plim_system top that
+    instantiates them, all in one file. Each bank is a row_ad_bits x
+    col_ad_bits x bit_ad_bits array with its own controller, so independent
+    instruction streams in different banks run at the same time.
+
+    The host addresses one space of bank_bits(num_banks) more row bits.
+    The bank controllers are generated for that width and see host
+    addresses; operands of an instruction must be in the bank it runs in,
+    the bank bits are dropped on the way to the RAS. Each bank keeps its
+    scratch cell in its own last cell, see scratch_cells. Drive the system
+    with a testbench generated with handshake=True and row_bits =
+    row_ad_bits + bank_bits(num_banks); dumps are not supported as they
+    do not wait on the handshake.
+
+    Args:
+        interleave (str): One of INTERLEAVES. "row" needs every stream to
+            stay within its row, so it does not go with program_counter.
+        out (file-like, optional): Sink to stream the modules into. When not
+            given they are returned as a string.
+        images (list): Crossbar image file of each bank.
+        trace_level, program_counter, icache_entries, pipelined, open_row,
+            forwarding, compact, fused_ops: Passed on to
+            contoller.generate_veriloga.
+    """
+    if interleave == "row" and program_counter:
+        raise ValueError("row interleave moves the next row to another bank, program_counter streams need block")
+    if images is not None and len(images) != num_banks:
+        raise ValueError(f"Expected {num_banks} crossbar images, got {len(images)}")
+    bits = bank_bits(num_banks)
+    chunks = [
+        iter_veriloga(row_ad_bits + bits, col_ad_bits, bit_ad_bits, trace_level=trace_level, handshake=True,
+                      program_counter=program_counter, icache_entries=icache_entries, pipelined=pipelined,
+                      open_row=open_row, forwarding=forwarding, compact=compact, fused_ops=fused_ops),
+        ["\n\n"],
+        iter_ras_veriloga(num_addr_bits=row_ad_bits, compact=True),
+        ["\n"],
+        iter_bus_cas_module(col_ad_bits, bit_ad_bits),
+        ["\n"],
+        iter_crossbar_module(row_ad_bits, col_ad_bits, bit_ad_bits),
+        ["\n"],
+        iter_frontend_module(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave),
+        iter_system_module(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave, images),
+    ]
+    if out is None:
+        return "".join(chunk for part in chunks for chunk in part)
+    for part in chunks:
+        for chunk in part:
+            out.write(chunk)
+
+
+class FrontEnd:
+    """
+    Edge-level model of the module emitted by iter_frontend_module. Every
+    call to step() is one rising edge of en.
+    """
+
+    def __init__(self, num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block"):
+        bits = bank_bits(num_banks)
+        if interleave not in INTERLEAVES:
+            raise ValueError(f"Unknown interleave {interleave!r}, expected one of {INTERLEAVES}")
+        self.num_banks = num_banks
+        self.select = [col_ad_bits + (0 if interleave == "row" else row_ad_bits) + i for i in range(bits)]
+        word_bits = 2 ** bit_ad_bits
+        num_addr_bits = row_ad_bits + bits + col_ad_bits
+        self.mode = [0] * num_banks
+        self.ram = [0] * num_banks
+        self.ram_bank = 0
+        # en_inputs of each bank controller
+        self.bank_inputs = [{"plim": 0, "idle": 1, "wr": 0, "address": [0] * num_addr_bits, "data_in": [0] * word_bits}
+                            for _ in range(num_banks)]
+        self.data_out = [0] * word_bits
+        self.ram_ready = 0
+        self.ram_done = 0
+        self.instr_exec_status = 0
+        self.busy = 0
+
+    def step(self, host, banks):
+        """
+        Advance by one en edge.
+
+        Args:
+            host (dict): Levels of plim, idle, wr, address (list, LSB first)
+                and data_in (list) as seen at the edge.
+            banks (list): Per bank, the data_out, ram_done and
+                instr_exec_status levels of its controller seen at the edge.
+        """
+        bank = sum(1 << i for i, a in enumerate(self.select) if host["address"][a] > 0.5)
+        self.ram_ready = 0
+        self.data_out = list(banks[self.ram_bank]["data_out"])
+        self.ram_done = 0 if self.ram[self.ram_bank] > 0 else banks[self.ram_bank]["ram_done"]
+        if host["idle"] > 0.5 and host["plim"] < 0.5:
+            self.instr_exec_status = 0
+        for k, drive in enumerate(self.bank_inputs):
+            if self.mode[k] == 1:
+                if banks[k]["instr_exec_status"] > 0.5:
+                    drive.update(idle=1, plim=0)
+                    self.mode[k] = 2
+            elif self.mode[k] == 2:
+                self.mode[k] = 0
+            elif self.ram[k] > 0:
+                # the latched request stays on the bank bus
+                self.ram[k] -= 1
+            else:
+                drive.update(idle=1, plim=0)
+                if bank == k and host["idle"] < 0.5:
+                    if host["plim"] > 0.5 and self.instr_exec_status < 0.5:
+                        drive.update(address=list(host["address"]), wr=0, plim=1, idle=0)
+                        self.instr_exec_status = 1
+                        self.mode[k] = 1
+                    elif host["plim"] < 0.5:
+                        drive.update(address=list(host["address"]), data_in=list(host["data_in"]), wr=host["wr"],
+                                     idle=0)
+                        self.ram_ready = 1
+                        self.ram_done = 0
+                        self.ram_bank = k
+                        self.ram[k] = 2
+        self.busy = 1 if any(self.mode) else 0
+
+
+def simulate_system(operations, num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block",
+                    max_cycles=1000000, image=None, program_counter=False, icache_entries=0, pipelined=False,
+                    open_row=False, forwarding=False, compact=False, fused_ops=False):
+    """
+    Run a testbench program (see simulator.testbench_states, with
+    handshake) on the system from generate_system, with clk and en tied
+    together, until the program is done and every bank is idle.
+
+    Addresses are host addresses, row_ad_bits + bank_bits(num_banks) row
+    bits. Dumps are not supported; the crossbar contents are returned.
+    Execution overwrites the scratch cell of every bank, see
+    scratch_cells.
+
+    Args:
+        image (list): Contents of the whole host address space at t=0,
+            indexed [row][word][bit] by host row.
+        program_counter, icache_entries, pipelined, open_row, forwarding,
+            compact, fused_ops: Model the bank controllers generated with these, see
+            simulator.simulate.
+
+    Returns:
+        SimulationResult: cycles taken, no trace, reads as (address, data),
+        display log with each controller message prefixed by its bank, and
+        final contents indexed [row][word][bit] by host row.
+    """
+    if interleave == "row" and program_counter:
+        raise ValueError("row interleave moves the next row to another bank, program_counter streams need block")
+    bits = bank_bits(num_banks)
+    host_row_bits = row_ad_bits + bits
+    if any(op[0] == 'd' for op in operations):
+        raise ValueError("Dumps do not wait on the handshake and are not supported through the front-end")
+    states = testbench_states(operations, host_row_bits, col_ad_bits, bit_ad_bits, handshake=True, compact=compact)
+    front = FrontEnd(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave)
+    wired = ras_bits(num_banks, row_ad_bits, interleave)
+    ctrls = [Controller(host_row_bits, col_ad_bits, bit_ad_bits, program_counter, icache_entries, pipelined, open_row,
+                        forwarding=forwarding, compact=compact, fused_ops=fused_ops) for _ in range(num_banks)]
+    xbars = [Crossbar(row_ad_bits, col_ad_bits, bit_ad_bits) for _ in range(num_banks)]
+
+    def host_row(k, local_row):
+        return (local_row << bits) + k if interleave == "row" else (k << row_ad_bits) + local_row
+
+    if image is not None:
+        for k, xbar in enumerate(xbars):
+            xbar.cells = [[list(word) for word in image[host_row(k, r)]] for r in range(2 ** row_ad_bits)]
+    word_bits = 2 ** bit_ad_bits
+
+    tb = {"plim": 0, "wr": 0, "idle": 1, "data": [0] * word_bits, "addr": [0] * (host_row_bits + col_ad_bits)}
+    tb_state = 0
+    cycles = 0
+    log = []
+    reads = []
+
+    while tb_state < len(states) or any(front.mode) or any(front.ram):
+        if cycles >= max_cycles:
+            raise RuntimeError(f"Simulation did not finish within {max_cycles} cycles")
+        # Values driven on the previous edge
+        seen = {"plim": tb["plim"], "wr": tb["wr"], "idle": tb["idle"],
+                "address": list(tb["addr"]), "data_in": list(tb["data"])}
+        ready = {"instr_exec": front.instr_exec_status, "ram_ready": front.ram_ready, "ram_done": front.ram_done}
+        data_out = list(front.data_out)
+        bank_seen = [dict(drive, address=list(drive["address"]), data_in=list(drive["data_in"]))
+                     for drive in front.bank_inputs]
+        bank_outputs = [{"data_out": list(c.data_out), "ram_done": c.ram_done, "instr_exec_status": c.instr_exec_status}
+                        for c in ctrls]
+        crossbar_data = [list(x.outb) for x in xbars]
+
+        if tb_state < len(states):
+            s = states[tb_state]
+            if not s.get("wait") or ready[s["wait"]] > 0.5:
+                for key, value in s.get("set", {}).items():
+                    if key in tb:
+                        tb[key] = list(value) if isinstance(value, list) else value
+                if s.get("display"):
+                    log.append((cycles, s["display"]))
+                if "read" in s:
+                    data = "".join(str(b) for b in reversed(data_out))
+                    reads.append((s["read"], data))
+                    log.append((cycles, data))
+                tb_state += 1
+
+        front.step(seen, bank_outputs)
+        for k, (ctrl, xbar) in enumerate(zip(ctrls, xbars)):
+            for message in ctrl.step(bank_seen[k], crossbar_data[k]):
+                log.append((cycles, f"bank {k}: {message}"))
+            xbar.step(ctrl, wired)
+        cycles += 1
+
+    for k, ctrl in enumerate(ctrls):
+        if icache_entries:
+            log.append((cycles, f"bank {k}: icache hits {ctrl.icache_hits} misses {ctrl.icache_misses}"))
+        if open_row:
+            log.append((cycles, f"bank {k}: open row saved {ctrl.open_row_saved} cycles"))
+        if forwarding:
+            log.append((cycles, f"bank {k}: forwarded {ctrl.forwarded_operands} operands"))
+    cells = [None] * 2 ** host_row_bits
+    for k, xbar in enumerate(xbars):
+        for r, row in enumerate(xbar.cells):
+            cells[host_row(k, r)] = row
+    return SimulationResult(cycles, [], reads, log, cells)
+
+
+def measure_scaling(operations, num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave="block", image=None,
+                    **options):
+    """
+    Run the same program on the single-bank design (one controller over
+    the whole host address space, simulator.simulate with handshake) and on
+    num_banks banks (simulate_system). Remaining keyword arguments go to
+    both. The program may not write, read or operate on a word holding
+    the scratch cell of a bank (scratch_cells), as the two designs do not
+    keep the same cells there.
+
+    Returns:
+        tuple: The single-bank and the multi-bank SimulationResult; their
+        cycles ratio is the speedup.
+    """
+    bits = bank_bits(num_banks)
+    host_row_bits = row_ad_bits + bits
+    compact = options.get("compact", False)
+    scratch = {word: k for k, (word, _) in enumerate(scratch_cells(num_banks, row_ad_bits, col_ad_bits, bit_ad_bits,
+                                                                   interleave))}
+    word_bits = 2 ** bit_ad_bits
+    field = host_row_bits + col_ad_bits + bit_ad_bits
+    for n, op in enumerate(validate_program(operations, host_row_bits, col_ad_bits, bit_ad_bits, compact)):
+        address = int(op[1], 2) if len(op) > 1 else 0
+        if op[0] in ('w', 'r'):
+            words = [address]
+        elif op[0] == 'i':
+            words = list(range(address, address + -(-len(op[3]) // word_bits)))
+            instr = expand_compact(op[3], op[1], host_row_bits, col_ad_bits, bit_ad_bits) if compact else op[3]
+            for k, x in enumerate("abc"):
+                if x in OPERANDS[op[2]] and not (x == 'c' and op[2] in ("JMP", "JT", "JF")):
+                    operand = int(instr[3 + k*field:3 + (k+1)*field], 2)
+                    word, bit = operand >> bit_ad_bits, operand % word_bits
+                    if word in scratch and (bit == word_bits - 1 or op[2] in WORD_OPERATIONS):
+                        words.append(word)
+        else:
+            words = []
+        for word in words:
+            if word in scratch:
+                raise ValueError(f"Operation {n} uses word {word} of the host address space, which holds the "
+                                 f"scratch cell of bank {scratch[word]}")
+    single = simulate(operations, host_row_bits, col_ad_bits, bit_ad_bits, trace=False, image=image,
+                      handshake=True, **options)
+    banked = simulate_system(operations, num_banks, row_ad_bits, col_ad_bits, bit_ad_bits, interleave, image=image,
+                             **options)
+    return single, banked
+
+
+if __name__ == "__main__":
+    import random
+
+    from crossbar import preload_image
+    from simulator import next_pc
+
+    with open("system.va", "w") as f:
+        generate_system(4, 2, 6, 1, program_counter=True, out=f)
+    print("4 bank system saved to system.va")
+
+    # One stream of 8 random instructions per quarter of the address space,
+    # on data in its first row, preloaded so only execution is counted
+    row_ad_bits, col_ad_bits, bit_ad_bits, total_banks = 2, 6, 1, 4
+    host_bits = row_ad_bits + bank_bits(total_banks) + col_ad_bits
+    random.seed(1)
+    for num_banks in (1, 2, 4):
+        local_rows = row_ad_bits + bank_bits(total_banks) - bank_bits(num_banks)
+        program, starts = [], []
+        for k in range(total_banks):
+            base = k << (host_bits - bank_bits(total_banks))
+            cell = lambda: f"{format(base + 1 + random.randrange(15), f'0{host_bits}b')}:{random.randrange(2)}"
+            pc = base + 2 ** col_ad_bits
+            starts.append(pc)
+            for _ in range(8):
+                op = random.choice(["MAJ", "AND", "OR", "NOT"])
+                operands = [cell() for _ in range(2 if op == "NOT" else 3)]
+                program.append(('i', format(pc, f'0{host_bits}b'), " ".join([op] + operands)))
+                pc = next_pc(pc, row_ad_bits + bank_bits(total_banks), col_ad_bits, bit_ad_bits)
+            program.append(('i', format(pc, f'0{host_bits}b'), "HALT"))
+        image, _ = preload_image(program, row_ad_bits + bank_bits(total_banks), col_ad_bits, bit_ad_bits)
+        # launch one stream per bank before the next round, as a running
+        # bank holds up the launches behind it
+        order = sorted(range(total_banks), key=lambda k: k % (total_banks // num_banks))
+        program = [('e', format(starts[k], f'0{host_bits}b')) for k in order]
+        single, banked = measure_scaling(program, num_banks, local_rows, col_ad_bits, bit_ad_bits, image=image,
+                                         program_counter=True)
+        print(f"{num_banks} banks: {banked.cycles} cycles, single bank {single.cycles}, "
+              f"speedup {single.cycles / banked.cycles:.2f}")
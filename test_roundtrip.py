@@ -0,0 +1,223 @@
+import io
+import random
+from itertools import product
+
+import numpy as np
+import pytest
+
+from batch_simulator import OPCODES, new_memory, run, run_program
+from compiler import compile_program, input_writes
+from crossbar import preload_image
+from simulator import next_pc, simulate
+from system import INTERLEAVES, simulate_system
+
+# array of the controller equivalence checks, data in words 1-15 and
+# code from word 32
+R, C, B = 2, 5, 1
+
+
+def address(word):
+    return format(word, f'0{R + C}b')
+
+
+def random_instruction(rng):
+    # (mnemonic, operand cells) on the data words
+    name = rng.choice(["MAJ", "AND", "OR", "NOT"])
+    return name, [rng.randrange(2, 32) for _ in range(2 if name == "NOT" else 3)]
+
+
+def assembly(name, cells):
+    return " ".join([name] + [f"{address(cell >> B)}:{cell % 2 ** B}" for cell in cells])
+
+
+def random_program(rng, program_counter, steps=5, reads=True):
+    # data writes, stored instructions, their execution, then reads and a dump
+    program = [('w', address(word), format(rng.randrange(4), '02b')) for word in range(1, 16)]
+    pcs = [32]
+    for _ in range(steps):
+        pcs.append(next_pc(pcs[-1], R, C, B))
+    for pc in pcs[:-1]:
+        program.append(('i', address(pc), assembly(*random_instruction(rng))))
+    if program_counter:
+        program += [('i', address(pcs[-1]), "HALT"), ('e', address(pcs[0]))]
+    else:
+        program += [('e', address(pc)) for pc in pcs[:-1]]
+    if reads:
+        program += [('r', address(word)) for word in rng.sample(range(16), 6)] + [('d',)]
+    return program
+
+
+def flat(cells):
+    return np.array([bit for row in cells for word in row for bit in word], dtype=np.uint8)
+
+
+@pytest.mark.parametrize("interleave", INTERLEAVES)
+def test_system_read_after_write(interleave):
+    program = [('w', '0010001', '10'), ('r', '0010001')]
+    assert simulate_system(program, 2, 2, 4, 1, interleave).reads == [('0010001', '10')]
+
+
+@pytest.mark.parametrize("interleave", INTERLEAVES)
+def test_system_reads_match_single_bank(interleave):
+    program = [('w', '0010001', '10'), ('w', '0010010', '01'), ('r', '0010001'), ('r', '0010010'),
+               ('r', '0010001'), ('w', '1010001', '11'), ('r', '1010001'), ('r', '0010010')]
+    single = simulate(program, 3, 4, 1, trace=False, handshake=True)
+    assert simulate_system(program, 2, 2, 4, 1, interleave).reads == single.reads
+
+
+def run_compiled(compilation, values, **options):
+    # output values the compiled program leaves in its cells
+    r, c, b = (compilation.options[k] for k in ("row_ad_bits", "col_ad_bits", "bit_ad_bits"))
+    result = simulate(input_writes(compilation, values) + compilation.program, r, c, b, trace=False,
+                      program_counter=compilation.options["program_counter"], compact=compilation.options["compact"],
+                      fused_ops=compilation.options["fused_ops"], **options)
+    outputs = {}
+    for name, _ in compilation.graph.outputs:
+        word, bit = (int(part, 2) for part in compilation.cells[name].split(':'))
+        outputs[name] = result.crossbar[word >> c][word % 2 ** c][bit]
+    return outputs
+
+
+@pytest.mark.parametrize("optimize", [True, False])
+def test_compiler_complement_of_released_node(optimize):
+    compilation = compile_program(io.StringIO('y = maj(a, ~(a & b), a ^ b)\n'), 3, 5, 2, optimize=optimize)
+    for a, b in product((0, 1), repeat=2):
+        assert run_compiled(compilation, {"a": a, "b": b}) == {"y": int(a + (1 - (a & b)) + (a ^ b) >= 2)}
+
+
+ADDER = """
+input a0 a1 b0 b1 cin
+output s0 s1 cout
+c1 = maj(a0, b0, cin)
+s0 = a0 ^ b0 ^ cin
+s1 = a1 ^ b1 ^ c1
+cout = maj(a1, b1, c1)
+"""
+
+FULL_ADDER_BLIF = """
+.model fa
+.inputs a b c
+.outputs s co
+.names a b c s
+100 1
+010 1
+001 1
+111 1
+.names a b c co
+11- 1
+1-1 1
+-11 1
+.end
+"""
+
+MUX = """
+input s x y z
+output m n
+m = (s & x) | (~s & y)
+n = ~maj(m, y, z) ^ 1
+"""
+
+
+def adder(a0, a1, b0, b1, cin):
+    total = a0 + b0 + cin + 2 * (a1 + b1)
+    return {"s0": total & 1, "s1": total >> 1 & 1, "cout": total >> 2}
+
+
+def full_adder(a, b, c):
+    return {"s": (a + b + c) & 1, "co": (a + b + c) >> 1}
+
+
+def mux(s, x, y, z):
+    m = x if s else y
+    return {"m": m, "n": int(m + y + z >= 2)}
+
+
+@pytest.mark.parametrize("source, reference", [(ADDER, adder), (FULL_ADDER_BLIF, full_adder), (MUX, mux)])
+@pytest.mark.parametrize("options, simulation", [
+    ({}, {}),
+    ({"optimize": False}, {"forwarding": True}),
+    ({"program_counter": True}, {"pipelined": True}),
+    ({"compact": True, "fused_ops": True}, {"open_row": True}),
+])
+def test_compiler_matches_python(source, reference, options, simulation):
+    compilation = compile_program(io.StringIO(source), 3, 5, 2, **options)
+    names = [name for name, _ in compilation.graph.inputs]
+    for bits in product((0, 1), repeat=len(names)):
+        values = dict(zip(names, bits))
+        assert run_compiled(compilation, values, **simulation) == reference(**values)
+
+
+def test_batch_run_matches_simulate():
+    rng = random.Random(2)
+    streams = [[random_instruction(rng) for _ in range(6)] for _ in range(8)]
+    memory = new_memory(len(streams), R, C, B)
+    expected = []
+    for n, stream in enumerate(streams):
+        program = [('w', address(word), format(rng.randrange(4), '02b')) for word in range(1, 16)]
+        memory[n] = flat(preload_image(program, R, C, B)[0])
+        pcs = [32]
+        for name, cells in stream:
+            program.append(('i', address(pcs[-1]), assembly(name, cells)))
+            pcs.append(next_pc(pcs[-1], R, C, B))
+        program += [('e', address(pc)) for pc in pcs[:-1]]
+        expected.append(flat(simulate(program, R, C, B, trace=False).crossbar))
+    fields = [[[OPCODES[name]] + (cells[:1] + [0] + cells[1:] if name == "NOT" else cells) for name, cells in stream]
+              for stream in streams]
+    opcode, a, b, c = np.moveaxis(np.array(fields), 2, 0)
+    run(memory, opcode, a, b, c)
+    # the simulated crossbar also holds the stored instructions
+    assert (memory[:, :64] == np.array(expected)[:, :64]).all()
+    assert (memory[:, -1] == np.array(expected)[:, -1]).all()
+
+
+def test_run_program_matches_program_counter():
+    rng = random.Random(3)
+    pcs = [32]
+    for _ in range(6):
+        pcs.append(next_pc(pcs[-1], R, C, B))
+    branching = [('w', address(1), '01'), ('w', address(2), '01'),
+                 ('i', address(pcs[0]), f"NOT {address(1)}:0 {address(3)}:0"),
+                 ('i', address(pcs[1]), f"JT {address(2)}:0 {address(pcs[3])}"),
+                 ('i', address(pcs[2]), f"NOT {address(3)}:0 {address(3)}:1"),
+                 ('i', address(pcs[3]), f"OR {address(1)}:0 {address(1)}:1 {address(4)}:1"),
+                 ('i', address(pcs[4]), f"JF {address(2)}:0 {address(pcs[2])}"),
+                 ('i', address(pcs[5]), "HALT"), ('e', address(pcs[0]))]
+    for program in [branching] + [random_program(rng, True, reads=False) for _ in range(4)]:
+        memory = flat(preload_image(program, R, C, B)[0])[None]
+        run_program(memory, pcs[0], R, C, B)
+        assert (memory[0] == flat(simulate(program, R, C, B, trace=False, program_counter=True).crossbar)).all()
+
+
+@pytest.mark.parametrize("program_counter, options", [
+    (False, {"open_row": True}),
+    (False, {"forwarding": True}),
+    (False, {"icache_entries": 2}),
+    (False, {"handshake": True, "forwarding": True, "open_row": True}),
+    (True, {"pipelined": True}),
+    (True, {"pipelined": True, "icache_entries": 2}),
+    (True, {"icache_entries": 2, "open_row": True, "forwarding": True}),
+])
+def test_controller_options_match_default(program_counter, options):
+    rng = random.Random(4)
+    for _ in range(4):
+        program = random_program(rng, program_counter)
+        default = simulate(program, R, C, B, trace=False, program_counter=program_counter)
+        result = simulate(program, R, C, B, trace=False, program_counter=program_counter, **options)
+        assert result.crossbar == default.crossbar
+        assert result.reads == default.reads
+
+
+@pytest.mark.parametrize("options", [{"handshake": True}, {"burst": True}, {"burst": True, "handshake": True}])
+def test_ram_paths_match_plain(options):
+    rng = random.Random(5)
+    for _ in range(6):
+        start = rng.randrange(0, 100)
+        program = [('w', address(word), format(rng.randrange(4), '02b'))
+                   for word in list(range(start, start + rng.randrange(1, 12))) + rng.sample(range(128), 4)]
+        start = rng.randrange(0, 120)
+        program += [('r', address(word)) for word in range(start, start + rng.randrange(1, 8))]
+        program += [('r', address(rng.randrange(128))), ('d',)]
+        plain = simulate(program, R, C, B, trace=False)
+        result = simulate(program, R, C, B, trace=False, **options)
+        assert result.crossbar == plain.crossbar
+        assert result.reads == plain.reads